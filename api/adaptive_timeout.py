@@ -0,0 +1,191 @@
+"""
+Adaptive, size-aware upstream timeouts.
+
+Each upstream operation has a LatencyModel that learns, online, how long the
+upstream takes per unit of work (characters of text for TTS, seconds of audio
+for ASR). Timeouts are derived from it the same way TCP derives its
+retransmission timeout: an EWMA of the rate plus four times its mean
+deviation, scaled by the request size and clamped to a [min, max] range.
+
+The result is an httpx.Timeout with separate budgets:
+- connect: fixed (establishing a connection doesn't depend on the input)
+- pool: fixed (waiting for a pooled connection)
+- write: proportional to the upload size
+- read: the learned estimate, since the upstream only answers once done
+
+A request that times out inflates the model (it can't be observed), so a
+slower upstream raises timeouts instead of failing every request.
+
+Once trained, the model also tracks its slowdown: an EWMA of how long
+requests took relative to the model's estimate for their size. It is the
+size-aware load signal used by graceful degradation - a long paragraph that
+takes a minute is not slow, a short sentence that takes ten seconds is.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TimeoutBudgets:
+    """
+    Fixed parts of the timeout budget shared by all models.
+    
+    Attributes:
+        connect: Seconds to establish a connection
+        pool: Seconds to wait for a pooled connection
+        min_upload_bytes_per_second: Slowest upload rate tolerated (write budget)
+    """
+    connect: float = 5.0
+    pool: float = 30.0
+    min_upload_bytes_per_second: float = 256 * 1024
+
+
+@dataclass
+class Measurement:
+    """
+    Size of one measured request.
+    
+    Attributes:
+        units: Work units of the request; may be corrected once the upstream
+            reports the true size (e.g. the decoded audio duration)
+        ok: Set to False for error responses so they don't train the model
+    """
+    units: float
+    ok: bool = True
+
+
+class LatencyModel:
+    """
+    Online latency model and timeout policy for one upstream operation.
+    
+    Not thread-safe; it is only used from the event loop.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        unit: str,
+        initial_seconds_per_unit: float,
+        base_seconds: float,
+        min_timeout: float,
+        max_timeout: float,
+        budgets: TimeoutBudgets,
+        enabled: bool = True,
+        alpha: float = 0.2,
+        min_samples: int = 5,
+    ):
+        self.name = name
+        self.unit = unit
+        self.base_seconds = base_seconds
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.budgets = budgets
+        self.enabled = enabled
+        self.alpha = alpha
+        self.min_samples = min_samples
+        
+        self.seconds_per_unit = initial_seconds_per_unit
+        self.deviation = initial_seconds_per_unit / 2
+        self.slowdown = 1.0
+        self.samples = 0
+        self.decisions = 0
+        self.timeout_sum = 0.0
+        self.last_timeout: Optional[float] = None
+        self.timeouts: Counter = Counter()
+    
+    def expected_seconds(self, units: float) -> float:
+        """Return the model's estimate of how long a request of the given size takes."""
+        return self.base_seconds + max(units, 1.0) * self.seconds_per_unit
+    
+    def _observe_slowdown(self, units: float, seconds: float) -> None:
+        # Until the model is trained its estimate is only a guess
+        if self.samples >= self.min_samples:
+            self.slowdown += self.alpha * (seconds / self.expected_seconds(units) - self.slowdown)
+    
+    def observe(self, units: float, seconds: float) -> None:
+        """Update the model with a successful request's size and duration."""
+        self._observe_slowdown(units, seconds)
+        rate = max(0.0, seconds - self.base_seconds) / max(units, 1.0)
+        self.deviation += self.alpha * (abs(rate - self.seconds_per_unit) - self.deviation)
+        self.seconds_per_unit += self.alpha * (rate - self.seconds_per_unit)
+        self.samples += 1
+    
+    def read_timeout(self, units: float) -> float:
+        """Return the read timeout for a request of the given size."""
+        if not self.enabled or self.samples < self.min_samples:
+            # Not enough data yet - don't cut off requests on a guess
+            return self.max_timeout
+        estimate = self.base_seconds + max(units, 1.0) * (self.seconds_per_unit + 4 * self.deviation)
+        return min(self.max_timeout, max(self.min_timeout, estimate))
+    
+    def timeout(self, units: float, upload_bytes: int = 0) -> httpx.Timeout:
+        """
+        Decide the timeout budgets for one request and record the decision.
+        
+        Args:
+            units: Work units of the request (characters, audio seconds)
+            upload_bytes: Size of the request body
+        
+        Returns:
+            httpx.Timeout with connect/read/write/pool budgets
+        """
+        read = self.read_timeout(units)
+        write = self.budgets.connect + upload_bytes / self.budgets.min_upload_bytes_per_second
+        self.decisions += 1
+        self.timeout_sum += read
+        self.last_timeout = read
+        logger.debug(
+            "%s timeout: read=%.1fs write=%.1fs for %.1f %s",
+            self.name, read, write, units, self.unit,
+            extra={"event": "timeout_decision", "model": self.name, "units": units, "read_timeout": round(read, 2)}
+        )
+        return httpx.Timeout(connect=self.budgets.connect, read=read, write=write, pool=self.budgets.pool)
+    
+    @asynccontextmanager
+    async def measure(self, units: float) -> AsyncIterator[Measurement]:
+        """
+        Time an upstream call: successes train the model, timeouts inflate it.
+        
+        Args:
+            units: Work units of the request (can be corrected via the yielded
+                Measurement before the block exits)
+        """
+        measurement = Measurement(units)
+        started = time.perf_counter()
+        try:
+            yield measurement
+        except httpx.TimeoutException as e:
+            self.timeouts[type(e).__name__] += 1
+            if isinstance(e, httpx.ReadTimeout):
+                # The request took at least this long
+                self._observe_slowdown(measurement.units, time.perf_counter() - started)
+                # The request took longer than we allowed; back off like TCP's RTO
+                self.seconds_per_unit *= 1.5
+            raise
+        else:
+            if measurement.ok:
+                self.observe(measurement.units, time.perf_counter() - started)
+    
+    def stats(self) -> Dict[str, object]:
+        """Return model state and timeout decision counters for health/metrics output."""
+        return {
+            "unit": self.unit,
+            "adaptive": self.enabled,
+            "samples": self.samples,
+            "secondsPerUnit": round(self.seconds_per_unit, 4),
+            "deviation": round(self.deviation, 4),
+            "slowdown": round(self.slowdown, 2),
+            "decisions": self.decisions,
+            "lastReadTimeout": round(self.last_timeout, 2) if self.last_timeout is not None else None,
+            "meanReadTimeout": round(self.timeout_sum / self.decisions, 2) if self.decisions else None,
+            "timeouts": dict(self.timeouts),
+        }
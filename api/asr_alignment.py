@@ -0,0 +1,490 @@
+"""
+Segment- and word-level timestamps for ASR transcripts.
+
+The ASR upstream returns a flat transcription. To caption audio without a
+second alignment pass, timestamped transcription runs a chunked pipeline:
+
+    decode once (ffmpeg, 16 kHz mono PCM) + detect silences (silencedetect)
+        -> speech chunks between silences (long chunks split, tiny ones merged)
+        -> transcribe each chunk (concurrently, results kept in order)
+        -> timed segments
+
+If the upstream reports its own timestamps (`segments` with start/end, or
+`words`), they are passed through, offset by the chunk's start. Otherwise the
+chunk boundaries (voice activity) time the segment, and word times are
+estimated by spreading the segment's duration over its words in proportion
+to their length.
+
+Without ffmpeg, or if decoding fails, the whole file is transcribed in one
+call and only upstream timestamps or estimates over the full duration are
+available.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import shutil
+import struct
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from audio_utils import build_wav
+
+logger = logging.getLogger(__name__)
+
+# Values of TimedSegment.source
+UPSTREAM = "upstream"
+VOICE_ACTIVITY = "vad"
+ESTIMATED = "estimated"
+
+# Segments are closed at sentence punctuation when grouping timed words
+SENTENCE_END = ("।", ".", "?", "!", "॥")
+
+_SILENCE_RE = re.compile(r"silence_(start|end): (-?\d+(?:\.\d+)?)")
+
+
+@dataclass
+class TimedWord:
+    """A word with its start and end time in seconds."""
+    text: str
+    start: float
+    end: float
+    
+    def to_dict(self) -> Dict[str, object]:
+        return {"word": self.text, "start": round(self.start, 3), "end": round(self.end, 3)}
+
+
+@dataclass
+class TimedSegment:
+    """
+    A transcript segment (one subtitle cue).
+    
+    Attributes:
+        start: Start time in seconds from the beginning of the file
+        end: End time in seconds
+        text: Transcribed text
+        words: Timed words of the segment
+        source: Where the times come from: UPSTREAM, VOICE_ACTIVITY (chunk
+            boundaries, estimated words) or ESTIMATED (spread over the file)
+    """
+    start: float
+    end: float
+    text: str
+    words: List[TimedWord] = field(default_factory=list)
+    source: str = ESTIMATED
+    
+    def to_dict(self, index: int) -> Dict[str, object]:
+        return {
+            "index": index,
+            "start": round(self.start, 3),
+            "end": round(self.end, 3),
+            "text": self.text,
+            "words": [word.to_dict() for word in self.words],
+        }
+
+
+@dataclass
+class SpeechChunk:
+    """A stretch of audio between silences, in seconds."""
+    start: float
+    end: float
+    
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def estimate_words(text: str, start: float, end: float) -> List[TimedWord]:
+    """
+    Spread a time span over the words of a text in proportion to their length.
+    
+    Args:
+        text: Text of the span
+        start: Start time in seconds
+        end: End time in seconds
+    
+    Returns:
+        Timed words covering [start, end]
+    """
+    words = text.split()
+    if not words:
+        return []
+    weights = [max(1, len(word.strip("".join(SENTENCE_END) + ",;:\"'"))) for word in words]
+    per_unit = max(0.0, end - start) / sum(weights)
+    
+    timed = []
+    cursor = start
+    for word, weight in zip(words, weights):
+        timed.append(TimedWord(word, cursor, cursor + weight * per_unit))
+        cursor += weight * per_unit
+    timed[-1].end = end
+    return timed
+
+
+def group_words(words: List[TimedWord], max_seconds: float, source: str) -> List[TimedSegment]:
+    """
+    Group timed words into segments.
+    
+    A segment ends after a word with sentence punctuation, or before a word
+    that would make it longer than max_seconds.
+    
+    Args:
+        words: Timed words in order
+        max_seconds: Longest segment to build (unless a single word is longer)
+        source: Source recorded on the segments
+    
+    Returns:
+        Segments in order
+    """
+    segments: List[TimedSegment] = []
+    current: List[TimedWord] = []
+    for word in words:
+        if current and word.end - current[0].start > max_seconds:
+            segments.append(_segment_of(current, source))
+            current = []
+        current.append(word)
+        if word.text.endswith(SENTENCE_END):
+            segments.append(_segment_of(current, source))
+            current = []
+    if current:
+        segments.append(_segment_of(current, source))
+    return segments
+
+
+def _segment_of(words: List[TimedWord], source: str) -> TimedSegment:
+    return TimedSegment(words[0].start, words[-1].end, " ".join(word.text for word in words), words, source)
+
+
+def _seconds(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _upstream_words(items: Iterable, offset: float) -> Optional[List[TimedWord]]:
+    words = []
+    for item in items:
+        if not isinstance(item, dict):
+            return None
+        text = str(item.get("word", item.get("text", ""))).strip()
+        start, end = _seconds(item.get("start")), _seconds(item.get("end"))
+        if start is None or end is None:
+            return None
+        if text:
+            words.append(TimedWord(text, offset + start, offset + end))
+    return words
+
+
+def upstream_segments(asr_result: Dict, offset: float, max_seconds: float) -> Optional[List[TimedSegment]]:
+    """
+    Read the timestamps an ASR response carries, if any.
+    
+    Accepts `segments` (each with start, end, text and optionally `words`)
+    or a flat `words` list (each with word/text, start, end), in seconds.
+    
+    Args:
+        asr_result: Parsed ASR API response
+        offset: Start of the transcribed audio within the file, in seconds
+        max_seconds: Longest segment to build from a flat word list
+    
+    Returns:
+        Segments with times relative to the file, or None if the response
+        has no usable timestamps
+    """
+    segments = asr_result.get("segments")
+    if isinstance(segments, list) and segments:
+        timed = []
+        for item in segments:
+            if not isinstance(item, dict):
+                return None
+            start, end = _seconds(item.get("start")), _seconds(item.get("end"))
+            if start is None or end is None:
+                return None
+            text = str(item.get("text", "")).strip()
+            words = _upstream_words(item.get("words") or [], offset)
+            if words is None or (text and not words):
+                words = estimate_words(text, offset + start, offset + end)
+            if text:
+                timed.append(TimedSegment(offset + start, offset + end, text, words, UPSTREAM))
+        return timed
+    
+    words = asr_result.get("words")
+    if isinstance(words, list) and words:
+        timed_words = _upstream_words(words, offset)
+        if timed_words:
+            return group_words(timed_words, max_seconds, UPSTREAM)
+    return None
+
+
+def timed_segments(
+    asr_result: Dict,
+    start: float,
+    end: float,
+    max_seconds: float,
+    source: str,
+    offset: Optional[float] = None,
+) -> List[TimedSegment]:
+    """
+    Build the timed segments for one transcribed span of audio.
+    
+    Args:
+        asr_result: Parsed ASR API response for the span
+        start: Start of the span within the file, in seconds
+        end: End of the span, in seconds
+        max_seconds: Longest segment to build when times are estimated
+        source: Source to record when the upstream has no timestamps
+        offset: Time in the file where the audio sent upstream starts
+            (upstream timestamps are relative to it); defaults to start
+    
+    Returns:
+        Upstream segments if the response has timestamps, otherwise the
+        transcription spread over [start, end]
+    """
+    segments = upstream_segments(asr_result, start if offset is None else offset, max_seconds)
+    if segments is not None:
+        return segments
+    text = (asr_result.get("transcription") or "").strip()
+    words = estimate_words(text, start, end)
+    if source == VOICE_ACTIVITY:
+        # The chunk is the segment: its boundaries are measured, not estimated
+        return [TimedSegment(start, end, text, words, VOICE_ACTIVITY)] if words else []
+    return group_words(words, max_seconds, source)
+
+
+def plan_chunks(
+    silences: List[Tuple[float, float]],
+    duration: float,
+    max_seconds: float,
+    min_seconds: float = 1.0,
+) -> List[SpeechChunk]:
+    """
+    Turn detected silences into speech chunks.
+    
+    Args:
+        silences: (start, end) of each silence, in order
+        duration: Duration of the audio
+        max_seconds: Chunks longer than this are split evenly
+        min_seconds: Chunks shorter than this are merged into the previous
+            one when the result stays within max_seconds
+    
+    Returns:
+        Speech chunks in order
+    """
+    speech = []
+    cursor = 0.0
+    for silence_start, silence_end in silences:
+        if silence_start > cursor:
+            speech.append((cursor, min(silence_start, duration)))
+        cursor = max(cursor, silence_end)
+    if duration > cursor:
+        speech.append((cursor, duration))
+    
+    chunks: List[SpeechChunk] = []
+    for start, end in speech:
+        if end - start <= 0.0:
+            continue
+        if end - start < min_seconds and chunks and end - chunks[-1].start <= max_seconds:
+            chunks[-1].end = end
+            continue
+        pieces = max(1, math.ceil((end - start) / max_seconds))
+        step = (end - start) / pieces
+        for piece in range(pieces):
+            chunks.append(SpeechChunk(start + piece * step, end if piece == pieces - 1 else start + (piece + 1) * step))
+    return chunks
+
+
+class DecodedSpeech:
+    """
+    Decoded audio (PCM in a temporary file) with its speech chunks.
+    
+    Close it (or use it as a context manager) to delete the file.
+    """
+    
+    def __init__(self, pcm_file, sample_rate: int, chunks: List[SpeechChunk], padding_seconds: float):
+        self._pcm = pcm_file
+        self.sample_rate = sample_rate
+        self.chunks = chunks
+        self.padding_seconds = padding_seconds
+        self.duration_seconds = os.fstat(pcm_file.fileno()).st_size / (2 * sample_rate)
+    
+    def read_wav(self, chunk: SpeechChunk) -> Tuple[float, bytes]:
+        """
+        Read a chunk, with a little padding on both sides, as a WAV file.
+        
+        Returns:
+            (offset, wav): the time in the file where the WAV starts, and its bytes
+        """
+        start = int(max(0.0, chunk.start - self.padding_seconds) * self.sample_rate)
+        end = int(min(self.duration_seconds, chunk.end + self.padding_seconds) * self.sample_rate)
+        # Positional read: chunks are read concurrently from worker threads
+        samples = os.pread(self._pcm.fileno(), (end - start) * 2, start * 2)
+        fmt_chunk = struct.pack("<HHIIHH", 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16)
+        return start / self.sample_rate, build_wav(fmt_chunk, samples)
+    
+    def close(self) -> None:
+        self._pcm.close()
+    
+    def __enter__(self) -> "DecodedSpeech":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SpeechSegmenter:
+    """
+    Decodes uploads with ffmpeg and splits them into speech chunks.
+    
+    Chunks are cut at detected silences, so each one holds whole words and
+    its boundaries time the resulting segment.
+    """
+    
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        silence_threshold_db: float = -35.0,
+        min_silence_seconds: float = 0.4,
+        max_segment_seconds: float = 15.0,
+        padding_seconds: float = 0.15,
+        ffmpeg_path: str = "ffmpeg",
+        timeout_seconds: float = 120.0,
+        enabled: bool = True,
+    ):
+        self.sample_rate = sample_rate
+        self.silence_threshold_db = silence_threshold_db
+        self.min_silence_seconds = min_silence_seconds
+        self.max_segment_seconds = max_segment_seconds
+        self.padding_seconds = padding_seconds
+        self.timeout_seconds = timeout_seconds
+        self.ffmpeg = shutil.which(ffmpeg_path) if enabled else None
+        if enabled and self.ffmpeg is None:
+            logger.warning("ffmpeg not found (%s); ASR timestamps are estimated over whole files", ffmpeg_path)
+        
+        self.decoded = 0
+        self.failures = 0
+        self.chunks = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """True if uploads are split at silences."""
+        return self.ffmpeg is not None
+    
+    async def split(self, content: bytes, audio_format: str) -> Optional[DecodedSpeech]:
+        """
+        Decode an upload and find its speech chunks.
+        
+        Args:
+            content: Uploaded audio bytes
+            audio_format: Format probed from the upload (used as the file suffix)
+        
+        Returns:
+            DecodedSpeech (with no chunks if the file is silent), or None if
+            segmentation is disabled or ffmpeg failed
+        """
+        if not self.enabled:
+            return None
+        
+        pcm = tempfile.TemporaryFile()
+        try:
+            silences = await self._run_ffmpeg(content, audio_format, pcm)
+            speech = DecodedSpeech(pcm, self.sample_rate, [], self.padding_seconds)
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            pcm.close()
+            self.failures += 1
+            logger.warning(
+                "Speech segmentation failed, transcribing the whole file: %s", e,
+                extra={"event": "asr_segmentation_failed", "format": audio_format}
+            )
+            return None
+        except BaseException:
+            pcm.close()
+            raise
+        
+        speech.chunks = plan_chunks(silences, speech.duration_seconds, self.max_segment_seconds)
+        self.decoded += 1
+        self.chunks += len(speech.chunks)
+        logger.debug(
+            "Audio split into %s speech chunks (%.1fs)", len(speech.chunks), speech.duration_seconds,
+            extra={"event": "asr_segmented", "chunks": len(speech.chunks), "duration_seconds": speech.duration_seconds}
+        )
+        return speech
+    
+    async def _run_ffmpeg(self, content: bytes, audio_format: str, pcm) -> List[Tuple[float, float]]:
+        detect = f"silencedetect=noise={self.silence_threshold_db:g}dB:d={self.min_silence_seconds:g}"
+        
+        # Read from a file, not a pipe: MP4 files often keep their index at the end
+        with tempfile.NamedTemporaryFile(suffix=f".{audio_format}") as source:
+            await asyncio.to_thread(self._write_source, source, content)
+            process = await asyncio.create_subprocess_exec(
+                self.ffmpeg, "-nostdin", "-hide_banner", "-nostats", "-loglevel", "info",
+                "-i", source.name,
+                "-af", detect,
+                "-ar", str(self.sample_rate), "-ac", "1",
+                "-f", "s16le", "pipe:1",
+                stdout=pcm,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), self.timeout_seconds)
+            except BaseException:
+                process.kill()
+                await process.wait()
+                raise
+        
+        log = stderr.decode("utf-8", "replace")
+        if process.returncode != 0:
+            raise ValueError(f"ffmpeg exited with {process.returncode}: {log.strip()[-200:]}")
+        
+        silences = []
+        silence_start = None
+        for kind, value in _SILENCE_RE.findall(log):
+            if kind == "start":
+                silence_start = max(0.0, float(value))
+            elif silence_start is not None:
+                silences.append((silence_start, float(value)))
+                silence_start = None
+        if silence_start is not None:
+            # Silent until the end of the file
+            silences.append((silence_start, float("inf")))
+        return silences
+    
+    @staticmethod
+    def _write_source(source, content: bytes) -> None:
+        source.write(content)
+        source.flush()
+    
+    def stats(self) -> Dict[str, object]:
+        """Return segmentation counters for health/metrics output."""
+        return {
+            "enabled": self.enabled,
+            "decoded": self.decoded,
+            "failures": self.failures,
+            "chunks": self.chunks,
+        }
+
+
+def create_speech_segmenter_from_env() -> SpeechSegmenter:
+    """
+    Build the speech segmenter from environment variables.
+    
+    Environment:
+        ASR_VAD_SEGMENTATION: "true" (default) or "false" to transcribe whole files
+        ASR_VAD_SILENCE_DB: Level below which audio counts as silence
+        ASR_VAD_MIN_SILENCE_SECONDS: Shortest pause that ends a segment
+        ASR_MAX_SEGMENT_SECONDS: Longest segment (subtitle cue)
+        FFMPEG_PATH: ffmpeg executable (name on PATH or full path)
+    
+    Returns:
+        A SpeechSegmenter instance
+    """
+    return SpeechSegmenter(
+        silence_threshold_db=float(os.getenv("ASR_VAD_SILENCE_DB", "-35")),
+        min_silence_seconds=float(os.getenv("ASR_VAD_MIN_SILENCE_SECONDS", "0.4")),
+        max_segment_seconds=float(os.getenv("ASR_MAX_SEGMENT_SECONDS", "15")),
+        ffmpeg_path=os.getenv("FFMPEG_PATH", "ffmpeg"),
+        enabled=os.getenv("ASR_VAD_SEGMENTATION", "true").lower() == "true",
+    )
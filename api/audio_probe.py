@@ -0,0 +1,379 @@
+"""
+Audio container sniffing and a cheap metadata probe.
+
+Uploads are identified by their magic bytes, not their filename, and the
+first few KB are parsed for duration, sample rate and channel count. This
+runs before the full file is read, so mislabeled, corrupt or over-long audio
+is rejected without being buffered or sent to the GPU services, and the
+probed metadata is reused downstream (timeouts, response metadata).
+
+Only container headers are parsed - nothing is decoded. When the header
+doesn't carry an exact duration (e.g. CBR MP3 without a Xing header, an M4A
+whose moov box is at the end, or a WAV whose data chunk follows large
+metadata chunks), the duration is estimated from the file size and bitrate
+and marked as estimated.
+
+MP4 containers are only accepted with an audio brand (M4A, ...) or a generic
+ISO brand, and are rejected if the probed header shows a video track, so
+MP4/MOV/3GP video uploads don't pass as audio.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+# How much of the file the probe reads
+PROBE_BYTES = 16 * 1024
+
+MIME_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "flac": "audio/flac",
+    "ogg": "audio/ogg",
+    "m4a": "audio/mp4",
+    "aac": "audio/aac",
+    "wma": "audio/x-ms-wma",
+    "aiff": "audio/aiff",
+}
+
+# Fallback bitrate (bytes per second, ~128 kbps) when the header has none
+DEFAULT_BYTES_PER_SECOND = 16000
+
+# Fallback for uncompressed PCM (WAV/AIFF) whose format chunk is beyond the
+# probe: CD quality, 44.1 kHz 16-bit stereo
+PCM_BYTES_PER_SECOND = 44100 * 2 * 2
+
+# ftyp brands of audio-only MP4 files
+M4A_BRANDS = frozenset({b"M4A ", b"M4B ", b"M4P ", b"F4A ", b"F4B "})
+# Generic ISO brands used by audio and video files alike (checked for a video track)
+ISO_BRANDS = frozenset({b"isom", b"iso2", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"dash"})
+
+ASF_HEADER_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+ASF_FILE_PROPERTIES_GUID = bytes.fromhex("a1dcab8c47a9cf118ee400c00c205365")
+
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+MP3_BITRATES = {
+    (3, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (3, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (3, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+
+class AudioProbeError(ValueError):
+    """Raised when a file is not recognizable or well-formed audio."""
+
+
+@dataclass
+class AudioProbe:
+    """
+    Metadata probed from an audio file header.
+    
+    Attributes:
+        format: Container format ("wav", "mp3", "flac", "ogg", "m4a", "aac", "wma", "aiff")
+        size_bytes: Total file size
+        duration_seconds: Duration (exact unless duration_estimated)
+        sample_rate: Sample rate in Hz, if known
+        channels: Channel count, if known
+        duration_estimated: True if the duration was derived from size and bitrate
+    """
+    format: str
+    size_bytes: int
+    duration_seconds: float
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    duration_estimated: bool = False
+    
+    @property
+    def mime_type(self) -> str:
+        """MIME type of the container."""
+        return MIME_TYPES[self.format]
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """
+    Identify the audio container from its magic bytes.
+    
+    Args:
+        header: Leading bytes of the file
+    
+    Returns:
+        Format name, or None if the header is not a known audio container
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if header[4:8] == b"ftyp" and _is_audio_mp4_brand(header):
+        return "m4a"
+    if header[:16] == ASF_HEADER_GUID:
+        return "wma"
+    if header[:3] == b"ID3":
+        return "mp3"
+    if len(header) >= 2 and header[0] == 0xFF:
+        if header[1] & 0xF6 == 0xF0:
+            return "aac"
+        if header[1] & 0xE0 == 0xE0 and (header[1] >> 1) & 3:
+            return "mp3"
+    return None
+
+
+def _is_audio_mp4_brand(header: bytes) -> bool:
+    major = header[8:12]
+    # QuickTime ("qt  ") and 3GPP ("3gp4", "3g2a", ...) files are video containers
+    if major == b"qt  " or major.startswith(b"3g"):
+        return False
+    # Major brand, then the compatible brands up to the end of the ftyp box
+    box_end = min(struct.unpack_from(">I", header)[0], len(header))
+    brands = {header[offset:offset + 4] for offset in range(16, box_end - 3, 4)}
+    brands.add(major)
+    return bool(brands & (M4A_BRANDS | ISO_BRANDS))
+
+
+def probe_audio(header: bytes, size_bytes: int) -> AudioProbe:
+    """
+    Sniff the container and probe duration, sample rate and channels.
+    
+    Args:
+        header: Leading bytes of the file (PROBE_BYTES is enough)
+        size_bytes: Total file size
+    
+    Returns:
+        AudioProbe with the file's metadata
+    
+    Raises:
+        AudioProbeError: If the format is unknown or the header is corrupt
+    """
+    audio_format = sniff_format(header)
+    if audio_format is None:
+        raise AudioProbeError("Unrecognized audio format")
+    
+    try:
+        probe = _PROBES[audio_format](header, size_bytes)
+    except (struct.error, IndexError, ZeroDivisionError, KeyError) as e:
+        raise AudioProbeError(f"Corrupt {audio_format} header") from e
+    
+    if probe.duration_seconds <= 0:
+        raise AudioProbeError(f"{audio_format} file contains no audio")
+    return probe
+
+
+def _estimated(audio_format: str, size_bytes: int, bytes_per_second: float = DEFAULT_BYTES_PER_SECOND,
+               sample_rate: Optional[int] = None, channels: Optional[int] = None, skip_bytes: int = 0) -> AudioProbe:
+    # skip_bytes: leading non-audio bytes (e.g. an ID3 tag)
+    return AudioProbe(
+        format=audio_format,
+        size_bytes=size_bytes,
+        duration_seconds=max(0, size_bytes - skip_bytes) / (bytes_per_second or DEFAULT_BYTES_PER_SECOND),
+        sample_rate=sample_rate,
+        channels=channels,
+        duration_estimated=True,
+    )
+
+
+def _probe_wav(header: bytes, size_bytes: int) -> AudioProbe:
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack_from("<I", header, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", header, body)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioProbeError("WAV data chunk appears before the fmt chunk")
+            _, channels, sample_rate, byte_rate, _, bits = fmt
+            if not channels or not sample_rate or not bits:
+                raise AudioProbeError("Invalid WAV format chunk")
+            # Streaming encoders sometimes write 0 or 0xFFFFFFFF as the data size
+            available = size_bytes - body
+            data_size = min(chunk_size, available) if chunk_size else available
+            return AudioProbe(
+                format="wav",
+                size_bytes=size_bytes,
+                duration_seconds=data_size / (byte_rate or sample_rate * channels * bits // 8),
+                sample_rate=sample_rate,
+                channels=channels,
+            )
+        offset = body + chunk_size + (chunk_size & 1)
+    
+    # Large metadata chunks (LIST, bext, iXML from field recorders) can push
+    # the data chunk past the probe; estimate from the format instead
+    if fmt is None:
+        return _estimated("wav", size_bytes, PCM_BYTES_PER_SECOND, skip_bytes=min(offset, size_bytes))
+    _, channels, sample_rate, byte_rate, _, bits = fmt
+    return _estimated(
+        "wav", size_bytes, byte_rate or sample_rate * channels * bits // 8 or PCM_BYTES_PER_SECOND,
+        sample_rate or None, channels or None, min(offset, size_bytes)
+    )
+
+
+def _probe_flac(header: bytes, size_bytes: int) -> AudioProbe:
+    # The first metadata block is always STREAMINFO
+    if header[4] & 0x7F != 0:
+        raise AudioProbeError("FLAC stream has no STREAMINFO block")
+    info = header[8:8 + 34]
+    packed = int.from_bytes(info[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate:
+        raise AudioProbeError("Invalid FLAC sample rate")
+    if not total_samples:
+        return _estimated("flac", size_bytes, sample_rate * channels * 2 * 0.6, sample_rate, channels)
+    return AudioProbe("flac", size_bytes, total_samples / sample_rate, sample_rate, channels)
+
+
+def _probe_ogg(header: bytes, size_bytes: int) -> AudioProbe:
+    packet = header[27 + header[26]:]
+    if packet[:7] == b"\x01vorbis":
+        channels = packet[11]
+        sample_rate, _, nominal_bitrate = struct.unpack_from("<IiI", packet, 12)
+        return _estimated("ogg", size_bytes, (nominal_bitrate or 128000) / 8, sample_rate, channels)
+    if packet[:8] == b"OpusHead":
+        # Opus always decodes at 48 kHz; typical speech bitrates are ~32 kbps
+        return _estimated("ogg", size_bytes, 4000, 48000, packet[9])
+    return _estimated("ogg", size_bytes)
+
+
+def _probe_aiff(header: bytes, size_bytes: int) -> AudioProbe:
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack_from(">I", header, offset + 4)[0]
+        if chunk_id == b"COMM":
+            channels, frames, _ = struct.unpack_from(">HIH", header, offset + 8)
+            exponent, mantissa = struct.unpack_from(">HQ", header, offset + 16)
+            sample_rate = int(mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63))
+            if not channels or not sample_rate:
+                raise AudioProbeError("Invalid AIFF COMM chunk")
+            return AudioProbe("aiff", size_bytes, frames / sample_rate, sample_rate, channels)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    # COMM follows large metadata chunks beyond the probe; assume CD-quality PCM
+    return _estimated("aiff", size_bytes, PCM_BYTES_PER_SECOND, skip_bytes=min(offset, size_bytes))
+
+
+def _iter_boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise AudioProbeError("Corrupt MP4 box")
+        yield box_type, offset + header_size, min(offset + size, end)
+        offset += size
+
+
+def _probe_m4a(header: bytes, size_bytes: int) -> AudioProbe:
+    for box_type, body, end in _iter_boxes(header, 0, len(header)):
+        if box_type != b"moov":
+            continue
+        duration, sample_rate = None, None
+        for child, child_body, child_end in _iter_boxes(header, body, end):
+            if child == b"mvhd":
+                if header[child_body] == 1:
+                    timescale, length = struct.unpack_from(">IQ", header, child_body + 20)
+                else:
+                    timescale, length = struct.unpack_from(">II", header, child_body + 12)
+                duration = length / timescale
+            elif child == b"trak":
+                for trak_child, mdia_body, mdia_end in _iter_boxes(header, child_body, child_end):
+                    if trak_child != b"mdia":
+                        continue
+                    track_rate, handler = None, None
+                    for mdia_child, mdia_child_body, _ in _iter_boxes(header, mdia_body, mdia_end):
+                        if mdia_child == b"mdhd":
+                            # Audio tracks use the sample rate as their timescale
+                            offset = 20 if header[mdia_child_body] == 1 else 12
+                            track_rate = struct.unpack_from(">I", header, mdia_child_body + offset)[0]
+                        elif mdia_child == b"hdlr":
+                            handler = header[mdia_child_body + 8:mdia_child_body + 12]
+                    if handler == b"vide":
+                        raise AudioProbeError("MP4 file contains a video track")
+                    if handler in (b"soun", None) and sample_rate is None:
+                        sample_rate = track_rate
+        if duration is not None:
+            return AudioProbe("m4a", size_bytes, duration, sample_rate)
+    # moov is often written after the audio data; fall back to an estimate
+    return _estimated("m4a", size_bytes)
+
+
+def _probe_aac(header: bytes, size_bytes: int) -> AudioProbe:
+    sample_rate = ADTS_SAMPLE_RATES[(header[2] >> 2) & 0xF]
+    channels = ((header[2] & 1) << 2) | (header[3] >> 6)
+    frame_length = ((header[3] & 3) << 11) | (header[4] << 3) | (header[5] >> 5)
+    if frame_length < 7:
+        raise AudioProbeError("Invalid ADTS frame length")
+    # Each ADTS frame holds 1024 samples
+    return _estimated("aac", size_bytes, frame_length * sample_rate / 1024, sample_rate, channels or None)
+
+
+def _probe_mp3(header: bytes, size_bytes: int) -> AudioProbe:
+    offset = 0
+    if header[:3] == b"ID3":
+        tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        offset = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+        if offset + 4 > len(header):
+            # Large tag (e.g. cover art) - the first frame is beyond the probe
+            return _estimated("mp3", size_bytes, skip_bytes=offset)
+    
+    b1, b2, b3 = header[offset + 1], header[offset + 2], header[offset + 3]
+    if header[offset] != 0xFF or b1 & 0xE0 != 0xE0:
+        raise AudioProbeError("No MPEG audio frame found")
+    version, layer = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer == 0 or rate_index == 3 or bitrate_index == 15:
+        raise AudioProbeError("Invalid MPEG audio frame header")
+    
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    channels = 1 if b3 >> 6 == 3 else 2
+    bitrate = MP3_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    samples_per_frame = 384 if layer == 3 else (1152 if layer == 2 or version == 3 else 576)
+    
+    # A Xing/Info (or VBRI) header in the first frame carries the exact frame count
+    frames = None
+    xing = offset + 4 + ((32 if channels == 2 else 17) if version == 3 else (17 if channels == 2 else 9))
+    if header[xing:xing + 4] in (b"Xing", b"Info") and header[xing + 7] & 1:
+        frames = struct.unpack_from(">I", header, xing + 8)[0]
+    elif header[offset + 36:offset + 40] == b"VBRI":
+        frames = struct.unpack_from(">I", header, offset + 50)[0]
+    if frames:
+        return AudioProbe("mp3", size_bytes, frames * samples_per_frame / sample_rate, sample_rate, channels)
+    
+    if not bitrate:
+        return _estimated("mp3", size_bytes, sample_rate=sample_rate, channels=channels, skip_bytes=offset)
+    return _estimated("mp3", size_bytes, bitrate / 8, sample_rate, channels, offset)
+
+
+def _probe_wma(header: bytes, size_bytes: int) -> AudioProbe:
+    index = header.find(ASF_FILE_PROPERTIES_GUID)
+    if index < 0:
+        return _estimated("wma", size_bytes)
+    # Play duration is in 100ns units and includes the preroll (in ms)
+    play_duration, _, preroll = struct.unpack_from("<QQQ", header, index + 64)
+    return AudioProbe("wma", size_bytes, max(0.0, play_duration / 1e7 - preroll / 1000))
+
+
+_PROBES = {
+    "wav": _probe_wav,
+    "flac": _probe_flac,
+    "ogg": _probe_ogg,
+    "aiff": _probe_aiff,
+    "m4a": _probe_m4a,
+    "aac": _probe_aac,
+    "mp3": _probe_mp3,
+    "wma": _probe_wma,
+}
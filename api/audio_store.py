@@ -0,0 +1,380 @@
+"""
+Content-addressed audio storage for generated TTS artifacts.
+
+Generated audio is written once under the SHA-256 of its bytes and then
+referenced by a short key (e.g. ``3f9a...c1.wav``) instead of being shipped
+around as a multi-megabyte base64 ``data:`` URL. Identical clips therefore
+share one blob, and a key never points at different content.
+
+Backends:
+- LocalAudioStore: plain files on the local filesystem (default), optionally
+  capped by total size and age (oldest blobs are deleted first)
+- S3AudioStore: any S3-compatible object store (requires ``boto3``); use a
+  bucket lifecycle rule for retention
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keys are "<sha256 hex>.<ext>" - anything else is rejected before touching storage
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}\.(wav|mp3|ogg|flac)")
+
+CONTENT_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+    "flac": "audio/flac",
+}
+
+
+@dataclass
+class StoredAudio:
+    """
+    Result of writing audio into a store.
+    
+    Attributes:
+        key: Content-addressed storage key ("<sha256>.<ext>")
+        size: Size of the stored audio in bytes
+        content_type: MIME type of the stored audio
+    """
+    key: str
+    size: int
+    content_type: str
+
+
+def make_key(data: bytes, extension: str = "wav") -> str:
+    """
+    Build the content-addressed key for an audio payload.
+    
+    Args:
+        data: Raw audio bytes
+        extension: File extension of the audio format
+    
+    Returns:
+        Storage key in the form "<sha256 hex>.<ext>"
+    """
+    return f"{hashlib.sha256(data).hexdigest()}.{extension}"
+
+
+def is_valid_key(key: str) -> bool:
+    """Return True if key looks like a key produced by make_key()."""
+    return bool(KEY_PATTERN.fullmatch(key))
+
+
+def content_type_for_key(key: str) -> str:
+    """Return the MIME type for a storage key based on its extension."""
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def etag_for_key(key: str) -> str:
+    """
+    Return the strong ETag for a storage key.
+    
+    Keys are content hashes, so the hash itself is a valid strong validator.
+    """
+    return f'"{key.split(".", 1)[0]}"'
+
+
+class AudioStore(ABC):
+    """
+    Abstract content-addressed audio store.
+    
+    All methods are blocking; call them from a worker thread when running
+    inside the event loop.
+    """
+    
+    def put(self, data: bytes, extension: str = "wav") -> StoredAudio:
+        """
+        Store audio bytes under their content hash.
+        
+        Writing the same bytes twice is a no-op and returns the same key.
+        """
+        key = make_key(data, extension)
+        if not self.exists(key):
+            self._write(key, data)
+        return StoredAudio(key=key, size=len(data), content_type=content_type_for_key(key))
+    
+    @abstractmethod
+    def _write(self, key: str, data: bytes) -> None:
+        """Persist data under key."""
+    
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Return True if key is present in the store."""
+    
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Return the size of the blob in bytes, or None if it does not exist."""
+    
+    @abstractmethod
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        """Return bytes [start, end] (inclusive) of the blob."""
+    
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield bytes [start, end] (inclusive) of the blob in chunks."""
+        yield self.read_range(key, start, end)
+    
+    def local_path(self, key: str) -> Optional[str]:
+        """Return a filesystem path for key if the backend has one, else None."""
+        return None
+
+
+class LocalAudioStore(AudioStore):
+    """
+    Audio store backed by the local filesystem.
+    
+    Blobs are fanned out into two levels of subdirectories
+    (``root/ab/cd/abcd....wav``) to keep directory sizes small.
+    
+    With max_bytes or max_age_seconds set, the least recently written blobs
+    are deleted once the store outgrows max_bytes (down to 90% of it) or the
+    blobs get older than max_age_seconds (checked at most every
+    prune_interval_seconds). Storing existing audio again refreshes its age.
+    """
+    
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 0,
+        max_age_seconds: float = 0.0,
+        prune_interval_seconds: float = 3600.0,
+    ):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.prune_interval_seconds = prune_interval_seconds
+        self.pruned = 0
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self._size = sum(size for _, size, _ in self._scan()) if self._bounded else 0
+    
+    @property
+    def _bounded(self) -> bool:
+        return bool(self.max_bytes or self.max_age_seconds)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+    
+    def _scan(self) -> List[Tuple[str, int, float]]:
+        # (path, size, mtime) of every stored blob
+        blobs = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not KEY_PATTERN.fullmatch(name):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((path, stat.st_size, stat.st_mtime))
+        return blobs
+    
+    def put(self, data: bytes, extension: str = "wav") -> StoredAudio:
+        stored = super().put(data, extension)
+        if self._bounded:
+            try:
+                # Recently requested audio is pruned last
+                os.utime(self._path(stored.key))
+            except OSError:
+                pass
+            self._maybe_prune()
+        return stored
+    
+    def _maybe_prune(self) -> None:
+        with self._lock:
+            over_size = self.max_bytes and self._size > self.max_bytes
+            age_due = self.max_age_seconds and time.monotonic() - self._last_prune >= self.prune_interval_seconds
+            if over_size or age_due:
+                self.prune()
+    
+    def prune(self) -> int:
+        """
+        Delete expired blobs, then the oldest ones until under the size cap.
+        
+        Returns:
+            Number of blobs deleted
+        """
+        self._last_prune = time.monotonic()
+        blobs = sorted(self._scan(), key=lambda blob: blob[2])
+        total = sum(size for _, size, _ in blobs)
+        cutoff = time.time() - self.max_age_seconds if self.max_age_seconds else None
+        target = int(self.max_bytes * 0.9) if self.max_bytes else None
+        
+        deleted = 0
+        for path, size, mtime in blobs:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and (target is None or total <= target):
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        
+        self._size = total
+        self.pruned += deleted
+        if deleted:
+            logger.info("Pruned %s blobs from the audio store", deleted, extra={"event": "audio_store_pruned", "blobs": deleted})
+        return deleted
+    
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Write to a temp file and rename so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._size += len(data)
+    
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+    
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+    
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+    
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+class S3AudioStore(AudioStore):
+    """
+    Audio store backed by an S3-compatible object store.
+    
+    Works with AWS S3, Cloudflare R2, MinIO, etc. via ``endpoint_url``.
+    """
+    
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "audio/",
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+    ):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("S3 audio store requires boto3 (pip install boto3)") from e
+        
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name)
+    
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+    
+    def _write(self, key: str, data: bytes) -> None:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=data,
+            ContentType=content_type_for_key(key),
+        )
+    
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+    
+    def size(self, key: str) -> Optional[int]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client_error:
+            return None
+        return int(head["ContentLength"])
+    
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        result = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Range=f"bytes={start}-{end}",
+        )
+        return result["Body"].read()
+    
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        result = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Range=f"bytes={start}-{end}",
+        )
+        yield from result["Body"].iter_chunks(chunk_size)
+
+
+def create_audio_store_from_env() -> Optional[AudioStore]:
+    """
+    Build the configured audio store from environment variables.
+    
+    Environment:
+        AUDIO_STORE_BACKEND: "local" (default), "s3", or "none" to keep data URLs
+        AUDIO_STORE_DIR: Root directory for the local backend
+        AUDIO_STORE_MAX_MB: Size cap of the local backend (0 = unlimited)
+        AUDIO_STORE_MAX_AGE_DAYS: Age cap of the local backend (0 = keep forever)
+        AUDIO_STORE_S3_BUCKET / AUDIO_STORE_S3_PREFIX / AUDIO_STORE_S3_ENDPOINT /
+        AUDIO_STORE_S3_REGION: Settings for the S3 backend
+    
+    Returns:
+        An AudioStore instance, or None if storage is disabled
+    """
+    backend = os.getenv("AUDIO_STORE_BACKEND", "local").lower()
+    
+    if backend == "none":
+        return None
+    
+    if backend == "local":
+        return LocalAudioStore(
+            os.getenv("AUDIO_STORE_DIR", "./audio_store"),
+            max_bytes=int(os.getenv("AUDIO_STORE_MAX_MB", "1024")) * 1024 * 1024,
+            max_age_seconds=float(os.getenv("AUDIO_STORE_MAX_AGE_DAYS", "0")) * 86400,
+        )
+    
+    if backend == "s3":
+        bucket = os.getenv("AUDIO_STORE_S3_BUCKET")
+        if not bucket:
+            raise ValueError("AUDIO_STORE_S3_BUCKET environment variable is required for the s3 audio store")
+        return S3AudioStore(
+            bucket=bucket,
+            prefix=os.getenv("AUDIO_STORE_S3_PREFIX", "audio/"),
+            endpoint_url=os.getenv("AUDIO_STORE_S3_ENDPOINT"),
+            region_name=os.getenv("AUDIO_STORE_S3_REGION"),
+        )
+    
+    raise ValueError(f"Unknown AUDIO_STORE_BACKEND: {backend}")
@@ -0,0 +1,193 @@
+"""
+Lightweight WAV helpers used by the API.
+
+Only the RIFF container is touched - samples are never decoded - so these
+helpers stay cheap enough to run inline on the request path. The one
+exception is conform_sample_rates(), which resamples PCM with the C
+implementation in audioop (when available) so segments synthesized at
+different rates can still be spliced.
+"""
+
+import struct
+import warnings
+from dataclasses import dataclass
+from typing import List
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:  # removed in Python 3.13: rates can't be conformed
+        audioop = None
+
+WAVE_FORMAT_PCM = 1
+
+
+@dataclass
+class WavInfo:
+    """
+    Parsed layout of a RIFF/WAVE file.
+    
+    Attributes:
+        fmt_chunk: Raw payload of the "fmt " chunk
+        audio_format: WAVE format tag (1 = PCM, 3 = float, 0xFFFE = extensible)
+        channels: Number of channels
+        sample_rate: Samples per second
+        bits_per_sample: Bits per sample
+        data_offset: Offset of the sample data within the file
+        data_size: Size of the sample data in bytes
+    """
+    fmt_chunk: bytes
+    audio_format: int
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+    
+    @property
+    def duration_seconds(self) -> float:
+        """Duration of the audio in seconds."""
+        bytes_per_second = self.sample_rate * self.channels * self.bits_per_sample // 8
+        return self.data_size / bytes_per_second if bytes_per_second else 0.0
+
+
+def parse_wav(data: bytes) -> WavInfo:
+    """
+    Parse the chunk layout of a WAV file.
+    
+    Args:
+        data: Complete WAV file bytes
+    
+    Returns:
+        WavInfo describing the format and location of the sample data
+    
+    Raises:
+        ValueError: If data is not a well-formed WAV file
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    
+    fmt_chunk = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = offset + 8
+        
+        if chunk_id == b"fmt ":
+            fmt_chunk = data[body:body + chunk_size]
+        elif chunk_id == b"data":
+            if fmt_chunk is None or len(fmt_chunk) < 16:
+                raise ValueError("WAV data chunk appears before a valid fmt chunk")
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", fmt_chunk)
+            # Streaming encoders sometimes write 0 or 0xFFFFFFFF as the data size
+            data_size = min(chunk_size, len(data) - body) if chunk_size else len(data) - body
+            return WavInfo(
+                fmt_chunk=fmt_chunk,
+                audio_format=audio_format,
+                channels=channels,
+                sample_rate=sample_rate,
+                bits_per_sample=bits,
+                data_offset=body,
+                data_size=data_size,
+            )
+        
+        # Chunks are padded to an even size
+        offset = body + chunk_size + (chunk_size & 1)
+    
+    raise ValueError("WAV file has no data chunk")
+
+
+def build_wav(fmt_chunk: bytes, samples: bytes) -> bytes:
+    """
+    Build a WAV file from a fmt chunk payload and raw sample data.
+    
+    Args:
+        fmt_chunk: Raw "fmt " chunk payload
+        samples: Raw sample data
+    
+    Returns:
+        Complete WAV file bytes
+    """
+    fmt_size = len(fmt_chunk)
+    pad = b"\x00" if fmt_size & 1 else b""
+    riff_size = 4 + (8 + fmt_size + len(pad)) + (8 + len(samples))
+    return b"".join((
+        b"RIFF", struct.pack("<I", riff_size), b"WAVE",
+        b"fmt ", struct.pack("<I", fmt_size), fmt_chunk, pad,
+        b"data", struct.pack("<I", len(samples)), samples,
+    ))
+
+
+def concat_wav(parts: List[bytes]) -> bytes:
+    """
+    Concatenate WAV files that share the same sample format.
+    
+    Args:
+        parts: WAV files in playback order
+    
+    Returns:
+        A single WAV file containing all parts back to back
+    
+    Raises:
+        ValueError: If parts is empty, a part is not a WAV file, or the
+            parts use different sample formats
+    """
+    if not parts:
+        raise ValueError("No audio to concatenate")
+    if len(parts) == 1:
+        return parts[0]
+    
+    infos = [parse_wav(part) for part in parts]
+    first = infos[0]
+    for info in infos[1:]:
+        if (info.audio_format, info.channels, info.sample_rate, info.bits_per_sample) != \
+                (first.audio_format, first.channels, first.sample_rate, first.bits_per_sample):
+            raise ValueError("Cannot concatenate WAV files with different sample formats")
+    
+    samples = b"".join(
+        part[info.data_offset:info.data_offset + info.data_size]
+        for part, info in zip(parts, infos)
+    )
+    return build_wav(first.fmt_chunk, samples)
+
+
+def conform_sample_rates(parts: List[bytes]) -> List[bytes]:
+    """
+    Resample PCM WAV files to their highest common sample rate.
+    
+    Args:
+        parts: WAV files that should share one sample format
+    
+    Returns:
+        The parts, with those at a lower rate resampled (unchanged if the
+        rates already match)
+    
+    Raises:
+        ValueError: If a part is not a WAV file, or the parts differ in more
+            than the sample rate of integer PCM (or audioop is unavailable)
+    """
+    infos = [parse_wav(part) for part in parts]
+    rates = {info.sample_rate for info in infos}
+    if len(rates) <= 1:
+        return parts
+    
+    first = infos[0]
+    layouts = {(info.audio_format, info.channels, info.bits_per_sample) for info in infos}
+    if audioop is None or len(layouts) > 1 or first.audio_format != WAVE_FORMAT_PCM or first.bits_per_sample % 8:
+        raise ValueError("Cannot resample WAV files with different sample formats")
+    
+    target = max(rates)
+    width = first.bits_per_sample // 8
+    conformed = []
+    for part, info in zip(parts, infos):
+        if info.sample_rate == target:
+            conformed.append(part)
+            continue
+        samples = part[info.data_offset:info.data_offset + info.data_size]
+        samples, _ = audioop.ratecv(samples, width, info.channels, info.sample_rate, target, None)
+        fmt_chunk = bytearray(info.fmt_chunk)
+        struct.pack_into("<II", fmt_chunk, 4, target, target * info.channels * width)
+        conformed.append(build_wav(bytes(fmt_chunk), samples))
+    return conformed
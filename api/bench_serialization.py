@@ -0,0 +1,153 @@
+"""
+Benchmark of JSON response serialization and compression.
+
+Compares, per response, the default FastAPI path (validate the dict against
+the response_model, dump it, encode with the standard library) with the
+prevalidated orjson path, and reports compressed sizes and compression time
+for gzip and brotli. Payloads mirror real responses: a TTS result with a
+stored audio URL, a long Bengali ASR transcript, and a TTS result carrying a
+base64 data URL (audio storage disabled).
+
+Usage:
+    python bench_serialization.py [--iterations N]
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import math
+import random
+import struct
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from pydantic import BaseModel
+
+from audio_utils import build_wav
+from serialization import json_dumps, orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class TTSResponse(BaseModel):
+    success: bool
+    audioUrl: str
+    audioKey: Optional[str] = None
+    metadata: Dict[str, str]
+
+
+class ASRResponse(BaseModel):
+    success: bool
+    text: str
+    metadata: Dict[str, str]
+
+
+def tts_payload() -> dict:
+    return {
+        "success": True,
+        "audioUrl": "https://api.example.com/api/audio/" + "a" * 64 + ".wav",
+        "audioKey": "a" * 64 + ".wav",
+        "metadata": {
+            "language": "bangla", "voice": "female", "provider": "SenseTTS",
+            "processingTime": "1.23s", "textLength": "42", "audioSize": "96.00 KB",
+            "segments": "1", "cacheHits": "0", "source": "synthesis",
+            "timestamp": datetime.utcnow().isoformat(),
+        },
+    }
+
+
+def asr_payload(words: int = 5000) -> dict:
+    vocabulary = (
+        "আমি তুমি সে আমরা তারা বাংলাদেশ ভাষা আজকে কালকে আবহাওয়া খুব সুন্দর কথা বলা শোনা "
+        "সরকার মানুষ দেশ শহর গ্রাম নদী বাজার স্কুল কলেজ বিশ্ববিদ্যালয় শিক্ষক ছাত্র বই পড়া "
+        "লেখা কাজ সময় বছর মাস দিন রাত সকাল বিকাল সন্ধ্যা খাবার পানি ভাত মাছ ডাল সবজি"
+    ).split()
+    rng = random.Random(0)
+    text = " ".join(
+        rng.choice(vocabulary) + ("। " if rng.random() < 0.08 else ", " if rng.random() < 0.08 else "")
+        for _ in range(words)
+    ).replace("  ", " ").strip()
+    return {
+        "success": True,
+        "text": text,
+        "metadata": {
+            "filename": "meeting.mp3", "fileSize": "12.40 MB", "format": "mp3",
+            "language": "bangla", "provider": "Custom ASR", "durationSeconds": "1800.0",
+            "wordCount": str(words), "punctuationAdded": "True",
+            "characterCount": str(len(text)), "timestamp": datetime.utcnow().isoformat(),
+        },
+    }
+
+
+def base64_payload(seconds: float = 3.0) -> dict:
+    # 16 kHz mono speech-like signal (a few harmonics with an envelope)
+    rate = 16000
+    samples = b"".join(
+        struct.pack("<h", int(8000 * math.sin(i / rate * 4) * sum(
+            math.sin(2 * math.pi * f * i / rate) / (n + 1) for n, f in enumerate((180, 360, 540))
+        )))
+        for i in range(int(rate * seconds))
+    )
+    wav = build_wav(struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16), samples)
+    payload = tts_payload()
+    payload["audioUrl"] = "data:audio/wav;base64," + base64.b64encode(wav).decode("ascii")
+    payload["audioKey"] = None
+    return payload
+
+
+def per_call_us(function: Callable[[], object], iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def default_path(model, payload: dict) -> bytes:
+    # What FastAPI does for a dict returned from a route with a response_model
+    validated = model.model_validate(payload).model_dump(mode="json")
+    return json.dumps(validated, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    cases = [
+        ("tts (audio URL)", TTSResponse, tts_payload(), args.iterations),
+        ("asr (5000 words)", ASRResponse, asr_payload(), max(1, args.iterations // 10)),
+        ("tts (base64 audio)", TTSResponse, base64_payload(), max(1, args.iterations // 50)),
+    ]
+    
+    print(f"orjson: {'yes' if orjson is not None else 'no (standard library fallback)'}, "
+          f"brotli: {'yes' if brotli is not None else 'no'}")
+    print()
+    print(f"{'response':<20} {'default us':>11} {'fast us':>9} {'speedup':>8} "
+          f"{'bytes':>9} {'gzip':>9} {'gzip us':>9} {'br':>9} {'br us':>9}")
+    
+    for name, model, payload, iterations in cases:
+        # Both paths must produce the same bytes
+        assert default_path(model, payload) == json_dumps(payload)
+        default_us = per_call_us(lambda: default_path(model, payload), iterations)
+        fast_us = per_call_us(lambda: json_dumps(payload), iterations)
+        
+        body = json_dumps(payload)
+        gzipped = gzip.compress(body, compresslevel=6)
+        gzip_us = per_call_us(lambda: gzip.compress(body, compresslevel=6), iterations)
+        if brotli is not None:
+            brotli_size = str(len(brotli.compress(body, quality=4)))
+            brotli_us = f"{per_call_us(lambda: brotli.compress(body, quality=4), iterations):.1f}"
+        else:
+            brotli_size = brotli_us = "-"
+        
+        print(f"{name:<20} {default_us:>11.1f} {fast_us:>9.1f} {default_us / fast_us:>7.1f}x "
+              f"{len(body):>9} {len(gzipped):>9} {gzip_us:>9.1f} {brotli_size:>9} {brotli_us:>9}")
+
+
+if __name__ == "__main__":
+    main()
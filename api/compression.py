@@ -0,0 +1,182 @@
+"""
+Response compression with gzip/brotli negotiation.
+
+Text-heavy responses - long ASR transcripts, NDJSON batch results, base64
+data URLs when audio storage is disabled, the OpenAPI schema - shrink several
+times when compressed. The encoding is negotiated from the client's
+`Accept-Encoding` header (q-values honoured): brotli when the optional
+`brotli` package is installed and the client accepts it, otherwise gzip.
+
+Only compressible content types above a minimum size are compressed. Audio
+is passed through (it doesn't compress and must keep byte ranges intact), as
+are Server-Sent Events. Streaming responses are compressed chunk by chunk
+with a flush after each chunk, so NDJSON lines still reach the client as
+soon as they are produced.
+"""
+
+import zlib
+from typing import Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from profiling import stage
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/x-subrip",
+    "image/svg+xml",
+})
+
+# Never compressed: events must not be held back in a compressor buffer
+UNCOMPRESSED_TYPES = frozenset({"text/event-stream"})
+
+
+def available_encodings() -> tuple:
+    """Return the supported content encodings in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """
+    Pick the content encoding for a response.
+    
+    Args:
+        accept_encoding: Value of the request's Accept-Encoding header
+        available: Supported encodings in order of preference
+    
+    Returns:
+        The accepted encoding with the highest q-value (ties go to the
+        earlier entry in available), or None to send the body as is
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Encoder:
+    """Incremental gzip or brotli compressor."""
+    
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31: zlib stream with a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    
+    def compress(self, data: bytes, last: bool) -> bytes:
+        """Compress a chunk; flush so it can be sent now, or finish the stream if last."""
+        with stage("compress"):
+            if self.encoding == "br":
+                return self._brotli.process(data) + (self._brotli.finish() if last else self._brotli.flush())
+            return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses compressible responses.
+    
+    The decision is made when the first body chunk is sent: responses that
+    are already encoded, of a non-compressible type, or complete and smaller
+    than minimum_size are passed through untouched.
+    """
+    
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = available_encodings()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        
+        async def send_compressed(message):
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if start_message is not None:
+                start, start_message = start_message, None
+                start["headers"] = list(start.get("headers", []))
+                headers = MutableHeaders(raw=start["headers"])
+                if not self._compressible(start["status"], headers) or (not more_body and len(body) < self.minimum_size):
+                    await send(start)
+                    await send(message)
+                    return
+                
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                body = encoder.compress(body, last=not more_body)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+            
+            if encoder is not None:
+                message = {
+                    "type": "http.response.body",
+                    "body": encoder.compress(body, last=not more_body),
+                    "more_body": more_body,
+                }
+            await send(message)
+        
+        await self.app(scope, receive, send_compressed)
+    
+    @staticmethod
+    def _compressible(status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in UNCOMPRESSED_TYPES:
+            return False
+        return content_type in COMPRESSIBLE_TYPES or content_type.startswith("text/")
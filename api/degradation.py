@@ -0,0 +1,172 @@
+"""
+Graceful degradation of TTS under upstream overload.
+
+When SenseTTS is saturated, waiting in the connection pool until the request
+times out helps nobody. The load level is derived from live signals of one
+upstream operation - requests queued for a pooled connection (from its
+UpstreamMonitor) and how much slower recent requests were than their size
+predicts (the slowdown of its LatencyModel) - and endpoints adapt to it:
+
+- NORMAL: serve as usual.
+- DEGRADED: answer from the cache even if the entry is stale or was
+  synthesized with reduced quality, and ask the upstream for cheaper audio
+  (make_clean=False, lower clone sample rate) on a miss.
+- SHEDDING: as DEGRADED, but requests marked low priority that can't be
+  answered from the cache are rejected with 503 and Retry-After.
+
+Degraded responses carry an `X-Degraded` header naming what was degraded
+("stale-cache", "reduced-quality").
+
+Plain TTS and voice cloning have separate clients, monitors and policies, so
+slow clone calls don't degrade plain TTS.
+"""
+
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Dict, Optional
+
+from adaptive_timeout import LatencyModel
+from upstream import UpstreamMonitor
+
+DEGRADED_HEADER = "X-Degraded"
+
+# Values of the X-Degraded header
+STALE_CACHE = "stale-cache"
+REDUCED_QUALITY = "reduced-quality"
+
+
+class LoadLevel(IntEnum):
+    """Upstream load level, in increasing order of severity."""
+    NORMAL = 0
+    DEGRADED = 1
+    SHEDDING = 2
+
+
+@dataclass
+class LoadThresholds:
+    """
+    Signals at which a load level is entered (either one is enough).
+    
+    Attributes:
+        queue_depth: Requests waiting for a pooled connection
+        slowdown: Recent request durations relative to the latency model's
+            estimate for their size (1.0 = as expected)
+    """
+    queue_depth: int
+    slowdown: float
+    
+    def exceeded_by(self, monitor: UpstreamMonitor, latency: LatencyModel) -> bool:
+        """Return True if the live signals reach these thresholds."""
+        if monitor.queue_depth >= self.queue_depth:
+            return True
+        # The slowdown only moves when requests complete; ignore it once the
+        # upstream is idle so a slow spell can't keep it degraded forever
+        return monitor.in_flight > 0 and latency.slowdown >= self.slowdown
+
+
+class DegradationPolicy:
+    """
+    Decides the load level of one upstream operation and counts degraded responses.
+    
+    The level is recomputed from the monitor and latency model on every call,
+    so it follows the load without a background task.
+    """
+    
+    def __init__(
+        self,
+        monitor: UpstreamMonitor,
+        latency: LatencyModel,
+        degrade: LoadThresholds,
+        shed: LoadThresholds,
+        enabled: bool = True,
+    ):
+        self.monitor = monitor
+        self.latency = latency
+        self.degrade = degrade
+        self.shed = shed
+        self.enabled = enabled
+        self.degraded: Counter = Counter()
+        self.shed_requests = 0
+    
+    def level(self) -> LoadLevel:
+        """Return the current load level."""
+        if not self.enabled:
+            return LoadLevel.NORMAL
+        if self.shed.exceeded_by(self.monitor, self.latency):
+            return LoadLevel.SHEDDING
+        if self.degrade.exceeded_by(self.monitor, self.latency):
+            return LoadLevel.DEGRADED
+        return LoadLevel.NORMAL
+    
+    def should_shed(self, priority: Optional[str]) -> bool:
+        """
+        Return True if a request that needs the upstream should be rejected.
+        
+        Args:
+            priority: Request priority ("low" requests are shed first)
+        """
+        if (priority or "").lower() != "low" or self.level() < LoadLevel.SHEDDING:
+            return False
+        self.shed_requests += 1
+        return True
+    
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait before retrying."""
+        latency_ms = self.monitor.latency_ms or 1000.0
+        return max(1, math.ceil(latency_ms / 1000))
+    
+    def record(self, degradation: Optional[str]) -> None:
+        """Count a response served with the given X-Degraded value, if any."""
+        if degradation:
+            self.degraded[degradation] += 1
+    
+    def stats(self) -> Dict[str, object]:
+        """Return the current level and degradation counters for health/metrics output."""
+        return {
+            "enabled": self.enabled,
+            "level": self.level().name.lower(),
+            "slowdown": round(self.latency.slowdown, 2),
+            "degraded": dict(self.degraded),
+            "shed": self.shed_requests,
+        }
+
+
+def create_degradation_policy_from_env(
+    monitor: UpstreamMonitor,
+    latency: LatencyModel,
+    prefix: str = "",
+) -> DegradationPolicy:
+    """
+    Build the degradation policy for an upstream operation from environment variables.
+    
+    Environment (thresholds are read with the given prefix, e.g. CLONE_):
+        DEGRADATION_ENABLED: "true" (default) or "false" to never degrade
+        DEGRADE_QUEUE_DEPTH: Queued requests at which responses are degraded
+        DEGRADE_SLOWDOWN: Slowdown at which responses are degraded
+        SHED_QUEUE_DEPTH: Queued requests at which low-priority requests are shed
+        SHED_SLOWDOWN: Slowdown at which low-priority requests are shed
+    
+    Args:
+        monitor: Monitor of the upstream the policy protects
+        latency: Latency model of the operation (size-aware slowdown)
+        prefix: Prefix of the threshold variables
+    
+    Returns:
+        A DegradationPolicy instance
+    """
+    return DegradationPolicy(
+        monitor,
+        latency,
+        degrade=LoadThresholds(
+            queue_depth=int(os.getenv(f"{prefix}DEGRADE_QUEUE_DEPTH", "4")),
+            slowdown=float(os.getenv(f"{prefix}DEGRADE_SLOWDOWN", "2")),
+        ),
+        shed=LoadThresholds(
+            queue_depth=int(os.getenv(f"{prefix}SHED_QUEUE_DEPTH", "16")),
+            slowdown=float(os.getenv(f"{prefix}SHED_SLOWDOWN", "4")),
+        ),
+        enabled=os.getenv("DEGRADATION_ENABLED", "true").lower() == "true",
+    )
@@ -0,0 +1,207 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+Clients on flaky networks resend requests after a timeout. With an
+`Idempotency-Key` header:
+
+- A resend while the original is still running attaches to the running
+  operation instead of starting another GPU job. The operation runs in its
+  own task, so it also survives the original client disconnecting.
+- A resend after the original succeeded replays the stored result (within
+  the TTL).
+- Reusing a key with different request parameters is rejected.
+
+Completed results live in a pluggable IdempotencyStore; the in-memory store
+(bounded by entries and by serialized size) is the default. Failed operations
+are not stored, so they can be retried.
+"""
+
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from serialization import json_dumps
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(ValueError):
+    """Raised when an idempotency key is reused with different parameters."""
+
+
+class IdempotentRecord(NamedTuple):
+    """
+    A completed operation.
+    
+    Attributes:
+        fingerprint: Hash of the request parameters the key was first used with
+        result: The operation's result (JSON-serializable)
+    """
+    fingerprint: str
+    result: Any
+
+
+class IdempotencyStore(ABC):
+    """Abstract store of completed idempotent operations."""
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[IdempotentRecord]:
+        """Return the record for key, or None if missing or expired."""
+    
+    @abstractmethod
+    async def put(self, key: str, record: IdempotentRecord) -> None:
+        """Store a completed operation under key."""
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Bounded in-process store with a TTL (least recently stored entries are
+    evicted first). Not shared between workers.
+    
+    Results can embed base64 audio, so the store is bounded by the serialized
+    size of its results as well as by entry count.
+    """
+    
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 86400.0, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[IdempotentRecord, float, int]]" = OrderedDict()
+        self._size = 0
+    
+    async def get(self, key: str) -> Optional[IdempotentRecord]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        record, stored_at, _ = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._remove(key)
+            return None
+        return record
+    
+    async def put(self, key: str, record: IdempotentRecord) -> None:
+        size = len(json_dumps(record.result))
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        
+        self._entries[key] = (record, time.monotonic(), size)
+        self._size += size
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+    
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class IdempotencyManager:
+    """
+    Runs operations at most once per idempotency key.
+    
+    In-flight operations are tracked in memory; completed results go to the
+    configured store.
+    """
+    
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+        self._inflight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self.replays = 0
+        self.attached = 0
+    
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        operation: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """
+        Run operation once for key, or reuse its running or stored result.
+        
+        Args:
+            key: Scoped idempotency key
+            fingerprint: Hash of the request parameters
+            operation: Produces the result
+        
+        Returns:
+            Tuple of (result, replayed) where replayed is True if the result
+            came from an earlier request with the same key
+        
+        Raises:
+            IdempotencyConflict: If the key was used with different parameters
+        """
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            record = await self.store.get(key)
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyConflict("Idempotency-Key was already used with different request parameters")
+                self.replays += 1
+                return record.result, True
+            # The store lookup may have yielded; another request may have started meanwhile
+            inflight = self._inflight.get(key)
+        
+        if inflight is not None:
+            running_fingerprint, task = inflight
+            if running_fingerprint != fingerprint:
+                raise IdempotencyConflict("Idempotency-Key is in use by a request with different parameters")
+            self.attached += 1
+            return await asyncio.shield(task), True
+        
+        task = asyncio.create_task(self._run(key, fingerprint, operation))
+        # Retrieve the outcome even if every waiting client has gone away
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = (fingerprint, task)
+        # Shielded: if this client goes away, resends can still attach to the task
+        return await asyncio.shield(task), False
+    
+    async def _run(self, key: str, fingerprint: str, operation: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await operation()
+            await self.store.put(key, IdempotentRecord(fingerprint, result))
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return idempotency counters for health/metrics output."""
+        return {
+            "inFlight": len(self._inflight),
+            "replays": self.replays,
+            "attached": self.attached,
+        }
+
+
+def create_idempotency_store_from_env() -> Optional[IdempotencyStore]:
+    """
+    Build the configured idempotency store from environment variables.
+    
+    Environment:
+        IDEMPOTENCY_BACKEND: "memory" (default) or "none" to ignore Idempotency-Key
+        IDEMPOTENCY_MAX_ENTRIES: Maximum stored results (memory backend)
+        IDEMPOTENCY_MAX_MB: Maximum serialized size of stored results (memory backend)
+        IDEMPOTENCY_TTL_SECONDS: How long completed results are replayed
+    
+    Returns:
+        An IdempotencyStore instance, or None if idempotency is disabled
+    """
+    backend = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+    
+    if backend == "none":
+        return None
+    
+    if backend == "memory":
+        return MemoryIdempotencyStore(
+            max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1000")),
+            ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")),
+            max_bytes=int(os.getenv("IDEMPOTENCY_MAX_MB", "64")) * 1024 * 1024,
+        )
+    
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend}")
@@ -0,0 +1,201 @@
+"""
+In-process progress pub/sub for long-running jobs (voice cloning, ASR).
+
+Endpoints publish stage transitions for a job id (the request's X-Request-ID):
+
+    uploaded -> [preprocessed] -> queued -> upstream_started -> encoding -> done | error
+
+("preprocessed" is only published for voice cloning references. Timestamped
+transcriptions split at silences publish "segmented" and then "transcribed"
+once per speech chunk instead of "queued"/"upstream_started".)
+
+Subscribers (the SSE endpoint) get the job's history replayed first and then
+live events, so it doesn't matter whether they connect before or after the
+job starts. Each subscriber is a single asyncio.Queue; a job with nobody
+listening only costs its short event history. Finished jobs are kept for a
+TTL so late subscribers still learn how the job ended.
+
+Job ids are chosen by the client and the stream is unauthenticated, so
+events carry progress only - never the job's result (transcripts, audio
+URLs). Clients get the result from the response to their own request.
+
+Only finished jobs and jobs nobody has published to yet (created by a
+subscriber) are pruned; running jobs stay until their terminal event, so
+every publisher must end a job with "done" or "error". A subscriber whose
+job is pruned is ended rather than left waiting.
+
+State is per process: with several workers, the progress stream must be
+served by the worker that runs the job (use sticky routing on the job id).
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STAGES = frozenset({"done", "error"})
+
+
+@dataclass
+class JobEvent:
+    """
+    One progress event.
+    
+    Attributes:
+        seq: Sequence number within the job (used as the SSE event id)
+        stage: Stage name ("uploaded", "queued", ..., "done", "error")
+        data: Stage-specific payload (JSON-serializable)
+        elapsed_ms: Milliseconds since the job's first event
+    """
+    seq: int
+    stage: str
+    data: Dict[str, Any]
+    elapsed_ms: float
+
+
+@dataclass
+class _Job:
+    created: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+    events: deque = field(default_factory=lambda: deque(maxlen=32))
+    subscribers: Set[asyncio.Queue] = field(default_factory=set)
+    seq: int = 0
+    finished_at: Optional[float] = None
+
+
+class JobHub:
+    """
+    Bounded registry of job progress events with fan-out to subscribers.
+    
+    Not thread-safe; it is only used from the event loop.
+    """
+    
+    def __init__(self, ttl_seconds: float = 300.0, max_jobs: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+    
+    def _prune(self) -> None:
+        now = time.monotonic()
+        excess = len(self._jobs) - self.max_jobs
+        # Jobs are kept in creation order, so expired ones are at the front
+        for job_id, job in list(self._jobs.items()):
+            if job.started is not None and job.finished_at is None:
+                # Running: its subscribers are waiting for the terminal event
+                continue
+            expired = now - (job.finished_at or job.created) > self.ttl_seconds
+            if not expired and excess <= 0:
+                break
+            self._remove(job_id)
+            excess -= 1
+    
+    def _remove(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id)
+        for queue in job.subscribers:
+            # Wakes the subscriber so it ends instead of waiting out its deadline
+            queue.put_nowait(None)
+    
+    def _get(self, job_id: str) -> _Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            self._prune()
+            job = self._jobs[job_id] = _Job()
+        return job
+    
+    def publish(self, job_id: str, stage: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record a stage transition and deliver it to current subscribers.
+        
+        Events published after the job reached a terminal stage are ignored.
+        
+        Args:
+            job_id: Job (request) id
+            stage: Stage name
+            data: Optional JSON-serializable payload
+        """
+        job = self._get(job_id)
+        if job.finished_at is not None:
+            return
+        
+        now = time.monotonic()
+        if job.started is None:
+            # Subscribers may create the job early; time it from its first event
+            job.started = now
+        job.seq += 1
+        event = JobEvent(job.seq, stage, data or {}, round((now - job.started) * 1000, 1))
+        job.events.append(event)
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+        
+        if stage in TERMINAL_STAGES:
+            job.finished_at = now
+            logger.debug(
+                "Job %s finished with %s after %.1fms", job_id, stage, event.elapsed_ms,
+                extra={"event": "job_finished", "stages": {e.stage: e.elapsed_ms for e in job.events}}
+            )
+    
+    async def subscribe(
+        self,
+        job_id: str,
+        last_event_id: int = 0,
+        heartbeat_seconds: float = 15.0,
+    ) -> AsyncIterator[Optional[JobEvent]]:
+        """
+        Iterate over a job's events until it finishes.
+        
+        Args:
+            job_id: Job (request) id; the job need not exist yet
+            last_event_id: Skip events up to this sequence number (SSE resume)
+            heartbeat_seconds: Yield None after this long without events so the
+                caller can send a keep-alive
+        
+        Yields:
+            JobEvent for each new event, or None as a heartbeat. Iteration
+            ends after a terminal event, if the job is pruned, or if the job
+            does not finish within the TTL.
+        """
+        job = self._get(job_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        # Snapshot history and register in the same step so nothing is missed or repeated
+        history = [event for event in job.events if event.seq > last_event_id]
+        job.subscribers.add(queue)
+        try:
+            for event in history:
+                yield event
+                if event.stage in TERMINAL_STAGES:
+                    return
+            if job.finished_at is not None:
+                return
+            
+            deadline = time.monotonic() + self.ttl_seconds
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if time.monotonic() > deadline:
+                        return
+                    yield None
+                    continue
+                if event is None:
+                    # The job was pruned
+                    return
+                yield event
+                if event.stage in TERMINAL_STAGES:
+                    return
+        finally:
+            job.subscribers.discard(queue)
+            if job.started is None and not job.subscribers and self._jobs.get(job_id) is job:
+                # Nothing was published; don't keep an entry only this subscriber created
+                del self._jobs[job_id]
+    
+    def stats(self) -> Dict[str, int]:
+        """Return job counters for health/metrics output."""
+        return {
+            "jobs": len(self._jobs),
+            "active": sum(1 for job in self._jobs.values() if job.finished_at is None),
+            "subscribers": sum(len(job.subscribers) for job in self._jobs.values()),
+        }
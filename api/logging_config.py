@@ -0,0 +1,160 @@
+"""
+Structured, low-overhead logging for the API.
+
+- JSON output via python-json-logger (plain text if it isn't installed or
+  LOG_FORMAT=text)
+- Every record carries the current request id (X-Request-ID) for correlation
+- Records are handed to a QueueHandler; a QueueListener thread formats and
+  writes them, so stdout I/O never blocks the event loop
+- Success logs (INFO and below) can be sampled per request with
+  LOG_SAMPLE_RATE; warnings and errors are always kept
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+try:
+    from pythonjsonlogger import jsonlogger
+except ImportError:  # Optional dependency - fall back to plain text logs
+    jsonlogger = None
+
+# Request-scoped context (set by RequestContextMiddleware)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+request_sampled_var: ContextVar[bool] = ContextVar("request_sampled", default=True)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+JSON_FORMAT = "%(asctime)s %(name)s %(levelname)s %(request_id)s %(message)s"
+
+access_logger = logging.getLogger("sensevoice.access")
+
+# Fraction of requests whose INFO logs are kept (set by setup_logging)
+_sample_rate = 1.0
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Attach the request id to every record and drop unsampled success logs.
+    
+    Runs before the record is queued, so dropped records are never formatted.
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        if record.levelno >= logging.WARNING:
+            return True
+        return request_sampled_var.get()
+
+
+def setup_logging(level: str = "INFO", log_format: str = "json", sample_rate: float = 1.0) -> logging.handlers.QueueListener:
+    """
+    Configure root logging with a non-blocking queue handler.
+    
+    Args:
+        level: Root log level name
+        log_format: "json" or "text"
+        sample_rate: Fraction of requests whose INFO logs are kept (0.0 - 1.0)
+    
+    Returns:
+        The started QueueListener (stop it on shutdown to flush)
+    """
+    global _sample_rate
+    _sample_rate = max(0.0, min(1.0, sample_rate))
+    
+    if log_format == "json" and jsonlogger is not None:
+        formatter = jsonlogger.JsonFormatter(JSON_FORMAT, rename_fields={"asctime": "timestamp", "levelname": "level"})
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level.upper())
+    
+    # Route uvicorn's loggers through the same pipeline
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers[:] = []
+        uvicorn_logger.propagate = True
+    # Request summaries are logged by RequestContextMiddleware instead
+    logging.getLogger("uvicorn.access").disabled = True
+    # httpx logs every upstream call at INFO; our own lines already cover them
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that assigns a request id and logs one access record.
+    
+    The id is taken from an incoming `X-Request-ID` header (or generated),
+    exposed to log records through a context variable and echoed back in the
+    response headers. The sampling decision is made once per request so a
+    sampled request keeps all of its INFO lines.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = _header(scope, b"x-request-id") or uuid.uuid4().hex
+        id_token = request_id_var.set(request_id)
+        sampled_token = request_sampled_var.set(_sample_rate >= 1.0 or random.random() < _sample_rate)
+        started = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            level = logging.INFO if status_code < 500 else logging.ERROR
+            if access_logger.isEnabledFor(level):
+                access_logger.log(
+                    level,
+                    "%s %s %s %.1fms",
+                    scope["method"], scope["path"], status_code, duration_ms,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round(duration_ms, 1),
+                    }
+                )
+            request_sampled_var.reset(sampled_token)
+            request_id_var.reset(id_token)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            # Keep client-supplied ids short and printable
+            return value.decode("latin-1")[:64] or None
+    return None
@@ -7,28 +7,63 @@ using custom AI APIs with support for Bengali and English languages.
 Services:
 - TTS: Convert text to natural speech using SenseTTS API
 - ASR: Transcribe audio to text using custom ASR API
+- Audio: Serve generated audio from a content-addressed blob store
+- Phrase bank: Pre-synthesized audio for frequently requested prompts
 
 SORRY IT'S ALL VIBE CODED :)
 """
 
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 import httpx
+import asyncio
+import atexit
 import base64
+import functools
+import hashlib
+import json
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict
+from typing import AsyncIterator, Optional, Dict, List, Tuple
 import logging
 import os
 from dotenv import load_dotenv
 
+from audio_store import AudioStore, create_audio_store_from_env, is_valid_key, content_type_for_key, etag_for_key
+from text_normalizer import NormalizedText, normalize_text, resolve_language, split_language_runs
+from tts_cache import TTSCache
+from audio_utils import concat_wav, conform_sample_rates
+from audio_probe import PROBE_BYTES, AudioProbe, AudioProbeError, probe_audio
+from reference_audio import ReferenceAudioError, create_reference_preprocessor_from_env
+from asr_alignment import ESTIMATED, VOICE_ACTIVITY, TimedSegment, create_speech_segmenter_from_env, timed_segments
+from subtitles import SUBTITLE_FORMATS, render_cue, render_note, subtitle_header
+from phrase_bank import PhraseBank, PhraseEntry, load_manifest, save_manifest
+from logging_config import setup_logging, RequestContextMiddleware, request_id_var
+from upstream import UpstreamMonitor, run_prober
+from multipart_stream import MultipartError, UploadedPart, iter_multipart_files
+from job_progress import JobHub
+from adaptive_timeout import LatencyModel, TimeoutBudgets
+from serialization import FastJSONResponse
+from compression import CompressionMiddleware
+from profiling import ProfilingMiddleware, admin_key_matches, create_profiler_from_env, stage
+from degradation import (
+    DEGRADED_HEADER, REDUCED_QUALITY, STALE_CACHE, DegradationPolicy, LoadLevel, create_degradation_policy_from_env
+)
+from idempotency import MAX_KEY_LENGTH, IdempotencyConflict, IdempotencyManager, create_idempotency_store_from_env
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: structured JSON (LOG_FORMAT=text for plain lines), written by a
+# background thread. LOG_SAMPLE_RATE < 1 keeps only a fraction of success logs;
+# warnings and errors are always kept.
+log_listener = setup_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    log_format=os.getenv("LOG_FORMAT", "json").lower(),
+    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
 )
 logger = logging.getLogger(__name__)
 
@@ -38,7 +73,8 @@ app = FastAPI(
     description="Text-to-Speech and Speech-to-Text API with support for Bengali and English languages",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS for frontend integration
@@ -59,8 +95,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Idempotent-Replayed", "X-Degraded"],
 )
 
+# Compress JSON/NDJSON/text responses (brotli if installed, else gzip) per Accept-Encoding
+if os.getenv("COMPRESSION_ENABLED", "true").lower() == "true":
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+        gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    )
+
+# Request id correlation + one structured access log line per request
+app.add_middleware(RequestContextMiddleware)
+
+# Stage timings, slowest requests per endpoint and on-demand profiling
+# (outermost, so it times the other middleware and whole streamed bodies)
+profiler = create_profiler_from_env()
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, admin_key=os.getenv("ADMIN_API_KEY"))
+
 # Load API URLs from environment variables
 TTS_API_BASE_URL = os.getenv("TTS_API_BASE_URL")
 ASR_API_BASE_URL = os.getenv("ASR_API_BASE_URL")
@@ -71,6 +126,136 @@ if not TTS_API_BASE_URL:
 if not ASR_API_BASE_URL:
     raise ValueError("ASR_API_BASE_URL environment variable is required in .env file")
 
+# Shared, pooled HTTP clients for the upstream services. Every request reuses
+# their keep-alive connections; the monitors track pool usage and errors.
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+upstream_limits = httpx.Limits(
+    max_connections=UPSTREAM_MAX_CONNECTIONS,
+    max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS
+)
+tts_client = httpx.AsyncClient(timeout=120.0, limits=upstream_limits)
+asr_client = httpx.AsyncClient(timeout=120.0, limits=upstream_limits)
+# Voice cloning has its own pool so slow clone calls can't starve plain TTS
+clone_client = httpx.AsyncClient(timeout=120.0, limits=upstream_limits)
+tts_monitor = UpstreamMonitor("tts", UPSTREAM_MAX_CONNECTIONS)
+asr_monitor = UpstreamMonitor("asr", UPSTREAM_MAX_CONNECTIONS)
+clone_monitor = UpstreamMonitor("tts_clone", UPSTREAM_MAX_CONNECTIONS)
+
+# Adaptive upstream timeouts: read timeouts follow an online model of seconds per
+# character (TTS) or per audio second (ASR), clamped to [min, max]. With
+# ADAPTIVE_TIMEOUTS=false every request gets the max timeout.
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+timeout_budgets = TimeoutBudgets(
+    connect=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5")),
+    pool=float(os.getenv("UPSTREAM_POOL_TIMEOUT", "30")),
+    min_upload_bytes_per_second=float(os.getenv("UPSTREAM_MIN_UPLOAD_KBPS", "256")) * 1024
+)
+tts_latency = LatencyModel(
+    "tts", "characters",
+    initial_seconds_per_unit=0.05, base_seconds=2.0,
+    min_timeout=10.0, max_timeout=float(os.getenv("TTS_MAX_TIMEOUT", "120")),
+    budgets=timeout_budgets, enabled=ADAPTIVE_TIMEOUTS
+)
+clone_latency = LatencyModel(
+    "tts_clone", "characters",
+    initial_seconds_per_unit=0.1, base_seconds=10.0,
+    min_timeout=30.0, max_timeout=float(os.getenv("TTS_CLONE_MAX_TIMEOUT", "180")),
+    budgets=timeout_budgets, enabled=ADAPTIVE_TIMEOUTS
+)
+asr_latency = LatencyModel(
+    "asr", "audio seconds",
+    initial_seconds_per_unit=0.3, base_seconds=3.0,
+    min_timeout=15.0, max_timeout=float(os.getenv("ASR_MAX_TIMEOUT", "300")),
+    budgets=timeout_budgets, enabled=ADAPTIVE_TIMEOUTS
+)
+
+# Graceful degradation when SenseTTS is overloaded (thresholds on live queue
+# depth and on slowdown relative to the latency model): serve stale/reduced-quality
+# cache hits, request cheaper audio, and shed low-priority (X-Priority: low)
+# requests. Plain TTS and cloning are judged separately (CLONE_* thresholds).
+tts_degradation = create_degradation_policy_from_env(tts_monitor, tts_latency)
+clone_degradation = create_degradation_policy_from_env(clone_monitor, clone_latency, prefix="CLONE_")
+CLONE_DEGRADED_SAMPLE_RATE = int(os.getenv("CLONE_DEGRADED_SAMPLE_RATE", "16000"))
+
+# Background upstream prober; /health/ready only reads its cached results
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "10"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+TTS_HEALTH_PATH = os.getenv("TTS_HEALTH_PATH", "/health")
+ASR_HEALTH_PATH = os.getenv("ASR_HEALTH_PATH", "/health")
+READINESS_MAX_ERROR_RATE = float(os.getenv("READINESS_MAX_ERROR_RATE", "0.5"))
+# A probe result older than three rounds means the prober itself is stuck
+READINESS_MAX_PROBE_AGE = HEALTH_PROBE_INTERVAL_SECONDS * 3
+
+# Generated audio storage (local filesystem by default, "none" keeps base64 data URLs)
+audio_store: Optional[AudioStore] = create_audio_store_from_env()
+
+# Stored audio is content-addressed and never changes, so it can be cached forever
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Normalize TTS text (Unicode, whitespace, numbers, abbreviations) before synthesis
+TTS_NORMALIZE_TEXT = os.getenv("TTS_NORMALIZE_TEXT", "true").lower() == "true"
+
+# Mixed-language (code-switched) synthesis: texts with language="auto" are split
+# into Bengali/English runs that are synthesized concurrently and spliced
+TTS_MAX_SEGMENTS = int(os.getenv("TTS_MAX_SEGMENTS", "16"))
+TTS_SEGMENT_CONCURRENCY = int(os.getenv("TTS_SEGMENT_CONCURRENCY", "4"))
+
+# Synthesized audio cache (keyed on normalized text, language and voice)
+tts_cache = TTSCache(
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    ttl_seconds=float(os.getenv("TTS_CACHE_TTL_SECONDS", "86400")),
+    stale_seconds=float(os.getenv("TTS_CACHE_STALE_SECONDS", "604800"))
+)
+
+# Batch TTS: maximum items per request and items synthesized concurrently
+TTS_BATCH_MAX_ITEMS = int(os.getenv("TTS_BATCH_MAX_ITEMS", "100"))
+TTS_BATCH_CONCURRENCY = int(os.getenv("TTS_BATCH_CONCURRENCY", "4"))
+
+# Voice cloning reference audio: accepted formats (sniffed from content) and limits
+CLONE_ALLOWED_FORMATS = ['mp3', 'wav', 'm4a', 'flac', 'ogg']
+CLONE_MAX_REFERENCE_MB = 10
+CLONE_MAX_REFERENCE_SECONDS = float(os.getenv("CLONE_MAX_REFERENCE_SECONDS", "60"))
+
+# References are converted to short canonical clips (cached by content hash) before upload
+reference_preprocessor = create_reference_preprocessor_from_env()
+
+# ASR uploads: accepted formats (sniffed from content), limits, and batch (/api/asr/transcribe/batch) limits
+ASR_ALLOWED_FORMATS = ['mp3', 'wav', 'm4a', 'flac', 'aac', 'wma', 'aiff']
+ASR_MAX_FILE_SIZE_MB = 25
+ASR_MAX_DURATION_SECONDS = float(os.getenv("ASR_MAX_DURATION_SECONDS", "3600"))
+ASR_BATCH_MAX_FILES = int(os.getenv("ASR_BATCH_MAX_FILES", "50"))
+ASR_BATCH_CONCURRENCY = int(os.getenv("ASR_BATCH_CONCURRENCY", "4"))
+
+# Timestamped transcription: uploads are split at silences and the speech
+# chunks transcribed concurrently (results are kept in order)
+speech_segmenter = create_speech_segmenter_from_env()
+ASR_SEGMENT_CONCURRENCY = int(os.getenv("ASR_SEGMENT_CONCURRENCY", "4"))
+
+# Idempotency-Key handling for TTS/ASR POSTs ("none" disables it)
+idempotency_store = create_idempotency_store_from_env()
+idempotency = IdempotencyManager(idempotency_store) if idempotency_store is not None else None
+
+# Progress events for clone/ASR jobs, streamed over SSE at /api/jobs/{id}/events
+job_hub = JobHub(
+    ttl_seconds=float(os.getenv("JOB_PROGRESS_TTL_SECONDS", "300")),
+    max_jobs=int(os.getenv("JOB_PROGRESS_MAX_JOBS", "500"))
+)
+
+# Phrase bank: manifest entries are synthesized ahead of time by a background
+# warmer and served without calling the upstream
+PHRASE_BANK_DIR = os.getenv("PHRASE_BANK_DIR", "./phrase_bank")
+PHRASE_BANK_MANIFEST = os.getenv("PHRASE_BANK_MANIFEST", os.path.join(PHRASE_BANK_DIR, "manifest.json"))
+PHRASE_BANK_REFRESH_SECONDS = float(os.getenv("PHRASE_BANK_REFRESH_SECONDS", "0"))  # 0 = startup only
+PHRASE_BANK_CONCURRENCY = int(os.getenv("PHRASE_BANK_CONCURRENCY", "2"))
+phrase_bank = PhraseBank(PHRASE_BANK_DIR)
+
+# Admin endpoints are disabled unless an admin key is configured
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+# Public base URL used when building audio links (e.g. https://api.example.com).
+# Falls back to the incoming request's base URL when unset.
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL")
+
 # ============================================================================
 # DATA MODELS
 # ============================================================================
@@ -81,13 +266,14 @@ class TTSRequest(BaseModel):
     
     Attributes:
         text: The input text to convert to speech (required)
-        language: Target language for speech synthesis (default: "english")
+        language: Target language for speech synthesis (default: "english", "auto" to detect
+            and split mixed Bengali/English text)
         voice: Voice gender to use (default: "female")
     """
     text: str = Field(..., description="Text to convert to speech", min_length=1, max_length=5000)
     language: str = Field(
         default="english",
-        description="Language for speech synthesis: 'bangla' or 'english'"
+        description="Language for speech synthesis: 'bangla', 'english' or 'auto' (detect from script)"
     )
     voice: str = Field(
         default="female",
@@ -104,17 +290,50 @@ class TTSRequest(BaseModel):
         }
 
 
+class TTSBatchItem(TTSRequest):
+    """
+    One item of a batch TTS request.
+    
+    Attributes:
+        id: Client-supplied id echoed back with the result (defaults to the
+            item's position in the batch)
+    """
+    id: Optional[str] = Field(default=None, description="Item id echoed back in the result", max_length=128)
+
+
+class TTSBatchRequest(BaseModel):
+    """
+    Request model for batch TTS generation.
+    
+    Attributes:
+        items: Texts to synthesize, each with its own language and voice
+    """
+    items: List[TTSBatchItem] = Field(..., min_length=1, max_length=TTS_BATCH_MAX_ITEMS)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": "greeting", "text": "Hello, how can I help you?", "language": "english", "voice": "female"},
+                    {"id": "thanks", "text": "ধন্যবাদ", "language": "bangla", "voice": "male"}
+                ]
+            }
+        }
+
+
 class TTSCloneResponse(BaseModel):
     """
     Response model for successful TTS voice cloning.
     
     Attributes:
         success: Whether the generation was successful
-        audioUrl: Base64-encoded audio data URL
+        audioUrl: URL of the stored audio (or base64 data URL if storage is disabled)
+        audioKey: Content-addressed storage key of the audio, if stored
         metadata: Additional information about the cloned audio
     """
     success: bool
     audioUrl: str
+    audioKey: Optional[str] = None
     metadata: Dict[str, str]
 
 
@@ -124,11 +343,13 @@ class TTSResponse(BaseModel):
     
     Attributes:
         success: Whether the generation was successful
-        audioUrl: Base64-encoded audio data URL
+        audioUrl: URL of the stored audio (or base64 data URL if storage is disabled)
+        audioKey: Content-addressed storage key of the audio, if stored
         metadata: Additional information about the generated audio
     """
     success: bool
     audioUrl: str
+    audioKey: Optional[str] = None
     metadata: Dict[str, str]
 
 
@@ -144,6 +365,38 @@ class ErrorResponse(BaseModel):
     error: str
 
 
+class ASRWord(BaseModel):
+    """
+    A transcribed word with its timing.
+    
+    Attributes:
+        word: The word as transcribed (with any attached punctuation)
+        start: Start time in seconds
+        end: End time in seconds
+    """
+    word: str
+    start: float
+    end: float
+
+
+class ASRSegment(BaseModel):
+    """
+    A timed segment of a transcription (one subtitle cue).
+    
+    Attributes:
+        index: Position of the segment in the transcription
+        start: Start time in seconds
+        end: End time in seconds
+        text: Transcribed text of the segment
+        words: Word-level timings within the segment
+    """
+    index: int
+    start: float
+    end: float
+    text: str
+    words: List[ASRWord]
+
+
 class ASRResponse(BaseModel):
     """
     Response model for successful ASR (speech-to-text) transcription.
@@ -151,13 +404,60 @@ class ASRResponse(BaseModel):
     Attributes:
         success: Whether the transcription was successful
         text: The transcribed text from the audio
+        segments: Timed segments (only when timestamps were requested)
         metadata: Additional information about the transcription
     """
     success: bool
     text: str
+    segments: Optional[List[ASRSegment]] = None
     metadata: Dict[str, str]
 
 
+class PhraseItem(BaseModel):
+    """
+    One phrase bank manifest entry.
+    
+    Attributes:
+        text: Text to pre-synthesize
+        language: Language name ("bangla", "english" or "auto")
+        voice: Voice gender ("female" or "male")
+    """
+    text: str = Field(..., min_length=1, max_length=5000)
+    language: str = "english"
+    voice: str = "female"
+
+
+class PhraseBankManifest(BaseModel):
+    """
+    Request model for replacing the phrase bank manifest.
+    
+    Attributes:
+        phrases: All phrases that should be kept pre-synthesized
+    """
+    phrases: List[PhraseItem]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "phrases": [
+                    {"text": "Welcome to SenseVoice. Please hold.", "language": "english", "voice": "female"},
+                    {"text": "আপনার কলটি গুরুত্বপূর্ণ, অনুগ্রহ করে অপেক্ষা করুন।", "language": "bangla", "voice": "male"}
+                ]
+            }
+        }
+
+
+class ProfilingSettings(BaseModel):
+    """
+    Request model for changing runtime profiling settings.
+    
+    Attributes:
+        sampleRate: Fraction of requests to profile (0 profiles only requests
+            sent with `X-Profile: true` and a valid `X-Admin-Key`)
+    """
+    sampleRate: float = Field(..., ge=0.0, le=1.0)
+
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -179,237 +479,1509 @@ def map_language_to_api(language: str) -> str:
     return language_map.get(language.lower(), "en")
 
 
-# ============================================================================
-# API ENDPOINTS
-# ============================================================================
-
-@app.get("/", tags=["Health"])
-async def root():
+def prepare_tts_text(text: str, language: str) -> NormalizedText:
     """
-    Root endpoint - API health check.
+    Prepare TTS input text for synthesis.
+    
+    Runs the memoized normalization pipeline (see text_normalizer) so texts
+    that only differ in whitespace, Unicode form, digits or abbreviations are
+    synthesized identically. A language of "auto" is resolved from the script.
+    
+    Args:
+        text: Raw input text
+        language: Frontend language name ("bangla", "english" or "auto")
     
     Returns:
-        Basic API information and status
+        NormalizedText with the text to synthesize and the resolved language
     """
-    return {
-        "message": "SenseVoice TTS API",
-        "status": "running",
-        "version": "1.0.0",
-        "docs": "/docs"
-    }
+    if TTS_NORMALIZE_TEXT:
+        return normalize_text(text, language)
+    return NormalizedText(text=text, language=resolve_language(text, language))
 
 
-@app.get("/health", tags=["Health"])
-async def health_check():
+def plan_tts_segments(text: str, language: str) -> List[NormalizedText]:
     """
-    Detailed health check endpoint.
+    Split a TTS request into segments that are each synthesized in one language.
+    
+    With language="auto", code-switched text is split into Bengali and English
+    script runs. Explicit languages (and texts with more than
+    TTS_MAX_SEGMENTS runs) are synthesized as a single segment.
+    
+    Args:
+        text: Raw input text
+        language: Frontend language name ("bangla", "english" or "auto")
     
     Returns:
-        API health status and configuration info
+        Prepared segments in playback order
     """
-    return {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "tts_api_url": TTS_API_BASE_URL,
-        "asr_api_url": ASR_API_BASE_URL,
-        "supported_languages": ["bangla", "english"],
-        "available_voices": ["female", "male"]
-    }
+    if language.lower() == "auto":
+        runs = split_language_runs(text)
+        if 1 < len(runs) <= TTS_MAX_SEGMENTS:
+            return [prepare_tts_text(run_text, run_language) for run_text, run_language in runs]
+    return [prepare_tts_text(text, language)]
 
 
-@app.post(
-    "/api/tts/generate",
-    response_model=TTSResponse,
-    responses={
-        200: {"description": "Audio generated successfully"},
-        400: {"model": ErrorResponse, "description": "Invalid request"},
-        500: {"model": ErrorResponse, "description": "Server error"}
-    },
-    tags=["TTS"]
-)
-async def generate_tts(request: TTSRequest):
+def phrase_bank_key(entry: PhraseEntry) -> str:
     """
-    Generate speech audio from text using SenseTTS API.
+    Build the phrase bank lookup key for a (text, language, voice) request.
     
-    This endpoint accepts text input along with language and voice preferences,
-    then generates high-quality speech audio using the SenseTTS API.
-    The audio is returned as a base64-encoded data URL for immediate playback.
-    
-    **Supported Languages:**
-    - `bangla`: Bengali language with proper pronunciation
-    - `english`: English language with natural intonation
+    The key uses the normalized text, so requests that only differ in
+    whitespace or Unicode form still hit the bank.
+    """
+    prepared = prepare_tts_text(entry.text, entry.language)
+    return TTSCache.make_key(prepared.text, entry.language.lower(), entry.voice)
+
+
+@dataclass
+class SynthesisResult:
+    """
+    Result of synthesizing one TTS request.
     
-    **Available Voices:**
-    - `female`: Warm, friendly female voice (works for all languages)
-    - `male`: Deep, authoritative male voice (works for all languages)
+    Attributes:
+        audio_bytes: WAV audio for the whole text
+        language: Resolved language ("bangla", "english" or "mixed")
+        processing_time: Upstream processing time in seconds (summed over segments)
+        text_length: Characters synthesized (as reported by the upstream)
+        segments: Number of segments the text was split into
+        cache_hits: Number of segments served from the TTS cache
+        source: Where the audio came from ("synthesis", "cache" or "phrase-bank")
+        degradation: X-Degraded value if the result was degraded under overload
+    """
+    audio_bytes: bytes
+    language: str
+    processing_time: float
+    text_length: int
+    segments: int
+    cache_hits: int
+    source: str = "synthesis"
+    degradation: Optional[str] = None
+
+
+async def call_tts_api(text: str, voice: str, api_language: str, make_clean: bool = True) -> Tuple[bytes, float, int]:
+    """
+    Call the SenseTTS `/tts` endpoint for one segment.
     
     Args:
-        request: TTSRequest object containing text, language, and voice
-        
+        text: Text to synthesize
+        voice: Voice name
+        api_language: API language code ("bn" or "en")
+        make_clean: Request audio cleaning (cheaper upstream when False)
+    
     Returns:
-        TTSResponse with success status, audio data URL, and metadata
-        
+        Tuple of (audio bytes, processing time in seconds, text length)
+    
     Raises:
-        HTTPException: If text is empty or SenseTTS API fails
+        HTTPException: If the API returns an error or empty audio
     """
-    logger.info(f"TTS generation requested: language={request.language}, voice={request.voice}, text_length={len(request.text)}")
+    payload = {
+        "text": text,
+        "voice": voice,
+        "language": api_language,
+        "make_clean": make_clean
+    }
     
-    # Validate input text
-    if not request.text or not request.text.strip():
-        logger.warning("Empty text received")
-        raise HTTPException(status_code=400, detail="Text is required and cannot be empty")
+    timeout = tts_latency.timeout(len(text), len(text.encode("utf-8")))
+    async with tts_monitor.track() as outcome, tts_latency.measure(len(text)) as measurement:
+        response = await tts_client.post(f"{TTS_API_BASE_URL}/tts", json=payload, timeout=timeout)
+        outcome.status_code = response.status_code
+        measurement.ok = response.status_code == 200
     
-    try:
-        # Map language from frontend format to API format
-        api_language = map_language_to_api(request.language)
-        logger.info(f"Mapped language '{request.language}' to API code '{api_language}'")
-        
-        # Prepare SenseTTS API request payload
-        payload = {
-            "text": request.text,
-            "voice": request.voice,
-            "language": api_language,
-            "make_clean": True
-        }
-        
-        logger.info(f"Calling SenseTTS API at {TTS_API_BASE_URL}/tts...")
-        
-        # Call SenseTTS API with timeout
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{TTS_API_BASE_URL}/tts",
-                json=payload
-            )
-            
-            # Handle API errors
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"SenseTTS API error {response.status_code}: {error_text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"SenseTTS API error: {error_text}"
-                )
-            
-            # Get audio bytes from response (direct audio/wav return)
-            audio_bytes = response.content
-            
-            if not audio_bytes:
-                logger.error("Empty audio response from SenseTTS API")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Received empty audio from SenseTTS API"
-                )
-            
-            audio_size_kb = len(audio_bytes) / 1024
-            
-            # Extract metadata from response headers
-            processing_time = response.headers.get("x-processing-time", "0")
-            text_length = response.headers.get("x-text-length", "0")
-            
-            logger.info(f"Audio generated successfully: {audio_size_kb:.2f} KB, processing time: {processing_time}s")
-            
-            # Convert audio to base64 data URL for browser playback
-            base64_audio = base64.b64encode(audio_bytes).decode('utf-8')
-            audio_data_url = f"data:audio/wav;base64,{base64_audio}"
-            
-            # Prepare response with metadata
-            response_data = {
-                "success": True,
-                "audioUrl": audio_data_url,
-                "metadata": {
-                    "language": request.language,
-                    "voice": request.voice,
-                    "provider": "SenseTTS",
-                    "processingTime": f"{processing_time}s",
-                    "textLength": text_length,
-                    "audioSize": f"{audio_size_kb:.2f} KB",
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            }
-            
-            logger.info("TTS generation completed successfully")
-            return response_data
-            
-    except httpx.TimeoutException as e:
-        logger.error(f"Request timeout: {str(e)}")
+    # Handle API errors
+    if response.status_code != 200:
+        error_text = response.text
+        logger.error("SenseTTS API error %s: %s", response.status_code, error_text)
         raise HTTPException(
-            status_code=504,
-            detail="Request to SenseTTS API timed out. Please try again."
+            status_code=response.status_code,
+            detail=f"SenseTTS API error: {error_text}"
         )
     
-    except httpx.ConnectError as e:
-        logger.error(f"Connection failed: {str(e)}")
-        raise HTTPException(
-            status_code=503,
-            detail="Could not connect to SenseTTS API. Please check if the service is running."
-        )
+    # Get audio bytes from response (direct audio/wav return)
+    audio_bytes = response.content
     
-    except httpx.HTTPError as e:
-        logger.error(f"HTTP request failed: {str(e)}")
+    if not audio_bytes:
+        logger.error("Empty audio response from SenseTTS API")
         raise HTTPException(
             status_code=500,
-            detail=f"Request to SenseTTS API failed: {str(e)}"
+            detail="Received empty audio from SenseTTS API"
         )
     
-    except Exception as e:
-        logger.error(f"Unexpected error during TTS generation: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate audio: {str(e)}"
-        )
+    try:
+        processing_time = float(response.headers.get("x-processing-time", "0"))
+    except ValueError:
+        processing_time = 0.0
+    try:
+        text_length = int(response.headers.get("x-text-length", "0"))
+    except ValueError:
+        text_length = len(text)
+    
+    return audio_bytes, processing_time, text_length
 
 
-@app.post(
-    "/api/tts/clone",
-    response_model=TTSCloneResponse,
-    responses={
-        200: {"description": "Voice cloned and audio generated successfully"},
-        400: {"model": ErrorResponse, "description": "Invalid request"},
-        500: {"model": ErrorResponse, "description": "Server error"}
-    },
-    tags=["TTS"]
-)
-async def clone_voice(
-    text: str = Form(..., description="Text to convert to speech with cloned voice"),
-    language: str = Form(..., description="Language code: 'en' or 'bn'"),
-    reference: UploadFile = File(..., description="Reference audio file for voice cloning"),
-    make_clean: bool = Form(default=True, description="Apply audio cleaning/enhancement"),
-    sample_rate: int = Form(default=24000, description="Output audio sample rate in Hz")
-):
+def find_cached_segment(segment: NormalizedText, voice: str, degraded: bool = False) -> Optional[Tuple[str, Optional[str]]]:
     """
-    Generate speech audio with voice cloning using a reference audio sample.
-    
-    This endpoint accepts text input, language preference, and a reference audio file
-    to clone the voice characteristics from the reference and apply them to the generated speech.
+    Find the TTS cache entry that can answer a segment.
     
-    **Supported Languages:**
-    - `en`: English language
-    - `bn`: Bengali language
+    Args:
+        segment: Prepared segment text and language
+        voice: Voice name
+        degraded: Also accept stale entries and audio synthesized with
+            make_clean=False (upstream overloaded)
     
-    **Reference Audio Requirements:**
-    - Clear audio with the target voice speaking
-    - Minimal background noise
-    - Duration: 5-30 seconds recommended
-    - Supported formats: mp3, wav, m4a, flac, ogg
+    Returns:
+        Tuple of (cache key, X-Degraded value or None), or None on a miss
+    """
+    api_language = map_language_to_api(segment.language)
+    key = TTSCache.make_key(segment.text, api_language, voice)
+    if key in tts_cache:
+        return key, None
+    if not degraded:
+        return None
     
-    **Audio Processing Options:**
-    - `make_clean`: Apply audio enhancement (default: true)
-    - `sample_rate`: Output sample rate - 16000, 22050, 24000, or 48000 Hz (default: 16000)
+    if tts_cache.has(key, allow_stale=True):
+        return key, STALE_CACHE
+    reduced_key = TTSCache.make_key(segment.text, api_language, voice, make_clean=False)
+    if reduced_key in tts_cache:
+        return reduced_key, REDUCED_QUALITY
+    if tts_cache.has(reduced_key, allow_stale=True):
+        return reduced_key, STALE_CACHE
+    return None
+
+
+def combine_degradations(values) -> Optional[str]:
+    """Join the distinct X-Degraded values of a result's segments (None if none)."""
+    return ", ".join(sorted({value for value in values if value})) or None
+
+
+async def synthesize_segment(
+    segment: NormalizedText,
+    voice: str,
+    degraded: bool = False
+) -> Tuple[bytes, float, int, bool, Optional[str]]:
+    """
+    Synthesize one segment, using the TTS cache when possible.
     
     Args:
-        text: Text to synthesize with the cloned voice (required)
-        language: Language code - 'en' or 'bn' (required)
-        reference: Audio file containing the voice to clone (required)
-        make_clean: Apply audio cleaning/enhancement (optional, default: true)
-        sample_rate: Output audio sample rate in Hz (optional, default: 16000)
-        
+        segment: Prepared segment text and language
+        voice: Voice name
+        degraded: Upstream is overloaded - accept degraded cache hits and
+            request cheaper audio (make_clean=False) on a miss
+    
     Returns:
-        TTSCloneResponse with success status, audio data URL, and metadata
-        
-    Raises:
-        HTTPException: If text is empty, reference file is invalid, or TTS API fails
+        Tuple of (audio bytes, processing time, text length, cache hit,
+        X-Degraded value or None)
     """
-    logger.info(f"TTS voice cloning requested: language={language}, text_length={len(text)}, reference_file={reference.filename}, make_clean={make_clean}, sample_rate={sample_rate}")
+    found = find_cached_segment(segment, voice, degraded)
+    if found is not None:
+        cache_key, degradation = found
+        return tts_cache.get(cache_key, allow_stale=True), 0.0, len(segment.text), True, degradation
+    
+    api_language = map_language_to_api(segment.language)
+    make_clean = not degraded
+    audio_bytes, processing_time, text_length = await call_tts_api(segment.text, voice, api_language, make_clean)
+    tts_cache.put(TTSCache.make_key(segment.text, api_language, voice, make_clean), audio_bytes)
+    return audio_bytes, processing_time, text_length, False, None if make_clean else REDUCED_QUALITY
+
+
+def lookup_cached_tts(text: str, language: str, voice: str, degraded: bool = False) -> Optional[SynthesisResult]:
+    """
+    Answer a TTS request from the phrase bank or TTS cache without any upstream call.
+    
+    Args:
+        text: Raw input text
+        language: Frontend language name ("bangla", "english" or "auto")
+        voice: Voice name
+        degraded: Also accept stale and reduced-quality cache entries
+    
+    Returns:
+        SynthesisResult if the whole text (e.g. from an earlier splice
+        fallback) or every segment is available locally, otherwise None
+    """
+    banked = phrase_bank.get(phrase_bank_key(PhraseEntry(text, language, voice)))
+    if banked is not None:
+        prepared = prepare_tts_text(text, language)
+        return SynthesisResult(
+            audio_bytes=banked,
+            language=prepared.language,
+            processing_time=0.0,
+            text_length=len(prepared.text),
+            segments=1,
+            cache_hits=1,
+            source="phrase-bank"
+        )
+    
+    segments = plan_tts_segments(text, language)
+    if len(segments) > 1:
+        whole = prepare_tts_text(text, language)
+        found_whole = find_cached_segment(whole, voice, degraded)
+        if found_whole is not None:
+            return SynthesisResult(
+                audio_bytes=tts_cache.get(found_whole[0], allow_stale=True),
+                language=whole.language,
+                processing_time=0.0,
+                text_length=len(whole.text),
+                segments=1,
+                cache_hits=1,
+                source="cache",
+                degradation=found_whole[1]
+            )
+    
+    found = [find_cached_segment(segment, voice, degraded) for segment in segments]
+    if not all(found):
+        return None
+    
+    try:
+        audio_bytes = concat_wav(conform_sample_rates([tts_cache.get(key, allow_stale=True) for key, _ in found]))
+    except ValueError:
+        return None
+    
+    languages = {segment.language for segment in segments}
+    return SynthesisResult(
+        audio_bytes=audio_bytes,
+        language=languages.pop() if len(languages) == 1 else "mixed",
+        processing_time=0.0,
+        text_length=sum(len(segment.text) for segment in segments),
+        segments=len(segments),
+        cache_hits=len(segments),
+        source="cache",
+        degradation=combine_degradations(degradation for _, degradation in found)
+    )
+
+
+async def synthesize_tts(
+    text: str,
+    language: str,
+    voice: str,
+    priority: Optional[str] = None,
+    allow_degraded: bool = True
+) -> SynthesisResult:
+    """
+    Synthesize a TTS request, splitting mixed-language text into segments.
+    
+    Requests found in the phrase bank or fully cached are answered without
+    any upstream call. Otherwise segments are synthesized concurrently (at most
+    TTS_SEGMENT_CONCURRENCY at a time) over the shared upstream client and
+    spliced back together in order, resampled to a common rate if needed. If
+    the segments can't be spliced (different sample formats), the whole text
+    is synthesized in one call instead.
+    
+    While SenseTTS is overloaded (see tts_degradation), stale and
+    reduced-quality cache hits are accepted, misses are synthesized with
+    make_clean=False, and low-priority requests are shed.
+    
+    Args:
+        text: Raw input text
+        language: Frontend language name ("bangla", "english" or "auto")
+        voice: Voice name
+        priority: Request priority ("low" requests are shed under overload)
+        allow_degraded: False to always produce full-quality audio and keep
+            the result out of the degradation stats (audio that is archived
+            rather than served, e.g. phrase bank warm-up)
+    
+    Returns:
+        SynthesisResult with the audio and synthesis statistics
+    
+    Raises:
+        HTTPException: If the upstream fails or the request was shed (503)
+        httpx.HTTPError: On transport errors talking to the upstream
+    """
+    degraded = allow_degraded and tts_degradation.level() >= LoadLevel.DEGRADED
+    with stage("cache"):
+        cached = lookup_cached_tts(text, language, voice, degraded)
+    if cached is not None:
+        if allow_degraded:
+            tts_degradation.record(cached.degradation)
+        return cached
+    
+    if tts_degradation.should_shed(priority):
+        raise shed_request_error("SenseTTS", tts_degradation)
+    
+    segments = plan_tts_segments(text, language)
+    semaphore = asyncio.Semaphore(TTS_SEGMENT_CONCURRENCY)
+    
+    async def run(segment: NormalizedText):
+        async with semaphore:
+            return await synthesize_segment(segment, voice, degraded)
+    
+    tasks = [asyncio.create_task(run(segment)) for segment in segments]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        # Don't keep the upstream busy with segments nobody will use
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    try:
+        with stage("concat"):
+            audio_bytes = concat_wav(conform_sample_rates([result[0] for result in results]))
+    except ValueError as e:
+        logger.warning(
+            "Failed to splice %s segments, synthesizing the text in one call: %s", len(segments), e,
+            extra={"event": "tts_splice_fallback", "segments": len(segments)}
+        )
+        segments = [prepare_tts_text(text, language)]
+        results = [await synthesize_segment(segments[0], voice, degraded)]
+        audio_bytes = results[0][0]
+    
+    languages = {segment.language for segment in segments}
+    degradation = combine_degradations(result[4] for result in results)
+    if allow_degraded:
+        tts_degradation.record(degradation)
+    return SynthesisResult(
+        audio_bytes=audio_bytes,
+        language=languages.pop() if len(languages) == 1 else "mixed",
+        processing_time=sum(result[1] for result in results),
+        text_length=sum(result[2] for result in results),
+        segments=len(segments),
+        cache_hits=sum(1 for result in results if result[3]),
+        degradation=degradation
+    )
+
+
+def shed_request_error(service: str, policy: DegradationPolicy) -> HTTPException:
+    """Build the 503 returned to a low-priority request shed under overload."""
+    logger.warning("%s overloaded, shedding low-priority request", service, extra={"event": "request_shed"})
+    return HTTPException(
+        status_code=503,
+        detail=f"{service} is overloaded; low-priority requests are temporarily rejected. Please retry later.",
+        headers={"Retry-After": str(policy.retry_after())}
+    )
+
+
+def tts_response_metadata(result: SynthesisResult, voice: str) -> Dict[str, str]:
+    """
+    Build the response metadata for a synthesized TTS result.
+    
+    Args:
+        result: Synthesis result
+        voice: Voice name used
+    
+    Returns:
+        Metadata dictionary with string values
+    """
+    metadata = {
+        "language": result.language,
+        "voice": voice,
+        "provider": "SenseTTS",
+        "processingTime": f"{result.processing_time:.2f}s",
+        "textLength": str(result.text_length),
+        "audioSize": f"{len(result.audio_bytes) / 1024:.2f} KB",
+        "segments": str(result.segments),
+        "cacheHits": str(result.cache_hits),
+        "source": result.source,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if result.degradation:
+        metadata["degraded"] = result.degradation
+    return metadata
+
+
+def upstream_error_status(error: Exception, service: str, failure: str) -> Tuple[int, str]:
+    """
+    Map an upstream failure to an HTTP status code and message.
+    
+    Mirrors the error handling of the single-item endpoints for batch
+    endpoints that report errors per item instead of raising.
+    
+    Args:
+        error: Exception raised while processing the item
+        service: Upstream name used in messages (e.g. "SenseTTS API")
+        failure: Message prefix for unexpected errors (e.g. "Failed to generate audio")
+    
+    Returns:
+        Tuple of (status code, error message)
+    """
+    if isinstance(error, HTTPException):
+        return error.status_code, str(error.detail)
+    if isinstance(error, httpx.TimeoutException):
+        return 504, f"Request to {service} timed out. Please try again."
+    if isinstance(error, httpx.ConnectError):
+        return 503, f"Could not connect to {service}. Please check if the service is running."
+    if isinstance(error, httpx.HTTPError):
+        return 500, f"Request to {service} failed: {str(error)}"
+    return 500, f"{failure}: {str(error)}"
+
+
+def prevalidated_json(endpoint):
+    """
+    Decorator that serializes an endpoint's dict result directly.
+    
+    FastAPI would validate the result against the route's response_model
+    and re-encode it before rendering. The JSON endpoints build their
+    results to match the model exactly, so that pass is skipped; the model
+    still documents the response in the OpenAPI schema. Headers set on an
+    injected `response` parameter are carried over.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        
+        json_response = FastJSONResponse(result)
+        sub_response = kwargs.get("response")
+        if sub_response is not None:
+            json_response.raw_headers.extend(
+                header for header in sub_response.raw_headers if header[0] != b"content-length"
+            )
+        return json_response
+    return wrapper
+
+
+def report_job_progress(endpoint):
+    """
+    Decorator that publishes a job's final "done" or "error" progress event.
+    
+    The job id is the request id (X-Request-ID). The endpoint itself
+    publishes the intermediate stages. Anyone who knows the id can read the
+    events, so "done" carries no part of the result.
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        job_id = request_id_var.get()
+        try:
+            result = await endpoint(*args, **kwargs)
+        except HTTPException as e:
+            job_hub.publish(job_id, "error", {"status": e.status_code, "detail": e.detail})
+            raise
+        except asyncio.CancelledError:
+            job_hub.publish(job_id, "error", {"status": 499, "detail": "Request cancelled"})
+            raise
+        except Exception:
+            job_hub.publish(job_id, "error", {"status": 500, "detail": "Internal server error"})
+            raise
+        job_hub.publish(job_id, "done")
+        return result
+    return wrapper
+
+
+def check_idempotency_key(key: str) -> None:
+    """Reject Idempotency-Key headers longer than MAX_KEY_LENGTH."""
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+
+async def run_idempotent(scope: str, key: str, digest: str, operation, response: Response):
+    """
+    Run operation at most once per `Idempotency-Key`.
+    
+    Requests with a key already in flight attach to the running operation;
+    keys that completed successfully replay the stored result together with
+    its X-Degraded header. Either way the response carries
+    `Idempotent-Replayed: true`.
+    
+    The operation runs shielded from the request that started it, so it must
+    not touch request-scoped objects such as UploadFiles, which FastAPI
+    closes as soon as the handler returns.
+    
+    Args:
+        scope: Namespace for the keys (one per endpoint)
+        key: Client-supplied Idempotency-Key
+        digest: Hash of the request parameters
+        operation: Zero-argument coroutine function producing the result
+        response: Outgoing response of the current request
+    
+    Returns:
+        The operation's result
+    """
+    check_idempotency_key(key)
+    
+    async def run():
+        result = await operation()
+        # Stored with the result so replays are marked the same way
+        return result, response.headers.get(DEGRADED_HEADER)
+    
+    try:
+        (result, degradation), replayed = await idempotency.run(f"{scope}:{key}", digest, run)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if replayed:
+        logger.info("Idempotent replay for %s", scope, extra={"event": "idempotent_replay", "scope": scope})
+        response.headers["Idempotent-Replayed"] = "true"
+        if degradation:
+            response.headers[DEGRADED_HEADER] = degradation
+    return result
+
+
+def idempotent(scope: str, fingerprint):
+    """
+    Decorator that deduplicates an endpoint by its `Idempotency-Key` header.
+    
+    The endpoint must declare `idempotency_key` (Header) and `response`
+    (Response) parameters; see run_idempotent() for the semantics.
+    
+    Args:
+        scope: Namespace for the keys (one per endpoint)
+        fingerprint: Async callable mapping the endpoint kwargs to a hash of
+            the request parameters
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            key = kwargs.get("idempotency_key")
+            if not key or idempotency is None:
+                return await endpoint(*args, **kwargs)
+            check_idempotency_key(key)
+            digest = await fingerprint(kwargs)
+            return await run_idempotent(scope, key, digest, lambda: endpoint(*args, **kwargs), kwargs["response"])
+        return wrapper
+    return decorator
+
+
+async def tts_request_fingerprint(kwargs: Dict) -> str:
+    """Hash the parameters of a `/api/tts/generate` request."""
+    request = kwargs["request"]
+    raw = json.dumps([request.text, request.language, request.voice], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def upload_fingerprint(filename: Optional[str], content: bytes, timestamps: bool) -> str:
+    """Hash the validated upload and options of a `/api/asr/transcribe` request."""
+    options = json.dumps([filename or "", bool(timestamps)], ensure_ascii=False)
+    digest = hashlib.sha256(options.encode("utf-8") + b"\0")
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def validate_audio(
+    header: bytes,
+    size_bytes: int,
+    allowed_formats: List[str],
+    max_seconds: float,
+    label: str = "File"
+) -> AudioProbe:
+    """
+    Identify uploaded audio from its content and check it against the limits.
+    
+    Only durations read from the container header are enforced; size-based
+    estimates are too rough to reject a file on.
+    
+    Args:
+        header: Leading bytes of the file (at least PROBE_BYTES if available)
+        size_bytes: Total file size
+        allowed_formats: Accepted container formats
+        max_seconds: Maximum audio duration
+        label: Name of the file in error messages ("File", "Reference file")
+    
+    Returns:
+        AudioProbe with the file's format, duration, sample rate and channels
+    
+    Raises:
+        HTTPException: 400 if the audio is unrecognized, corrupt, of a
+            disallowed format or too long
+    """
+    try:
+        probe = probe_audio(header, size_bytes)
+    except AudioProbeError as e:
+        logger.warning("%s rejected: %s", label, e)
+        raise HTTPException(
+            status_code=400,
+            detail=f"{label} is not valid audio ({e}). Supported formats: {', '.join(allowed_formats)}"
+        )
+    
+    if probe.format not in allowed_formats:
+        logger.warning("%s has unsupported format: %s", label, probe.format)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported audio format ({probe.format}). Supported formats: {', '.join(allowed_formats)}"
+        )
+    
+    if not probe.duration_estimated and probe.duration_seconds > max_seconds:
+        logger.warning("%s too long: %.1fs", label, probe.duration_seconds)
+        raise HTTPException(
+            status_code=400,
+            detail=f"{label} duration ({probe.duration_seconds:.1f}s) exceeds maximum limit of {max_seconds:g}s"
+        )
+    
+    return probe
+
+
+async def probe_upload(
+    upload: UploadFile,
+    allowed_formats: List[str],
+    max_size_mb: float,
+    max_seconds: float,
+    label: str = "File"
+) -> AudioProbe:
+    """
+    Validate an uploaded file from its size and first few KB, before it is read.
+    
+    Args:
+        upload: Uploaded file (left rewound to the start)
+        allowed_formats: Accepted container formats
+        max_size_mb: Maximum file size in MB
+        max_seconds: Maximum audio duration
+        label: Name of the file in error messages
+    
+    Returns:
+        AudioProbe with the file's metadata
+    
+    Raises:
+        HTTPException: 400 if the file is too large or not acceptable audio
+    """
+    size_bytes = upload.size if upload.size is not None else len(await upload.read())
+    size_mb = size_bytes / (1024 * 1024)
+    if size_mb > max_size_mb:
+        logger.warning("%s too large: %.2f MB", label, size_mb)
+        raise HTTPException(
+            status_code=400,
+            detail=f"{label} size ({size_mb:.2f} MB) exceeds maximum limit of {max_size_mb:g} MB"
+        )
+    
+    await upload.seek(0)
+    header = await upload.read(PROBE_BYTES)
+    await upload.seek(0)
+    return validate_audio(header, size_bytes, allowed_formats, max_seconds, label)
+
+
+def publish_queued(job_id: str, monitor: UpstreamMonitor) -> Dict:
+    """
+    Publish the "queued" stage for a job about to call an upstream.
+    
+    Args:
+        job_id: Job (request) id
+        monitor: Monitor of the upstream being called
+    
+    Returns:
+        httpx request extensions that publish "upstream_started" once a
+        pooled connection has been acquired and the request is being sent
+    """
+    job_hub.publish(job_id, "queued", {"position": monitor.queue_depth, "inFlight": monitor.in_flight})
+    
+    async def trace(event_name: str, info: Dict) -> None:
+        if event_name.endswith("send_request_headers.started"):
+            job_hub.publish(job_id, "upstream_started")
+    
+    return {"trace": trace}
+
+
+async def call_asr_api(
+    filename: str,
+    audio,
+    content_type: str,
+    size_bytes: int,
+    estimated_seconds: float,
+    job_id: Optional[str] = None,
+    timestamps: bool = False,
+    require_speech: bool = True
+) -> Dict:
+    """
+    Call the custom ASR `/transcribe` endpoint for one audio file.
+    
+    Args:
+        filename: Original file name
+        audio: Audio bytes or a readable file object
+        content_type: MIME type of the audio
+        size_bytes: Size of the audio file (sizes the upload timeout)
+        estimated_seconds: Estimated audio duration (sizes the read timeout)
+        job_id: Publish "queued"/"upstream_started" progress for this job, if given
+        timestamps: Ask the upstream for segment/word timestamps (used when it
+            supports them; ignored otherwise)
+        require_speech: Raise if nothing was transcribed (False for speech
+            chunks of a longer file)
+    
+    Returns:
+        Parsed ASR API response (with a non-empty "transcription" unless
+        require_speech is False)
+    
+    Raises:
+        HTTPException: If the API returns an error or no speech was detected
+        httpx.HTTPError: On transport errors talking to the upstream
+    """
+    files = {
+        'file': (filename, audio, content_type)
+    }
+    
+    # Always add punctuation for better readability
+    data = {
+        'add_punctuation': 'true'
+    }
+    if timestamps:
+        data['timestamps'] = 'true'
+    
+    logger.debug("Calling Custom ASR API at %s/transcribe...", ASR_API_BASE_URL)
+    
+    extensions = publish_queued(job_id, asr_monitor) if job_id else None
+    timeout = asr_latency.timeout(estimated_seconds, size_bytes)
+    async with asr_monitor.track() as outcome, asr_latency.measure(estimated_seconds) as measurement:
+        response = await asr_client.post(
+            f"{ASR_API_BASE_URL}/transcribe",
+            files=files,
+            data=data,
+            timeout=timeout,
+            extensions=extensions
+        )
+        outcome.status_code = response.status_code
+        measurement.ok = response.status_code == 200
+        if measurement.ok:
+            try:
+                # Train the model on the real duration once the upstream reports it
+                measurement.units = float(response.json().get('duration_seconds') or estimated_seconds)
+            except (ValueError, TypeError, AttributeError):
+                pass
+    
+    # Handle API errors
+    if response.status_code != 200:
+        error_text = response.text
+        logger.error("ASR API error %s: %s", response.status_code, error_text)
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"ASR API error: {error_text}"
+        )
+    
+    # Parse response
+    asr_result = response.json()
+    
+    if not asr_result.get('success'):
+        logger.warning("ASR API returned success=false")
+        raise HTTPException(
+            status_code=400,
+            detail="Transcription failed"
+        )
+    
+    transcribed_text = asr_result.get('transcription', '')
+    
+    if not transcribed_text and require_speech:
+        logger.warning("No text transcribed from audio")
+        raise HTTPException(
+            status_code=400,
+            detail="No speech detected in the audio file"
+        )
+    
+    logger.info(
+        "Transcription successful: %s characters, duration: %ss",
+        len(transcribed_text), asr_result.get('duration_seconds', 0),
+        extra={"event": "asr_transcribed", "characters": len(transcribed_text), "duration_seconds": asr_result.get('duration_seconds', 0)}
+    )
+    return asr_result
+
+
+def asr_response_metadata(asr_result: Dict, filename: str, probe: AudioProbe) -> Dict[str, str]:
+    """
+    Build the response metadata for a transcription.
+    
+    Args:
+        asr_result: Parsed ASR API response
+        filename: Uploaded file name
+        probe: Metadata probed from the uploaded file
+    
+    Returns:
+        Metadata dictionary with string values
+    """
+    metadata = {
+        "filename": asr_result.get('filename', filename),
+        "fileSize": f"{probe.size_bytes / (1024 * 1024):.2f} MB",
+        "format": probe.format,
+        "language": "bangla",
+        "provider": "Custom ASR",
+        "durationSeconds": str(asr_result.get('duration_seconds', round(probe.duration_seconds, 2))),
+        "wordCount": str(asr_result.get('word_count', 0)),
+        "punctuationAdded": str(asr_result.get('punctuation_added', True)),
+        "characterCount": str(len(asr_result.get('transcription', ''))),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if probe.sample_rate:
+        metadata["sampleRate"] = f"{probe.sample_rate} Hz"
+    if probe.channels:
+        metadata["channels"] = str(probe.channels)
+    return metadata
+
+
+async def transcribe_timed_segments(
+    filename: str,
+    audio_content: bytes,
+    probe: AudioProbe,
+    job_id: Optional[str] = None
+) -> AsyncIterator[TimedSegment]:
+    """
+    Transcribe an upload into timed segments, yielded in order as they complete.
+    
+    The audio is split at silences and the speech chunks are transcribed
+    concurrently (at most `ASR_SEGMENT_CONCURRENCY` at a time). Upstream
+    timestamps are used when the ASR API returns them; otherwise the chunk
+    boundaries time each segment and word times are estimated. Without
+    ffmpeg the whole file is transcribed in one call.
+    
+    Args:
+        filename: Uploaded file name
+        audio_content: Uploaded audio bytes
+        probe: Metadata probed from the upload
+        job_id: Publish "segmented"/"transcribed" progress for this job, if given
+    
+    Yields:
+        TimedSegment objects with times relative to the start of the file
+    
+    Raises:
+        HTTPException: If the ASR API returns an error
+        httpx.HTTPError: On transport errors talking to the upstream
+    """
+    max_seconds = speech_segmenter.max_segment_seconds
+    with stage("segmentation"):
+        speech = await speech_segmenter.split(audio_content, probe.format)
+    if speech is None:
+        asr_result = await call_asr_api(
+            filename,
+            audio_content,
+            probe.mime_type,
+            len(audio_content),
+            probe.duration_seconds,
+            job_id=job_id,
+            timestamps=True
+        )
+        duration = float(asr_result.get('duration_seconds') or probe.duration_seconds)
+        for segment in timed_segments(asr_result, 0.0, duration, max_seconds, ESTIMATED):
+            yield segment
+        return
+    
+    with speech:
+        if job_id:
+            job_hub.publish(job_id, "segmented", {
+                "chunks": len(speech.chunks),
+                "durationSeconds": round(speech.duration_seconds, 2)
+            })
+        stem = os.path.splitext(filename or "audio")[0]
+        slots = asyncio.Semaphore(ASR_SEGMENT_CONCURRENCY)
+        
+        async def transcribe_chunk(index: int) -> List[TimedSegment]:
+            chunk = speech.chunks[index]
+            async with slots:
+                offset, wav = await asyncio.to_thread(speech.read_wav, chunk)
+                asr_result = await call_asr_api(
+                    f"{stem}.{index}.wav",
+                    wav,
+                    "audio/wav",
+                    len(wav),
+                    chunk.duration,
+                    timestamps=True,
+                    require_speech=False
+                )
+            return timed_segments(asr_result, chunk.start, chunk.end, max_seconds, VOICE_ACTIVITY, offset=offset)
+        
+        tasks = [asyncio.create_task(transcribe_chunk(index)) for index in range(len(speech.chunks))]
+        try:
+            for index, task in enumerate(tasks):
+                for segment in await task:
+                    yield segment
+                if job_id:
+                    job_hub.publish(job_id, "transcribed", {
+                        "chunk": index + 1,
+                        "of": len(tasks),
+                        "seconds": round(speech.chunks[index].end, 2)
+                    })
+        finally:
+            # Stop transcribing chunks nobody will read (client gone or a chunk failed)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def timed_transcript_result(segments: List[TimedSegment], probe: AudioProbe) -> Dict:
+    """
+    Summarize timed segments in the shape of an ASR API response.
+    
+    Args:
+        segments: Transcribed segments in order
+        probe: Metadata probed from the upload
+    
+    Returns:
+        Dictionary with transcription, duration_seconds and word_count, for
+        asr_response_metadata
+    """
+    return {
+        "transcription": " ".join(segment.text for segment in segments),
+        # Header durations can be estimates; the segments were timed on the decoded audio
+        "duration_seconds": round(max(probe.duration_seconds, segments[-1].end), 2),
+        "word_count": sum(len(segment.words) for segment in segments),
+        "punctuation_added": True
+    }
+
+
+def audio_url_for_key(key: str, http_request: Request) -> str:
+    """
+    Build the public URL for a stored audio key.
+    
+    Args:
+        key: Content-addressed storage key
+        http_request: Incoming request (used when PUBLIC_API_URL is not set)
+    
+    Returns:
+        Absolute URL of the audio serving endpoint for this key
+    
+    Behind a TLS-terminating proxy (Railway, Vercel), the request URL is only
+    https if uvicorn trusts the proxy headers (`--proxy-headers
+    --forwarded-allow-ips`, as in the start commands); otherwise set
+    PUBLIC_API_URL so https pages don't get mixed-content audio links.
+    """
+    if PUBLIC_API_URL:
+        return f"{PUBLIC_API_URL.rstrip('/')}/api/audio/{key}"
+    return str(http_request.url_for("get_audio", key=key))
+
+
+async def store_generated_audio(audio_bytes: bytes, http_request: Request) -> Tuple[str, Optional[str]]:
+    """
+    Persist generated audio and return a URL the browser can play.
+    
+    Audio is written to the content-addressed audio store so clients (and the
+    history table) only carry a short URL. If storage is disabled or the write
+    fails, a base64 data URL is returned instead so generation never fails
+    because of storage.
+    
+    Args:
+        audio_bytes: Generated WAV audio
+        http_request: Incoming request (used to build absolute URLs)
+    
+    Returns:
+        Tuple of (audio URL, storage key or None)
+    """
+    if audio_store is not None:
+        try:
+            with stage("store"):
+                stored = await run_in_threadpool(audio_store.put, audio_bytes)
+            return audio_url_for_key(stored.key, http_request), stored.key
+        except Exception as e:
+            logger.error("Failed to store generated audio, falling back to data URL: %s", e)
+    
+    with stage("encode"):
+        base64_audio = base64.b64encode(audio_bytes).decode('utf-8')
+        return f"data:audio/wav;base64,{base64_audio}", None
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP Range header ("bytes=start-end").
+    
+    Args:
+        range_header: Value of the Range request header
+        size: Total size of the resource in bytes
+    
+    Returns:
+        Inclusive (start, end) byte offsets, or None if the range is
+        malformed or unsatisfiable
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # Suffix range: last N bytes
+            suffix = int(end_str)
+            if suffix <= 0:
+                return None
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def verify_admin_key(x_admin_key: Optional[str] = Header(default=None)) -> None:
+    """
+    Dependency that protects admin endpoints with the `X-Admin-Key` header.
+    
+    Raises:
+        HTTPException: If admin endpoints are disabled or the key is wrong
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (ADMIN_API_KEY not set)")
+    if not admin_key_matches(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+async def refresh_phrase_bank() -> Dict[str, int]:
+    """
+    Re-read the phrase bank manifest and synthesize any missing entries.
+    
+    Returns:
+        Counts of added, removed, kept and failed entries
+    """
+    entries = await run_in_threadpool(load_manifest, PHRASE_BANK_MANIFEST)
+    
+    async def synthesize(entry: PhraseEntry) -> bytes:
+        # Archived audio is served indefinitely, so never warm with degraded audio
+        result = await synthesize_tts(entry.text, entry.language, entry.voice, allow_degraded=False)
+        return result.audio_bytes
+    
+    counts = await phrase_bank.refresh(entries, phrase_bank_key, synthesize, PHRASE_BANK_CONCURRENCY)
+    logger.info("Phrase bank refreshed: %s", counts)
+    return counts
+
+
+async def run_phrase_bank_warmer():
+    """
+    Background task: warm the phrase bank at startup and then every
+    PHRASE_BANK_REFRESH_SECONDS (if set).
+    """
+    while True:
+        try:
+            await refresh_phrase_bank()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Phrase bank refresh failed: %s", e)
+        
+        if PHRASE_BANK_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(PHRASE_BANK_REFRESH_SECONDS)
+
+
+def etag_matches(header_value: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match / If-Range header value against an ETag.
+    
+    Args:
+        header_value: Raw header value (may list several ETags or be "*")
+        etag: Current strong ETag of the resource
+    
+    Returns:
+        True if the header matches the ETag
+    """
+    if not header_value:
+        return False
+    if header_value.strip() == "*":
+        return True
+    # Weak comparison (W/ prefix ignored) as required for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in header_value.split(",")]
+    return etag in candidates
+
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+@app.get("/", tags=["Health"])
+async def root():
+    """
+    Root endpoint - API health check.
+    
+    Returns:
+        Basic API information and status
+    """
+    return {
+        "message": "SenseVoice TTS API",
+        "status": "running",
+        "version": "1.0.0",
+        "docs": "/docs"
+    }
+
+
+@app.get("/health", tags=["Health"])
+async def health_check():
+    """
+    Detailed health check endpoint.
+    
+    Returns:
+        API health status and configuration info
+    """
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "upstreams": {
+            "tts": tts_monitor.snapshot(),
+            "tts_clone": clone_monitor.snapshot(),
+            "asr": asr_monitor.snapshot()
+        },
+        "supported_languages": ["bangla", "english"],
+        "available_voices": ["female", "male"]
+    }
+
+
+@app.get("/health/live", tags=["Health"])
+async def liveness_check():
+    """
+    Liveness probe: the process is up and the event loop is responsive.
+    
+    Never touches the upstreams, so a slow GPU service can't get this
+    container restarted.
+    
+    Returns:
+        Static status object
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe backed by the cached results of the background prober.
+    
+    Returns 503 when an upstream failed its last probe, has not been probed
+    recently, or its recent error rate exceeds READINESS_MAX_ERROR_RATE.
+    Pool saturation and queue depth are included for autoscaling.
+    
+    Returns:
+        Readiness status with per-upstream statistics
+    """
+    monitors = (tts_monitor, clone_monitor, asr_monitor)
+    ready = all(
+        monitor.is_ready(READINESS_MAX_PROBE_AGE, READINESS_MAX_ERROR_RATE)
+        for monitor in monitors
+    )
+    content = {
+        "status": "ready" if ready else "not_ready",
+        "timestamp": datetime.utcnow().isoformat(),
+        "upstreams": {monitor.name: monitor.snapshot() for monitor in monitors},
+        "ttsCache": tts_cache.stats(),
+        "phraseBank": phrase_bank.stats(),
+        "jobs": job_hub.stats(),
+        "degradation": {policy.monitor.name: policy.stats() for policy in (tts_degradation, clone_degradation)},
+        "referencePreprocessing": reference_preprocessor.stats(),
+        "speechSegmentation": speech_segmenter.stats(),
+        "profiling": profiler.stats(),
+        "idempotency": idempotency.stats() if idempotency is not None else None,
+        "timeouts": {model.name: model.stats() for model in (tts_latency, clone_latency, asr_latency)}
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+
+@app.post(
+    "/api/tts/generate",
+    response_model=TTSResponse,
+    responses={
+        200: {"description": "Audio generated successfully"},
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        500: {"model": ErrorResponse, "description": "Server error"}
+    },
+    tags=["TTS"]
+)
+@prevalidated_json
+@idempotent("tts_generate", tts_request_fingerprint)
+async def generate_tts(
+    request: TTSRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None),
+    x_priority: Optional[str] = Header(default=None)
+):
+    """
+    Generate speech audio from text using SenseTTS API.
+    
+    This endpoint accepts text input along with language and voice preferences,
+    then generates high-quality speech audio using the SenseTTS API.
+    The audio is stored in the audio store and returned as a short URL served
+    by `/api/audio/{key}` (or a base64 data URL if storage is disabled).
+    
+    **Supported Languages:**
+    - `bangla`: Bengali language with proper pronunciation
+    - `english`: English language with natural intonation
+    - `auto`: Detect the language from the script; mixed Bengali/English text
+      is split into runs that are synthesized separately and spliced
+    
+    Text is normalized before synthesis (Unicode NFC, whitespace, numbers and
+    abbreviations spelled out) unless `TTS_NORMALIZE_TEXT=false`.
+    
+    Send an `Idempotency-Key` header to make retries safe: a retry while the
+    original is running waits for it, and a retry after it succeeded replays
+    the same result (marked with `Idempotent-Replayed: true`).
+    
+    When SenseTTS is overloaded the response may be degraded - a stale or
+    reduced-quality cached rendition, or audio synthesized without cleaning -
+    and is then marked with an `X-Degraded` header. Requests sent with
+    `X-Priority: low` are rejected with 503 (and `Retry-After`) under heavy
+    overload unless they can be answered from the cache.
+    
+    **Available Voices:**
+    - `female`: Warm, friendly female voice (works for all languages)
+    - `male`: Deep, authoritative male voice (works for all languages)
+    
+    Args:
+        request: TTSRequest object containing text, language, and voice
+        http_request: Incoming HTTP request (used to build the audio URL)
+        response: Outgoing response (for the Idempotent-Replayed and X-Degraded headers)
+        idempotency_key: Optional client key that deduplicates retries
+        x_priority: Optional request priority ("low" may be shed under overload)
+    
+    Returns:
+        TTSResponse with success status, audio URL, storage key, and metadata
+        
+    Raises:
+        HTTPException: If text is empty or SenseTTS API fails
+    """
+    logger.info(
+        "TTS generation requested: language=%s, voice=%s, text_length=%s",
+        request.language, request.voice, len(request.text),
+        extra={"event": "tts_requested", "language": request.language, "voice": request.voice, "text_length": len(request.text)}
+    )
+    
+    # Validate input text
+    if not request.text or not request.text.strip():
+        logger.warning("Empty text received")
+        raise HTTPException(status_code=400, detail="Text is required and cannot be empty")
+    
+    try:
+        logger.debug("Calling SenseTTS API at %s/tts...", TTS_API_BASE_URL)
+        
+        # Normalize, split mixed-language text and synthesize (with caching)
+        result = await synthesize_tts(request.text, request.language, request.voice, x_priority)
+        if result.degradation:
+            response.headers[DEGRADED_HEADER] = result.degradation
+        
+        audio_size_kb = len(result.audio_bytes) / 1024
+        
+        logger.info(
+            "Audio generated successfully: %.2f KB, processing time: %.2fs, segments: %s, cache hits: %s",
+            audio_size_kb, result.processing_time, result.segments, result.cache_hits,
+            extra={
+                "event": "tts_generated",
+                "audio_kb": round(audio_size_kb, 2),
+                "processing_time": result.processing_time,
+                "segments": result.segments,
+                "cache_hits": result.cache_hits,
+                "source": result.source,
+            }
+        )
+        
+        # Store audio and get a short URL for browser playback
+        audio_url, audio_key = await store_generated_audio(result.audio_bytes, http_request)
+        
+        # Prepare response with metadata
+        response_data = {
+            "success": True,
+            "audioUrl": audio_url,
+            "audioKey": audio_key,
+            "metadata": tts_response_metadata(result, request.voice)
+        }
+        
+        logger.info("TTS generation completed successfully")
+        return response_data
+    
+    except HTTPException:
+        raise
+    
+    except httpx.TimeoutException as e:
+        logger.error("Request timeout: %s", e)
+        raise HTTPException(
+            status_code=504,
+            detail="Request to SenseTTS API timed out. Please try again."
+        )
+    
+    except httpx.ConnectError as e:
+        logger.error("Connection failed: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Could not connect to SenseTTS API. Please check if the service is running."
+        )
+    
+    except httpx.HTTPError as e:
+        logger.error("HTTP request failed: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Request to SenseTTS API failed: {str(e)}"
+        )
+    
+    except Exception as e:
+        logger.error("Unexpected error during TTS generation: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate audio: {str(e)}"
+        )
+
+
+@app.post(
+    "/api/tts/generate/batch",
+    responses={
+        200: {"description": "NDJSON stream of per-item results", "content": {"application/x-ndjson": {}}},
+        422: {"description": "Invalid request"}
+    },
+    tags=["TTS"]
+)
+async def generate_tts_batch(
+    request: TTSBatchRequest,
+    http_request: Request,
+    x_priority: Optional[str] = Header(default="low")
+):
+    """
+    Generate speech audio for many texts in one request.
+    
+    Items are synthesized concurrently (at most `TTS_BATCH_CONCURRENCY` at a
+    time) over the shared SenseTTS connection pool. Items already in the
+    phrase bank or TTS cache are answered immediately, before any upstream
+    call is made.
+    
+    The response is an NDJSON stream (`application/x-ndjson`) with one line
+    per item, written in completion order - not request order - so clients
+    can start playing early results. Each line carries the item `id` (or its
+    position if no id was given) and `index`, plus either the usual
+    `audioUrl`/`audioKey`/`metadata` fields or `status` and `error`. One
+    failing item never fails the whole batch.
+    
+    Batches are low priority by default: under heavy SenseTTS overload,
+    items that aren't cached fail with status 503 unless the request is sent
+    with `X-Priority: normal`. Degraded items carry `metadata.degraded`.
+    
+    Args:
+        request: TTSBatchRequest with the items to synthesize
+        http_request: Incoming HTTP request (used to build audio URLs)
+        x_priority: Request priority (default "low")
+    
+    Returns:
+        StreamingResponse of NDJSON result lines
+    """
+    logger.info(
+        "Batch TTS generation requested: %s items",
+        len(request.items),
+        extra={"event": "tts_batch_requested", "items": len(request.items)}
+    )
+    
+    semaphore = asyncio.Semaphore(TTS_BATCH_CONCURRENCY)
+    
+    async def result_line(index: int, item: TTSBatchItem, result: SynthesisResult) -> str:
+        audio_url, audio_key = await store_generated_audio(result.audio_bytes, http_request)
+        return json.dumps({
+            "id": item.id or str(index),
+            "index": index,
+            "success": True,
+            "audioUrl": audio_url,
+            "audioKey": audio_key,
+            "metadata": tts_response_metadata(result, item.voice)
+        }, ensure_ascii=False) + "\n"
+    
+    def error_line(index: int, item: TTSBatchItem, error: Exception) -> str:
+        status_code, detail = upstream_error_status(error, "SenseTTS API", "Failed to generate audio")
+        logger.warning("Batch TTS item %s failed (%s): %s", index, status_code, detail)
+        return json.dumps({
+            "id": item.id or str(index),
+            "index": index,
+            "success": False,
+            "status": status_code,
+            "error": detail
+        }, ensure_ascii=False) + "\n"
+    
+    async def synthesize_item(index: int, item: TTSBatchItem) -> Tuple[bool, str]:
+        try:
+            async with semaphore:
+                result = await synthesize_tts(item.text, item.language, item.voice, x_priority)
+            return True, await result_line(index, item, result)
+        except Exception as e:
+            return False, error_line(index, item, e)
+    
+    async def stream():
+        pending = []
+        succeeded = failed = 0
+        
+        # Answer empty, phrase bank and fully cached items straight away
+        for index, item in enumerate(request.items):
+            try:
+                if not item.text.strip():
+                    raise HTTPException(status_code=400, detail="Text is required and cannot be empty")
+                cached = lookup_cached_tts(item.text, item.language, item.voice)
+            except Exception as e:
+                failed += 1
+                yield error_line(index, item, e)
+                continue
+            
+            if cached is None:
+                pending.append((index, item))
+            else:
+                succeeded += 1
+                yield await result_line(index, item, cached)
+        
+        tasks = [asyncio.create_task(synthesize_item(index, item)) for index, item in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                ok, line = await next_done
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield line
+        finally:
+            # Client went away: stop synthesizing items nobody will read
+            for task in tasks:
+                task.cancel()
+        
+        logger.info(
+            "Batch TTS generation completed: %s succeeded, %s failed",
+            succeeded, failed,
+            extra={"event": "tts_batch_completed", "succeeded": succeeded, "failed": failed}
+        )
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post(
+    "/api/tts/clone",
+    response_model=TTSCloneResponse,
+    responses={
+        200: {"description": "Voice cloned and audio generated successfully"},
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        500: {"model": ErrorResponse, "description": "Server error"}
+    },
+    tags=["TTS"]
+)
+@prevalidated_json
+@report_job_progress
+async def clone_voice(
+    http_request: Request,
+    response: Response,
+    text: str = Form(..., description="Text to convert to speech with cloned voice"),
+    language: str = Form(..., description="Language code: 'en' or 'bn'"),
+    reference: UploadFile = File(..., description="Reference audio file for voice cloning"),
+    make_clean: bool = Form(default=True, description="Apply audio cleaning/enhancement"),
+    sample_rate: int = Form(default=24000, description="Output audio sample rate in Hz"),
+    x_priority: Optional[str] = Header(default=None)
+):
+    """
+    Generate speech audio with voice cloning using a reference audio sample.
+    
+    This endpoint accepts text input, language preference, and a reference audio file
+    to clone the voice characteristics from the reference and apply them to the generated speech.
+    
+    **Supported Languages:**
+    - `en`: English language
+    - `bn`: Bengali language
+    
+    **Reference Audio Requirements:**
+    - Clear audio with the target voice speaking
+    - Minimal background noise
+    - Duration: 5-30 seconds recommended (at most `CLONE_MAX_REFERENCE_SECONDS`)
+    - Supported formats: mp3, wav, m4a, flac, ogg (detected from the file
+      content, not its name); maximum file size: 10 MB
+    
+    Before upload, the reference is decoded, trimmed of leading/trailing
+    silence, loudness-normalized, resampled and capped to
+    `CLONE_REFERENCE_CLIP_SECONDS` (requires ffmpeg). The clip is cached, so
+    repeat clones with the same reference skip this step.
+    
+    **Audio Processing Options:**
+    - `make_clean`: Apply audio enhancement (default: true)
+    - `sample_rate`: Output sample rate - 16000, 22050, 24000, or 48000 Hz (default: 16000)
+    
+    When SenseTTS is overloaded, cloning runs without cleaning and at no more
+    than `CLONE_DEGRADED_SAMPLE_RATE` (marked with `X-Degraded:
+    reduced-quality`), and `X-Priority: low` requests are rejected with 503
+    under heavy overload.
+    
+    Args:
+        text: Text to synthesize with the cloned voice (required)
+        language: Language code - 'en' or 'bn' (required)
+        reference: Audio file containing the voice to clone (required)
+        make_clean: Apply audio cleaning/enhancement (optional, default: true)
+        sample_rate: Output audio sample rate in Hz (optional, default: 16000)
+        http_request: Incoming HTTP request (used to build the audio URL)
+        response: Outgoing response (for the X-Degraded header)
+        x_priority: Optional request priority ("low" may be shed under overload)
+    
+    Returns:
+        TTSCloneResponse with success status, audio URL, storage key, and metadata
+        
+    Raises:
+        HTTPException: If text is empty, reference file is invalid, or TTS API fails
+    """
+    logger.info(
+        "TTS voice cloning requested: language=%s, text_length=%s, reference_file=%s, make_clean=%s, sample_rate=%s",
+        language, len(text), reference.filename, make_clean, sample_rate,
+        extra={"event": "tts_clone_requested", "language": language, "text_length": len(text), "sample_rate": sample_rate}
+    )
     
     # Validate input text
     if not text or not text.strip():
@@ -418,70 +1990,98 @@ async def clone_voice(
     
     # Validate language
     if language not in ['en', 'bn']:
-        logger.warning(f"Invalid language code: {language}")
+        logger.warning("Invalid language code: %s", language)
         raise HTTPException(
             status_code=400,
             detail="Language must be 'en' (English) or 'bn' (Bengali)"
         )
     
-    # Validate reference file type
-    allowed_extensions = ['mp3', 'wav', 'm4a', 'flac', 'ogg']
-    file_extension = reference.filename.split('.')[-1].lower() if reference.filename else ''
+    # Validate the reference from its size and header before reading it
+    probe = await probe_upload(
+        reference, CLONE_ALLOWED_FORMATS, CLONE_MAX_REFERENCE_MB, CLONE_MAX_REFERENCE_SECONDS, "Reference file"
+    )
     
-    if file_extension not in allowed_extensions:
-        logger.warning(f"Unsupported reference file type: {file_extension}")
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported audio format. Supported formats: {', '.join(allowed_extensions)}"
-        )
+    # Under overload, ask for cheaper audio (or shed low-priority requests)
+    if clone_degradation.should_shed(x_priority):
+        raise shed_request_error("SenseTTS voice cloning", clone_degradation)
+    if clone_degradation.level() >= LoadLevel.DEGRADED:
+        make_clean = False
+        sample_rate = min(sample_rate, CLONE_DEGRADED_SAMPLE_RATE)
+        response.headers[DEGRADED_HEADER] = REDUCED_QUALITY
+        clone_degradation.record(REDUCED_QUALITY)
     
     try:
+        # Normalize text the same way as standard TTS
+        prepared = prepare_tts_text(text, "bangla" if language == "bn" else "english")
+        
         # Read reference audio file
-        reference_content = await reference.read()
+        with stage("upload"):
+            reference_content = await reference.read()
         reference_size_mb = len(reference_content) / (1024 * 1024)
         
-        if reference_size_mb > 10:
-            logger.warning(f"Reference file too large: {reference_size_mb:.2f} MB")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Reference file size ({reference_size_mb:.2f} MB) exceeds maximum limit of 10 MB"
-            )
+        logger.debug(
+            "Processing voice cloning: reference audio %s, %.2f MB, %.1fs",
+            probe.format, reference_size_mb, probe.duration_seconds
+        )
+        job_id = request_id_var.get()
+        job_hub.publish(job_id, "uploaded", {"bytes": len(reference_content), "durationSeconds": round(probe.duration_seconds, 2)})
         
-        logger.info(f"Processing voice cloning: reference audio size={reference_size_mb:.2f} MB")
+        # Convert the reference to a canonical clip (decode, trim, normalize, resample)
+        try:
+            with stage("preprocess"):
+                clip = await reference_preprocessor.prepare(reference_content, probe)
+        except ReferenceAudioError as e:
+            logger.warning("Unusable reference audio: %s", e)
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        reference_filename = reference.filename or "reference"
+        if clip.processed:
+            reference_filename = os.path.splitext(reference_filename)[0] + ".wav"
+            job_hub.publish(job_id, "preprocessed", {
+                "bytes": len(clip.audio),
+                "durationSeconds": round(clip.duration_seconds, 2),
+                "cached": clip.cached
+            })
         
         # Prepare multipart form data for TTS API
         files = {
-            'reference': (reference.filename, reference_content, reference.content_type or f'audio/{file_extension}')
+            'reference': (reference_filename, clip.audio, clip.content_type)
         }
         
         data = {
-            'text': text,
+            'text': prepared.text,
             'language': language,
             'make_clean': str(make_clean).lower(),
             'sample_rate': str(sample_rate)
         }
         
-        logger.info(f"Calling TTS API at {TTS_API_BASE_URL}/tts/clone...")
+        logger.debug("Calling TTS API at %s/tts/clone...", TTS_API_BASE_URL)
         
-        # Call TTS voice cloning API with timeout
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            response = await client.post(
+        # Call TTS voice cloning API with a size-aware timeout
+        extensions = publish_queued(job_id, clone_monitor)
+        timeout = clone_latency.timeout(len(prepared.text), len(clip.audio))
+        async with clone_monitor.track() as outcome, clone_latency.measure(len(prepared.text)) as measurement:
+            upstream_response = await clone_client.post(
                 f"{TTS_API_BASE_URL}/tts/clone",
                 files=files,
-                data=data
+                data=data,
+                timeout=timeout,
+                extensions=extensions
             )
+            outcome.status_code = upstream_response.status_code
+            measurement.ok = upstream_response.status_code == 200
             
             # Handle API errors
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"TTS Clone API error {response.status_code}: {error_text}")
+            if upstream_response.status_code != 200:
+                error_text = upstream_response.text
+                logger.error("TTS Clone API error %s: %s", upstream_response.status_code, error_text)
                 raise HTTPException(
-                    status_code=response.status_code,
+                    status_code=upstream_response.status_code,
                     detail=f"TTS Clone API error: {error_text}"
                 )
             
-            # Get audio bytes from response
-            audio_bytes = response.content
+            # Get audio bytes from the upstream response
+            audio_bytes = upstream_response.content
             
             if not audio_bytes:
                 logger.error("Empty audio response from TTS Clone API")
@@ -490,22 +2090,27 @@ async def clone_voice(
                     detail="Received empty audio from TTS Clone API"
                 )
             
+            job_hub.publish(job_id, "encoding")
             audio_size_kb = len(audio_bytes) / 1024
             
-            # Extract metadata from response headers
-            processing_time = response.headers.get("x-processing-time", "0")
-            text_length = response.headers.get("x-text-length", "0")
+            # Extract metadata from the upstream response headers
+            processing_time = upstream_response.headers.get("x-processing-time", "0")
+            text_length = upstream_response.headers.get("x-text-length", "0")
             
-            logger.info(f"Voice cloned audio generated successfully: {audio_size_kb:.2f} KB, processing time: {processing_time}s")
+            logger.info(
+                "Voice cloned audio generated successfully: %.2f KB, processing time: %ss",
+                audio_size_kb, processing_time,
+                extra={"event": "tts_cloned", "audio_kb": round(audio_size_kb, 2), "processing_time": processing_time}
+            )
             
-            # Convert audio to base64 data URL for browser playback
-            base64_audio = base64.b64encode(audio_bytes).decode('utf-8')
-            audio_data_url = f"data:audio/wav;base64,{base64_audio}"
+            # Store audio and get a short URL for browser playback
+            audio_url, audio_key = await store_generated_audio(audio_bytes, http_request)
             
             # Prepare response with metadata
             response_data = {
                 "success": True,
-                "audioUrl": audio_data_url,
+                "audioUrl": audio_url,
+                "audioKey": audio_key,
                 "metadata": {
                     "language": language,
                     "provider": "SenseTTS Voice Clone",
@@ -514,6 +2119,10 @@ async def clone_voice(
                     "audioSize": f"{audio_size_kb:.2f} KB",
                     "referenceFile": reference.filename,
                     "referenceSize": f"{reference_size_mb:.2f} MB",
+                    "referenceFormat": probe.format,
+                    "referenceDuration": f"{probe.duration_seconds:.1f}s",
+                    "referencePreprocessed": str(clip.processed),
+                    "referenceUploadSize": f"{len(clip.audio) / 1024:.2f} KB",
                     "makeClean": str(make_clean),
                     "sampleRate": f"{sample_rate} Hz",
                     "timestamp": datetime.utcnow().isoformat()
@@ -522,36 +2131,95 @@ async def clone_voice(
             
             logger.info("TTS voice cloning completed successfully")
             return response_data
-            
+    
+    except HTTPException:
+        raise
+    
     except httpx.TimeoutException as e:
-        logger.error(f"Request timeout: {str(e)}")
+        logger.error("Request timeout: %s", e)
         raise HTTPException(
             status_code=504,
             detail="Request to TTS Clone API timed out. Please try again."
         )
     
     except httpx.ConnectError as e:
-        logger.error(f"Connection failed: {str(e)}")
+        logger.error("Connection failed: %s", e)
         raise HTTPException(
             status_code=503,
             detail="Could not connect to TTS Clone API. Please check if the service is running."
         )
     
     except httpx.HTTPError as e:
-        logger.error(f"HTTP request failed: {str(e)}")
+        logger.error("HTTP request failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Request to TTS Clone API failed: {str(e)}"
         )
     
     except Exception as e:
-        logger.error(f"Unexpected error during voice cloning: {str(e)}")
+        logger.error("Unexpected error during voice cloning: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to clone voice and generate audio: {str(e)}"
         )
 
 
+async def transcribe_content(
+    filename: Optional[str],
+    audio_content: bytes,
+    probe: AudioProbe,
+    timestamps: bool,
+    job_id: str
+) -> Dict:
+    """
+    Transcribe a validated upload and build the `/api/asr/transcribe` response.
+    
+    Args:
+        filename: Original filename of the upload
+        audio_content: Audio bytes
+        probe: Result of validating the upload
+        timestamps: Include segment- and word-level timestamps
+        job_id: Job ID for progress events
+    
+    Returns:
+        Response payload matching ASRResponse
+    """
+    if timestamps:
+        segments = [
+            segment async for segment in transcribe_timed_segments(filename, audio_content, probe, job_id)
+        ]
+        if not segments:
+            raise HTTPException(
+                status_code=400,
+                detail="No speech detected in the audio file"
+            )
+        asr_result = timed_transcript_result(segments, probe)
+    else:
+        asr_result = await call_asr_api(
+            filename,
+            audio_content,
+            probe.mime_type,
+            len(audio_content),
+            probe.duration_seconds,
+            job_id=job_id
+        )
+    job_hub.publish(job_id, "encoding")
+    
+    # Prepare response with metadata
+    response_data = {
+        "success": True,
+        "text": asr_result['transcription'],
+        "metadata": asr_response_metadata(asr_result, filename, probe)
+    }
+    if timestamps:
+        response_data["segments"] = [segment.to_dict(index) for index, segment in enumerate(segments)]
+        response_data["metadata"]["segmentCount"] = str(len(segments))
+        response_data["metadata"]["timestampSource"] = ",".join(sorted({segment.source for segment in segments}))
+    
+    logger.info("ASR transcription completed successfully")
+    return response_data
+
+
 @app.post(
     "/api/asr/transcribe",
     response_model=ASRResponse,
@@ -562,8 +2230,13 @@ async def clone_voice(
     },
     tags=["ASR"]
 )
+@prevalidated_json
+@report_job_progress
 async def transcribe_audio(
-    file: UploadFile = File(..., description="Audio file to transcribe")
+    response: Response,
+    file: UploadFile = File(..., description="Audio file to transcribe"),
+    timestamps: bool = Form(False, description="Include segment- and word-level timestamps"),
+    idempotency_key: Optional[str] = Header(default=None)
 ):
     """
     Transcribe speech audio to Bengali text using custom ASR API.
@@ -573,7 +2246,8 @@ async def transcribe_audio(
     to improve readability.
     
     **Supported Audio Formats:**
-    - mp3, wav, m4a, flac, aac, wma, aiff
+    - mp3, wav, m4a, flac, aac, wma, aiff (detected from the file content,
+      not its name)
     
     **Language Support:**
     - Bengali (Bangla) only
@@ -581,10 +2255,22 @@ async def transcribe_audio(
     **Best Practices:**
     - Use clear audio with minimal background noise
     - Recommended: 16kHz or higher sample rate
-    - Maximum file size: 25 MB
+    - Maximum file size: 25 MB; maximum duration: `ASR_MAX_DURATION_SECONDS`
+    
+    **Timestamps:**
+    With `timestamps=true` the response also has `segments`, each with
+    `start`/`end` (seconds), `text` and timed `words`. The file is split at
+    silences and the chunks transcribed concurrently; times come from the ASR
+    API when it reports them, otherwise from the chunk boundaries (word times
+    within a segment are then estimated). For subtitles, see
+    `/api/asr/transcribe/subtitles`.
     
     Args:
         file: Audio file to transcribe (required)
+        timestamps: Include segment- and word-level timestamps
+        response: Outgoing response (for the Idempotent-Replayed header)
+        idempotency_key: Optional client key that deduplicates retries (a
+            retry attaches to the running transcription or replays its result)
         
     Returns:
         ASRResponse with success status, transcribed text, and metadata
@@ -592,133 +2278,644 @@ async def transcribe_audio(
     Raises:
         HTTPException: If file is invalid or ASR API fails
     """
-    logger.info(f"ASR transcription requested: filename={file.filename}, content_type={file.content_type}")
+    logger.info(
+        "ASR transcription requested: filename=%s, content_type=%s",
+        file.filename, file.content_type,
+        extra={"event": "asr_requested", "upload_filename": file.filename, "content_type": file.content_type}
+    )
     
-    # Validate file type
-    allowed_extensions = ['mp3', 'wav', 'm4a', 'flac', 'aac', 'wma', 'aiff']
-    file_extension = file.filename.split('.')[-1].lower() if file.filename else ''
+    if idempotency_key:
+        check_idempotency_key(idempotency_key)
     
-    if file_extension not in allowed_extensions:
-        logger.warning(f"Unsupported file type: {file_extension}")
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file format. Supported formats: {', '.join(allowed_extensions)}"
-        )
+    # Validate the file from its size and header before reading it
+    probe = await probe_upload(file, ASR_ALLOWED_FORMATS, ASR_MAX_FILE_SIZE_MB, ASR_MAX_DURATION_SECONDS)
     
     try:
         # Read audio file content
-        audio_content = await file.read()
-        audio_size_mb = len(audio_content) / (1024 * 1024)
-        
-        if audio_size_mb > 25:
-            logger.warning(f"File too large: {audio_size_mb:.2f} MB")
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size ({audio_size_mb:.2f} MB) exceeds maximum limit of 25 MB"
-            )
-        
-        logger.info(f"Processing audio file: {audio_size_mb:.2f} MB")
+        with stage("upload"):
+            audio_content = await file.read()
         
-        # Prepare multipart form data for custom ASR API
-        files = {
-            'file': (file.filename, audio_content, file.content_type or f'audio/{file_extension}')
-        }
+        logger.debug(
+            "Processing audio file: %s, %.2f MB, %.1fs",
+            probe.format, len(audio_content) / (1024 * 1024), probe.duration_seconds
+        )
+        job_id = request_id_var.get()
+        job_hub.publish(job_id, "uploaded", {"bytes": len(audio_content), "durationSeconds": round(probe.duration_seconds, 2)})
         
-        # Always add punctuation for better readability
-        data = {
-            'add_punctuation': 'true'
-        }
+        # Only the bytes already read go on; the UploadFile is closed when this handler returns
+        filename = file.filename
         
-        logger.info(f"Calling Custom ASR API at {ASR_API_BASE_URL}/transcribe...")
+        async def transcribe():
+            return await transcribe_content(filename, audio_content, probe, timestamps, job_id)
         
-        # Call custom ASR API with timeout
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{ASR_API_BASE_URL}/transcribe",
-                files=files,
-                data=data
-            )
-            
-            # Handle API errors
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"ASR API error {response.status_code}: {error_text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"ASR API error: {error_text}"
-                )
-            
-            # Parse response
-            asr_result = response.json()
-            
-            if not asr_result.get('success'):
-                logger.warning("ASR API returned success=false")
-                raise HTTPException(
-                    status_code=400,
-                    detail="Transcription failed"
-                )
-            
-            transcribed_text = asr_result.get('transcription', '')
-            
-            if not transcribed_text:
-                logger.warning("No text transcribed from audio")
-                raise HTTPException(
-                    status_code=400,
-                    detail="No speech detected in the audio file"
-                )
-            
-            logger.info(f"Transcription successful: {len(transcribed_text)} characters, duration: {asr_result.get('duration_seconds', 0)}s")
-            
-            # Prepare response with metadata
-            response_data = {
-                "success": True,
-                "text": transcribed_text,
-                "metadata": {
-                    "filename": asr_result.get('filename', file.filename),
-                    "fileSize": f"{audio_size_mb:.2f} MB",
-                    "format": file_extension,
-                    "language": "bangla",
-                    "provider": "Custom ASR",
-                    "durationSeconds": str(asr_result.get('duration_seconds', 0)),
-                    "wordCount": str(asr_result.get('word_count', 0)),
-                    "punctuationAdded": str(asr_result.get('punctuation_added', True)),
-                    "characterCount": str(len(transcribed_text)),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-            }
-            
-            logger.info("ASR transcription completed successfully")
-            return response_data
-            
+        if not idempotency_key or idempotency is None:
+            return await transcribe()
+        digest = await run_in_threadpool(upload_fingerprint, filename, audio_content, timestamps)
+        return await run_idempotent("asr_transcribe", idempotency_key, digest, transcribe, response)
+    
+    except HTTPException:
+        raise
+    
     except httpx.TimeoutException as e:
-        logger.error(f"Request timeout: {str(e)}")
+        logger.error("Request timeout: %s", e)
         raise HTTPException(
             status_code=504,
             detail="Request to ASR API timed out. Please try again."
         )
     
     except httpx.ConnectError as e:
-        logger.error(f"Connection failed: {str(e)}")
+        logger.error("Connection failed: %s", e)
         raise HTTPException(
             status_code=503,
             detail="Could not connect to ASR API. Please check if the service is running."
         )
     
     except httpx.HTTPError as e:
-        logger.error(f"HTTP request failed: {str(e)}")
+        logger.error("HTTP request failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Request to ASR API failed: {str(e)}"
         )
     
     except Exception as e:
-        logger.error(f"Unexpected error during ASR transcription: {str(e)}")
+        logger.error("Unexpected error during ASR transcription: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to transcribe audio: {str(e)}"
         )
 
 
+@app.post(
+    "/api/asr/transcribe/subtitles",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Subtitles, streamed cue by cue",
+            "content": {"application/x-subrip": {}, "text/vtt": {}}
+        },
+        400: {"model": ErrorResponse, "description": "Invalid request"},
+        500: {"model": ErrorResponse, "description": "Server error"}
+    },
+    tags=["ASR"]
+)
+async def transcribe_subtitles(
+    file: UploadFile = File(..., description="Audio file to transcribe"),
+    subtitle_format: str = Form("srt", alias="format", description="Subtitle format: srt or vtt")
+):
+    """
+    Transcribe an audio file straight to SRT or WebVTT subtitles.
+    
+    The file is split at silences and transcribed chunk by chunk (see the
+    `timestamps` option of `/api/asr/transcribe`). Cues are streamed as soon
+    as their chunk is transcribed, in order, so long files produce subtitles
+    progressively. Upload and first-chunk errors are returned as usual
+    status codes; if a later chunk fails, the stream ends early (WebVTT
+    output ends with a NOTE giving the reason). Progress is published at
+    `/api/jobs/{X-Request-ID}/events`.
+    
+    Args:
+        file: Audio file to transcribe (required)
+        subtitle_format: "srt" (default) or "vtt"
+    
+    Returns:
+        StreamingResponse of subtitle cues
+    
+    Raises:
+        HTTPException: If the format or file is invalid, or the first chunk fails
+    """
+    subtitle_format = subtitle_format.lower()
+    if subtitle_format not in SUBTITLE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported subtitle format '{subtitle_format}'. Use one of: {', '.join(SUBTITLE_FORMATS)}"
+        )
+    
+    logger.info(
+        "Subtitle transcription requested: filename=%s, format=%s",
+        file.filename, subtitle_format,
+        extra={"event": "asr_subtitles_requested", "upload_filename": file.filename, "subtitle_format": subtitle_format}
+    )
+    
+    probe = await probe_upload(file, ASR_ALLOWED_FORMATS, ASR_MAX_FILE_SIZE_MB, ASR_MAX_DURATION_SECONDS)
+    
+    job_id = request_id_var.get()
+    try:
+        with stage("upload"):
+            audio_content = await file.read()
+        job_hub.publish(job_id, "uploaded", {"bytes": len(audio_content), "durationSeconds": round(probe.duration_seconds, 2)})
+        
+        segments = transcribe_timed_segments(file.filename, audio_content, probe, job_id)
+        # Wait for the first cue so early failures still get a proper status code
+        first = await anext(segments, None)
+        if first is None:
+            raise HTTPException(
+                status_code=400,
+                detail="No speech detected in the audio file"
+            )
+    except Exception as e:
+        status_code, detail = upstream_error_status(e, "ASR API", "Failed to transcribe audio")
+        logger.warning("Subtitle transcription failed (%s): %s", status_code, detail)
+        job_hub.publish(job_id, "error", {"status": status_code, "detail": detail})
+        raise HTTPException(status_code=status_code, detail=detail)
+    
+    async def stream():
+        cues = 1
+        yield subtitle_header(subtitle_format) + render_cue(subtitle_format, cues, first.start, first.end, first.text)
+        try:
+            async for segment in segments:
+                cues += 1
+                yield render_cue(subtitle_format, cues, segment.start, segment.end, segment.text)
+        except Exception as e:
+            status_code, detail = upstream_error_status(e, "ASR API", "Failed to transcribe audio")
+            logger.error(
+                "Subtitle stream stopped after %s cues (%s): %s", cues, status_code, detail,
+                extra={"event": "asr_subtitles_failed", "cues": cues, "status": status_code}
+            )
+            job_hub.publish(job_id, "error", {"status": status_code, "detail": detail})
+            yield render_note(subtitle_format, f"Transcription stopped: {detail}")
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            job_hub.publish(job_id, "error", {"status": 499, "detail": "Request cancelled"})
+            raise
+        finally:
+            await segments.aclose()
+        
+        job_hub.publish(job_id, "done", {"cues": cues})
+        logger.info(
+            "Subtitle transcription completed: %s cues",
+            cues,
+            extra={"event": "asr_subtitles_completed", "cues": cues}
+        )
+    
+    return StreamingResponse(stream(), media_type=f"{SUBTITLE_FORMATS[subtitle_format]}; charset=utf-8")
+
+
+@app.post(
+    "/api/asr/transcribe/batch",
+    responses={
+        200: {"description": "NDJSON stream of per-file results", "content": {"application/x-ndjson": {}}},
+        400: {"model": ErrorResponse, "description": "Invalid request"}
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                        },
+                        "required": ["files"]
+                    }
+                }
+            }
+        }
+    },
+    tags=["ASR"]
+)
+async def transcribe_audio_batch(request: Request):
+    """
+    Transcribe many audio files sent in one multipart request.
+    
+    Upload any number of file parts (e.g. repeated `files` fields). The body
+    is parsed incrementally: each file starts transcribing as soon as its part
+    has been received, at most `ASR_BATCH_CONCURRENCY` at a time. While all
+    slots are busy the server stops reading the upload, and each file is
+    spooled to disk past 1 MB until its transcription starts, so memory stays
+    bounded however many files are sent. At most `ASR_BATCH_MAX_FILES` files are transcribed per request.
+    
+    The response is an NDJSON stream (`application/x-ndjson`) with one line
+    per file in completion order. Each line carries the file's `index` and
+    `filename`, plus either `text` and `metadata` or `status` and `error`.
+    A failing file never fails the whole batch.
+    
+    Args:
+        request: Incoming multipart/form-data request
+    
+    Returns:
+        StreamingResponse of NDJSON result lines
+    
+    Raises:
+        HTTPException: If the body is not valid multipart or contains no files
+    """
+    logger.info("Batch ASR transcription requested", extra={"event": "asr_batch_requested"})
+    
+    slots = asyncio.Semaphore(ASR_BATCH_CONCURRENCY)
+    lines: "asyncio.Queue[str]" = asyncio.Queue()
+    tasks = []
+    
+    def error_line(index: int, filename: str, status_code: int, detail: str) -> str:
+        logger.warning("Batch ASR file %s (%s) failed (%s): %s", index, filename, status_code, detail)
+        return json.dumps({
+            "index": index,
+            "filename": filename,
+            "success": False,
+            "status": status_code,
+            "error": detail
+        }, ensure_ascii=False) + "\n"
+    
+    async def transcribe_part(index: int, part: UploadedPart) -> str:
+        if part.truncated:
+            return error_line(
+                index, part.filename, 400,
+                f"File size ({part.size / (1024 * 1024):.2f} MB) exceeds maximum limit of {ASR_MAX_FILE_SIZE_MB} MB"
+            )
+        
+        try:
+            # The spooled file may be on disk, and httpx would read a file
+            # object synchronously while sending, so read it off the event loop
+            with stage("upload"):
+                audio_content = await run_in_threadpool(part.file.read)
+            probe = validate_audio(audio_content[:PROBE_BYTES], part.size, ASR_ALLOWED_FORMATS, ASR_MAX_DURATION_SECONDS)
+            asr_result = await call_asr_api(
+                part.filename,
+                audio_content,
+                probe.mime_type,
+                part.size,
+                probe.duration_seconds
+            )
+        except Exception as e:
+            status_code, detail = upstream_error_status(e, "ASR API", "Failed to transcribe audio")
+            return error_line(index, part.filename, status_code, detail)
+        
+        return json.dumps({
+            "index": index,
+            "filename": part.filename,
+            "success": True,
+            "text": asr_result['transcription'],
+            "metadata": asr_response_metadata(asr_result, part.filename, probe)
+        }, ensure_ascii=False) + "\n"
+    
+    async def run(index: int, part: UploadedPart) -> None:
+        try:
+            line = await transcribe_part(index, part)
+        finally:
+            part.close()
+            slots.release()
+        await lines.put(line)
+    
+    # Start transcribing while the rest of the body is still being received.
+    # The body must be fully read before the response starts streaming.
+    count = 0
+    try:
+        async for part in iter_multipart_files(request, ASR_MAX_FILE_SIZE_MB * 1024 * 1024):
+            if count >= ASR_BATCH_MAX_FILES:
+                part.close()
+                await lines.put(error_line(
+                    count, part.filename, 400,
+                    f"Too many files: at most {ASR_BATCH_MAX_FILES} files per batch"
+                ))
+            else:
+                await slots.acquire()
+                tasks.append(asyncio.create_task(run(count, part)))
+            count += 1
+    except BaseException as e:
+        for task in tasks:
+            task.cancel()
+        if isinstance(e, MultipartError):
+            raise HTTPException(status_code=400, detail=f"Invalid multipart body: {str(e)}")
+        raise
+    
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No audio files uploaded")
+    
+    async def stream():
+        try:
+            for _ in range(count):
+                yield await lines.get()
+        finally:
+            # Client went away: stop transcribing files nobody will read
+            for task in tasks:
+                task.cancel()
+        
+        logger.info(
+            "Batch ASR transcription completed: %s files",
+            count,
+            extra={"event": "asr_batch_completed", "files": count}
+        )
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/api/jobs/{job_id}/events",
+    responses={200: {"description": "Server-Sent Events progress stream", "content": {"text/event-stream": {}}}},
+    tags=["Jobs"]
+)
+async def job_events(job_id: str, last_event_id: Optional[str] = Header(default=None)):
+    """
+    Stream progress of a voice cloning or ASR job as Server-Sent Events.
+    
+    The job id is the request's `X-Request-ID`: generate one, send it with
+    the `/api/tts/clone` or `/api/asr/transcribe` request and open this
+    stream with the same id (before or after starting the job).
+    
+    **Events** (`event:` field, JSON `data:` with `jobId`, `stage`, `elapsedMs`):
+    - `uploaded`: upload received (`bytes`)
+    - `queued`: waiting for an upstream connection (`position`, `inFlight`)
+    - `upstream_started`: request sent to the upstream service
+    - `encoding`: upstream finished, preparing the result
+    - `done`: finished; the result itself is only returned to the original
+      request (the stream is keyed on a client-chosen id, so it never
+      carries transcripts or audio URLs)
+    - `error`: failed, with `status` and `detail`
+    
+    The stream closes after `done` or `error`. Reconnecting clients send
+    `Last-Event-ID` to skip events they have already seen; comment lines are
+    sent periodically as keep-alives.
+    
+    Args:
+        job_id: Job (request) id
+        last_event_id: Sequence number of the last event already received
+    
+    Returns:
+        StreamingResponse with `text/event-stream` content
+    """
+    try:
+        after = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        after = 0
+    
+    async def stream():
+        async for event in job_hub.subscribe(job_id, last_event_id=after):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            payload = {"jobId": job_id, "stage": event.stage, "elapsedMs": event.elapsed_ms, **event.data}
+            yield f"id: {event.seq}\nevent: {event.stage}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.head("/api/audio/{key}", name="head_audio", include_in_schema=False)
+@app.get(
+    "/api/audio/{key}",
+    name="get_audio",
+    responses={
+        200: {"description": "Full audio file"},
+        206: {"description": "Partial audio content (Range request)"},
+        304: {"description": "Not modified (ETag matched)"},
+        404: {"model": ErrorResponse, "description": "Audio not found"},
+        416: {"model": ErrorResponse, "description": "Requested range not satisfiable"}
+    },
+    tags=["Audio"]
+)
+async def get_audio(key: str, http_request: Request):
+    """
+    Serve generated audio from the content-addressed audio store.
+    
+    Keys are returned by the TTS endpoints in `audioKey` / `audioUrl`.
+    Because keys are content hashes, responses carry a strong ETag and an
+    immutable Cache-Control header so browsers and CDNs can cache them forever.
+    
+    **Caching & Seeking:**
+    - `If-None-Match`: returns 304 when the ETag matches
+    - `Range: bytes=start-end`: returns 206 with the requested slice
+    - `If-Range`: the range is honoured only if the ETag still matches
+    
+    Full local files are sent with `FileResponse`, which lets the server use
+    zero-copy file transfer where available. HEAD requests get the same
+    status and headers without reading the audio.
+    
+    Args:
+        key: Content-addressed storage key ("<sha256>.wav")
+        http_request: Incoming HTTP request (for conditional and Range headers)
+    
+    Returns:
+        The audio (200), a byte range (206) or an empty 304 response
+    
+    Raises:
+        HTTPException: If the key is invalid or unknown
+    """
+    if audio_store is None or not is_valid_key(key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    etag = etag_for_key(key)
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": AUDIO_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    
+    # Conditional GET - the key is the content hash, so a matching ETag means
+    # the client already has these exact bytes and storage need not be touched
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    
+    size = await run_in_threadpool(audio_store.size, key)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    
+    media_type = content_type_for_key(key)
+    range_header = http_request.headers.get("range")
+    
+    # If-Range: only serve the partial response if the validator still matches
+    if_range = http_request.headers.get("if-range")
+    if range_header is not None and if_range is not None and if_range.strip() != etag:
+        range_header = None
+    
+    head_only = http_request.method == "HEAD"
+    
+    if range_header is None:
+        full_headers = {**cache_headers, "Content-Length": str(size)}
+        if head_only:
+            return Response(media_type=media_type, headers=full_headers)
+        local_path = audio_store.local_path(key)
+        if local_path is not None:
+            return FileResponse(local_path, media_type=media_type, headers=cache_headers)
+        return StreamingResponse(
+            audio_store.iter_range(key, 0, size - 1),
+            media_type=media_type,
+            headers=full_headers
+        )
+    
+    byte_range = parse_range_header(range_header, size)
+    if byte_range is None:
+        return Response(
+            status_code=416,
+            headers={**cache_headers, "Content-Range": f"bytes */{size}"}
+        )
+    
+    start, end = byte_range
+    range_headers = {
+        **cache_headers,
+        "Content-Range": f"bytes {start}-{end}/{size}",
+        "Content-Length": str(end - start + 1),
+    }
+    if head_only:
+        return Response(status_code=206, media_type=media_type, headers=range_headers)
+    return StreamingResponse(
+        audio_store.iter_range(key, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=range_headers
+    )
+
+
+@app.get("/api/admin/phrase-bank", tags=["Admin"], dependencies=[Depends(verify_admin_key)])
+async def get_phrase_bank():
+    """
+    Show phrase bank statistics and the current manifest.
+    
+    Requires the `X-Admin-Key` header.
+    
+    Returns:
+        Archive statistics and manifest entries
+    """
+    entries = await run_in_threadpool(load_manifest, PHRASE_BANK_MANIFEST)
+    return {
+        "success": True,
+        "stats": phrase_bank.stats(),
+        "phrases": [entry._asdict() for entry in entries]
+    }
+
+
+@app.put("/api/admin/phrase-bank", tags=["Admin"], dependencies=[Depends(verify_admin_key)])
+async def update_phrase_bank(manifest: PhraseBankManifest):
+    """
+    Replace the phrase bank manifest and warm it.
+    
+    Only phrases that are not already archived are synthesized; phrases
+    missing from the new manifest are dropped from the archive.
+    
+    Requires the `X-Admin-Key` header.
+    
+    Args:
+        manifest: The complete list of phrases to keep pre-synthesized
+    
+    Returns:
+        Counts of added, removed, kept and failed phrases
+    """
+    entries = [PhraseEntry(item.text, item.language, item.voice) for item in manifest.phrases]
+    await run_in_threadpool(save_manifest, PHRASE_BANK_MANIFEST, entries)
+    counts = await refresh_phrase_bank()
+    return {"success": True, **counts}
+
+
+@app.post("/api/admin/phrase-bank/refresh", tags=["Admin"], dependencies=[Depends(verify_admin_key)])
+async def refresh_phrase_bank_endpoint():
+    """
+    Reload the phrase bank manifest from disk and warm missing phrases.
+    
+    Requires the `X-Admin-Key` header.
+    
+    Returns:
+        Counts of added, removed, kept and failed phrases
+    """
+    try:
+        counts = await refresh_phrase_bank()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid phrase bank manifest: {str(e)}")
+    return {"success": True, **counts}
+
+
+def require_profiling() -> None:
+    """
+    Dependency for the profiling admin endpoints.
+    
+    Raises:
+        HTTPException: If profiling is disabled (PROFILING_ENABLED is not true)
+    """
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (PROFILING_ENABLED not true)")
+
+
+@app.get("/api/admin/profiling", tags=["Admin"], dependencies=[Depends(verify_admin_key), Depends(require_profiling)])
+async def get_profiling():
+    """
+    Show the slowest recent requests per endpoint and the kept profiles.
+    
+    Every request records how long its stages took (upstream calls,
+    uploads, reference preprocessing, segmentation, cache lookups, audio
+    concatenation, storage, base64 encoding, serialization, compression).
+    The slowest `SLOW_REQUEST_CAPACITY` requests of each endpoint within
+    `SLOW_REQUEST_WINDOW_SECONDS` are listed with that breakdown, their time
+    to first byte and their request id. Time not covered by any stage is
+    spent in request parsing, logging, or waiting for the event loop.
+    
+    Profiled requests (sent with `X-Profile: true` plus `X-Admin-Key`, or
+    sampled at the configured rate) are listed newest first with the
+    allocation sites that grew the most; fetch their stack samples from
+    `/api/admin/profiling/flamegraph`.
+    
+    Requires the `X-Admin-Key` header.
+    
+    Returns:
+        Profiling settings, slow requests per endpoint and profile summaries
+    """
+    return {
+        "success": True,
+        "stats": profiler.stats(),
+        "slowRequests": profiler.slow_requests.snapshot(),
+        "profiles": [profile.summary() for profile in reversed(profiler.profiles.values())]
+    }
+
+
+@app.put("/api/admin/profiling", tags=["Admin"], dependencies=[Depends(verify_admin_key), Depends(require_profiling)])
+async def update_profiling(settings: ProfilingSettings):
+    """
+    Change the fraction of requests that are profiled.
+    
+    The setting is per process and lasts until the next restart
+    (`PROFILE_SAMPLE_RATE` sets the initial value). Profiled requests run
+    with the stack sampler and tracemalloc, which slow them down; keep the
+    rate low in production and set it back to 0 when done.
+    
+    Requires the `X-Admin-Key` header.
+    
+    Args:
+        settings: New sample rate
+    
+    Returns:
+        Updated profiling settings
+    """
+    profiler.sample_rate = settings.sampleRate
+    logger.info(
+        "Profiling sample rate set to %s", settings.sampleRate,
+        extra={"event": "profiling_updated", "sample_rate": settings.sampleRate}
+    )
+    return {"success": True, "stats": profiler.stats()}
+
+
+@app.get(
+    "/api/admin/profiling/flamegraph",
+    tags=["Admin"],
+    dependencies=[Depends(verify_admin_key), Depends(require_profiling)],
+    response_class=Response,
+    responses={200: {"description": "Folded stacks", "content": {"text/plain": {}}}}
+)
+async def get_flamegraph(request_id: Optional[str] = None):
+    """
+    Dump stack samples of profiled requests as folded stacks.
+    
+    Each line is `frame;frame;...;frame count`, root first, the input format
+    of flamegraph.pl and speedscope (e.g. `flamegraph.pl profile.txt >
+    profile.svg`). Samples are of the event loop thread, so concurrent
+    requests and idle time (in the selector) appear alongside the profiled
+    request.
+    
+    Requires the `X-Admin-Key` header.
+    
+    Args:
+        request_id: Request id of one profile; omit to merge all kept profiles
+    
+    Returns:
+        Folded-stack text
+    
+    Raises:
+        HTTPException: If no profile with that request id is kept
+    """
+    folded = profiler.flamegraph(request_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f"No profile kept for request '{request_id}'")
+    return Response(content=folded, media_type="text/plain; charset=utf-8")
+
+
 # ============================================================================
 # APPLICATION STARTUP
 # ============================================================================
@@ -732,15 +2929,32 @@ async def startup_event():
     logger.info("=" * 60)
     logger.info("SenseVoice API Starting...")
     logger.info("=" * 60)
-    logger.info(f"API Version: 1.0.0")
-    logger.info(f"Services: TTS (Text-to-Speech) & ASR (Speech-to-Text)")
-    logger.info(f"TTS API: {TTS_API_BASE_URL}")
-    logger.info(f"TTS - Supported Languages: bangla, english")
-    logger.info(f"TTS - Available Voices: female, male")
-    logger.info(f"ASR API: {ASR_API_BASE_URL}")
-    logger.info(f"ASR - Supported Languages: bangla")
-    logger.info(f"ASR - Supported Formats: mp3, wav, m4a, flac, aac, wma, aiff")
+    logger.info("API Version: 1.0.0")
+    logger.info("Services: TTS (Text-to-Speech) & ASR (Speech-to-Text)")
+    logger.info("TTS API: %s", TTS_API_BASE_URL)
+    logger.info("TTS - Supported Languages: bangla, english, auto")
+    logger.info("TTS - Text Normalization: %s", 'enabled' if TTS_NORMALIZE_TEXT else 'disabled')
+    logger.info("TTS - Available Voices: female, male")
+    logger.info("ASR API: %s", ASR_API_BASE_URL)
+    logger.info("ASR - Supported Languages: bangla")
+    logger.info("ASR - Supported Formats: mp3, wav, m4a, flac, aac, wma, aiff")
+    logger.info("Audio Store: %s", type(audio_store).__name__ if audio_store else 'disabled (data URLs)')
+    logger.info("Phrase Bank: %s phrases archived, manifest=%s", len(phrase_bank), PHRASE_BANK_MANIFEST)
     logger.info("=" * 60)
+    
+    # Warm the phrase bank in the background so startup isn't blocked
+    app.state.phrase_bank_task = asyncio.create_task(run_phrase_bank_warmer())
+    
+    # Probe the upstreams in the background; readiness reads the cached results
+    app.state.prober_task = asyncio.create_task(run_prober(
+        lambda: [
+            (tts_monitor, tts_client, f"{TTS_API_BASE_URL}{TTS_HEALTH_PATH}"),
+            (clone_monitor, clone_client, f"{TTS_API_BASE_URL}{TTS_HEALTH_PATH}"),
+            (asr_monitor, asr_client, f"{ASR_API_BASE_URL}{ASR_HEALTH_PATH}")
+        ],
+        HEALTH_PROBE_INTERVAL_SECONDS,
+        HEALTH_PROBE_TIMEOUT_SECONDS
+    ))
 
 
 @app.on_event("shutdown")
@@ -749,6 +2963,20 @@ async def shutdown_event():
     Application shutdown event handler.
     """
     logger.info("SenseVoice API shutting down...")
+    
+    for task_name in ("phrase_bank_task", "prober_task"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
+    phrase_bank.close()
+    
+    await tts_client.aclose()
+    await clone_client.aclose()
+    await asr_client.aclose()
+    
+    # Flush queued log records (and drop the atexit hook, stop() must not run twice)
+    atexit.unregister(log_listener.stop)
+    log_listener.stop()
 
 
 # ============================================================================
@@ -0,0 +1,152 @@
+"""
+Incremental multipart/form-data parsing for batch uploads.
+
+Starlette's form parser consumes the whole body before the endpoint runs.
+Batch endpoints instead iterate over file parts as they arrive, so work on
+the first file can start while later files are still uploading, and the
+consumer can stop pulling (backpressure) while enough files are in progress.
+Each part is spooled to a temporary file that only stays in memory up to a
+small threshold, so memory use does not grow with the number or size of
+uploaded files.
+"""
+
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+
+try:
+    import multipart
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import parse_options_header
+except ImportError:  # python-multipart is required for any FastAPI file upload
+    multipart = None
+
+PART_EVENTS = (
+    "part_begin", "part_data", "part_end",
+    "header_field", "header_value", "header_end", "headers_finished", "end",
+)
+
+
+class MultipartError(ValueError):
+    """Raised when the request body is not valid multipart/form-data."""
+
+
+@dataclass
+class UploadedPart:
+    """
+    One file part of a multipart body.
+    
+    Attributes:
+        filename: Client-supplied file name
+        content_type: Client-supplied content type, if any
+        file: Spooled temporary file with the content (rewound to the start)
+        size: Content size in bytes (counted even past max_file_size)
+        truncated: True if the part exceeded max_file_size and was not kept
+    """
+    filename: str
+    content_type: Optional[str]
+    file: tempfile.SpooledTemporaryFile
+    size: int = 0
+    truncated: bool = False
+    
+    def close(self) -> None:
+        """Release the spooled content."""
+        self.file.close()
+
+
+async def iter_multipart_files(
+    request: Request,
+    max_file_size: int,
+    spool_max_size: int = 1024 * 1024,
+) -> AsyncIterator[UploadedPart]:
+    """
+    Yield the file parts of a multipart/form-data request as they complete.
+    
+    Non-file fields are ignored. The caller owns each yielded part and must
+    close it.
+    
+    Args:
+        request: Incoming request with a multipart/form-data body
+        max_file_size: Parts larger than this are drained and marked truncated
+        spool_max_size: Bytes kept in memory per part before spilling to disk
+    
+    Yields:
+        UploadedPart for every file part, in upload order
+    
+    Raises:
+        MultipartError: If the body is not valid multipart/form-data
+    """
+    if multipart is None:
+        raise RuntimeError("python-multipart is required for multipart uploads")
+    
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise MultipartError("Expected a multipart/form-data body with a boundary")
+    
+    events: List[Tuple[str, bytes]] = []
+    
+    def make_callback(name: str):
+        def callback(data: Optional[bytes] = None, start: int = 0, end: int = 0) -> None:
+            events.append((name, data[start:end] if data is not None else b""))
+        return callback
+    
+    parser = multipart.MultipartParser(
+        params[b"boundary"],
+        {f"on_{name}": make_callback(name) for name in PART_EVENTS}
+    )
+    
+    headers: Dict[bytes, bytes] = {}
+    header_field = header_value = b""
+    part: Optional[UploadedPart] = None
+    finished = False
+    
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise MultipartError(str(e)) from e
+            
+            for event, data in events:
+                if event == "part_begin":
+                    headers = {}
+                    header_field = header_value = b""
+                elif event == "header_field":
+                    header_field += data
+                elif event == "header_value":
+                    header_value += data
+                elif event == "header_end":
+                    headers[header_field.lower()] = header_value
+                    header_field = header_value = b""
+                elif event == "headers_finished":
+                    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                    filename = options.get(b"filename")
+                    if filename is not None:
+                        part = UploadedPart(
+                            filename=filename.decode("utf-8", errors="replace"),
+                            content_type=headers.get(b"content-type", b"").decode("latin-1") or None,
+                            file=tempfile.SpooledTemporaryFile(max_size=spool_max_size),
+                        )
+                elif event == "part_data" and part is not None:
+                    part.size += len(data)
+                    if part.size > max_file_size:
+                        part.truncated = True
+                    elif not part.truncated:
+                        part.file.write(data)
+                elif event == "part_end" and part is not None:
+                    completed, part = part, None
+                    completed.file.seek(0)
+                    yield completed
+                elif event == "end":
+                    finished = True
+            events.clear()
+        
+        parser.finalize()
+        if not finished:
+            raise MultipartError("Incomplete multipart body")
+    finally:
+        # A part that was being received when iteration stopped is still ours
+        if part is not None:
+            part.close()
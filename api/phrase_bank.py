@@ -0,0 +1,287 @@
+"""
+Precomputed phrase bank for frequently requested TTS prompts.
+
+A manifest lists (text, language, voice) entries - IVR prompts, playground
+samples, etc. A background warmer synthesizes every entry ahead of time and
+stores the audio in a compact archive:
+
+- ``phrases-<generation>.bin``: all audio blobs back to back, memory-mapped
+- ``phrases.idx``: JSON index of key -> (offset, length) plus the data file name
+
+Lookups are a dict access plus an mmap slice, so matching requests are served
+without any upstream call. Refreshes are incremental: only entries missing
+from the archive are synthesized, and a new generation is written (and
+swapped in atomically) only when the set of entries actually changed.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import tempfile
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "phrases.idx"
+
+
+class PhraseEntry(NamedTuple):
+    """
+    One manifest entry.
+    
+    Attributes:
+        text: Text to synthesize
+        language: Frontend language name ("bangla", "english" or "auto")
+        voice: Voice name
+    """
+    text: str
+    language: str = "english"
+    voice: str = "female"
+
+
+def load_manifest(path: str) -> List[PhraseEntry]:
+    """
+    Load a phrase bank manifest.
+    
+    The manifest is a JSON list of {"text", "language", "voice"} objects, or
+    an object with such a list under "phrases".
+    
+    Args:
+        path: Path to the manifest file
+    
+    Returns:
+        Manifest entries (empty if the file does not exist)
+    
+    Raises:
+        ValueError: If the manifest is malformed
+    """
+    if not os.path.exists(path):
+        return []
+    
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    
+    items = raw.get("phrases", []) if isinstance(raw, dict) else raw
+    if not isinstance(items, list):
+        raise ValueError("Phrase bank manifest must be a list of phrases")
+    
+    entries = []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("text", "")).strip():
+            raise ValueError(f"Invalid phrase bank entry: {item!r}")
+        entries.append(PhraseEntry(
+            text=item["text"],
+            language=item.get("language", "english"),
+            voice=item.get("voice", "female"),
+        ))
+    return entries
+
+
+def save_manifest(path: str, entries: List[PhraseEntry]) -> None:
+    """Atomically write a phrase bank manifest."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"phrases": [entry._asdict() for entry in entries]}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class _Generation(NamedTuple):
+    data_file: str
+    index: Dict[str, Tuple[int, int]]
+
+
+class PhraseBank:
+    """
+    Memory-mapped archive of pre-synthesized phrase audio.
+    
+    Reads (get) happen on the event loop; archive rebuilds run in a worker
+    thread and are swapped in with a single attribute assignment.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._data_file: Optional[str] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self.hits = 0
+        self._refresh_lock = asyncio.Lock()
+        self._load()
+    
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    
+    def _load(self) -> None:
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            generation = _Generation(
+                data_file=raw["data_file"],
+                index={key: (int(v[0]), int(v[1])) for key, v in raw["entries"].items()},
+            )
+            self._swap(generation)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Failed to load phrase bank archive, starting empty: %s", e)
+    
+    def _swap(self, generation: _Generation) -> None:
+        old_file, old_mmap, old_data_file = self._file, self._mmap, self._data_file
+        
+        new_file, new_mmap = None, None
+        path = os.path.join(self.directory, generation.data_file)
+        if generation.index:
+            new_file = open(path, "rb")
+            new_mmap = mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        self._file, self._mmap = new_file, new_mmap
+        self._index = generation.index
+        self._data_file = generation.data_file
+        
+        if old_mmap is not None:
+            old_mmap.close()
+        if old_file is not None:
+            old_file.close()
+        if old_data_file and old_data_file != generation.data_file:
+            try:
+                os.unlink(os.path.join(self.directory, old_data_file))
+            except OSError:
+                pass
+    
+    def _read(self, key: str) -> Optional[bytes]:
+        location = self._index.get(key)
+        if location is None or self._mmap is None:
+            return None
+        offset, length = location
+        return self._mmap[offset:offset + length]
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the archived audio for key, or None if it is not in the bank."""
+        audio = self._read(key)
+        if audio is not None:
+            self.hits += 1
+        return audio
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return phrase bank counters for health/metrics output."""
+        return {
+            "entries": len(self._index),
+            "bytes": sum(length for _, length in self._index.values()),
+            "hits": self.hits,
+        }
+    
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    
+    def _build(self, keys: List[str], new_audio: Dict[str, bytes], generation_number: int) -> _Generation:
+        """Write a new archive generation (blocking - run in a worker thread)."""
+        data_file = f"phrases-{generation_number}.bin"
+        data_path = os.path.join(self.directory, data_file)
+        index: Dict[str, Tuple[int, int]] = {}
+        
+        with open(data_path, "wb") as f:
+            offset = 0
+            for key in keys:
+                audio = new_audio.get(key)
+                if audio is None:
+                    audio = self._read(key)
+                if audio is None:
+                    continue
+                f.write(audio)
+                index[key] = (offset, len(audio))
+                offset += len(audio)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"data_file": data_file, "entries": index}, f)
+        os.replace(tmp_path, os.path.join(self.directory, INDEX_FILE))
+        
+        return _Generation(data_file=data_file, index=index)
+    
+    async def refresh(
+        self,
+        entries: List[PhraseEntry],
+        key_fn: Callable[[PhraseEntry], str],
+        synthesize: Callable[[PhraseEntry], Awaitable[bytes]],
+        concurrency: int = 2,
+    ) -> Dict[str, int]:
+        """
+        Bring the archive in line with a manifest.
+        
+        Only entries missing from the archive are synthesized; entries no
+        longer in the manifest are dropped. Nothing is rewritten if the set
+        of entries is unchanged.
+        
+        Args:
+            entries: Manifest entries
+            key_fn: Maps an entry to its lookup key
+            synthesize: Produces audio for an entry
+            concurrency: Maximum concurrent synthesis calls
+        
+        Returns:
+            Counts of added, removed, kept and failed entries
+        """
+        async with self._refresh_lock:
+            return await self._refresh(entries, key_fn, synthesize, concurrency)
+    
+    async def _refresh(self, entries, key_fn, synthesize, concurrency) -> Dict[str, int]:
+        keyed = {}
+        for entry in entries:
+            keyed.setdefault(key_fn(entry), entry)
+        
+        missing = [key for key in keyed if key not in self._index]
+        removed = [key for key in self._index if key not in keyed]
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        new_audio: Dict[str, bytes] = {}
+        failed = 0
+        
+        async def warm(key: str):
+            nonlocal failed
+            async with semaphore:
+                try:
+                    new_audio[key] = await synthesize(keyed[key])
+                except Exception as e:
+                    failed += 1
+                    logger.error("Phrase bank warm-up failed for %r: %s", keyed[key].text[:40], e)
+        
+        await asyncio.gather(*(warm(key) for key in missing))
+        
+        if new_audio or removed:
+            current = self._data_file or "phrases-0.bin"
+            generation_number = int(current.rsplit("-", 1)[-1].split(".")[0]) + 1
+            keys = [key for key in keyed if key in new_audio or key in self._index]
+            generation = await asyncio.to_thread(self._build, keys, new_audio, generation_number)
+            self._swap(generation)
+        
+        return {
+            "added": len(new_audio),
+            "removed": len(removed),
+            "kept": len(keyed) - len(missing),
+            "failed": failed,
+        }
+    
+    def close(self) -> None:
+        """Release the memory map."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
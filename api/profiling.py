@@ -0,0 +1,460 @@
+"""
+Stage timings, slow-request capture and on-demand request profiling.
+
+Every request gets a RequestTimings object in a context variable. Code on
+the request path wraps its expensive steps in `stage("name")`, e.g. the
+upstream call, base64 encoding, serialization or compression. A per-endpoint
+log keeps the N slowest recent requests with their stage breakdown, so a
+latency spike can be attributed without reproducing it. This costs a couple
+of perf_counter() calls per stage.
+
+A request can also be profiled in full, either by sending `X-Profile: true`
+together with a valid `X-Admin-Key`, or by a sample rate set by an admin at
+runtime. A profiled request runs with:
+
+- a statistical profiler: a background thread samples the event loop
+  thread's stack every few milliseconds. Asyncio runs every request on that
+  thread, so the samples show where the loop spends its time (including
+  concurrent requests and time spent idle in the selector) while the
+  request runs. The samples are kept as folded stacks, the input format of
+  flamegraph.pl, speedscope and similar tools.
+- tracemalloc: the allocation sites that grew the most during the request.
+
+The sampler thread and tracemalloc only run while a profiled request is in
+flight, so with nothing profiled the overhead is the stage timings alone.
+All of this is opt-in: it is off unless PROFILING_ENABLED=true.
+"""
+
+import heapq
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_KEY_HEADER = b"x-admin-key"
+
+# Allocation sites reported per profile
+TOP_ALLOCATIONS = 15
+
+
+class RequestTimings:
+    """Accumulated time per stage for one request."""
+    
+    __slots__ = ("stages",)
+    
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+    
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_timings_var: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+class _Stage:
+    """Context manager adding its duration to a request's timings."""
+    
+    __slots__ = ("timings", "name", "started")
+    
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+    
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+    
+    def __exit__(self, *exc_info) -> None:
+        self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+_NO_STAGE = nullcontext()
+
+
+def stage(name: str):
+    """
+    Time a step of the current request (use as a context manager).
+    
+    Repeated or concurrent stages with the same name add up, so the stages
+    of a request can sum to more than its wall time. Outside a request (or
+    with profiling disabled) this returns a shared no-op context manager.
+    
+    Args:
+        name: Stage name (e.g. "upstream:tts", "encode", "serialize")
+    """
+    timings = _timings_var.get()
+    return _NO_STAGE if timings is None else _Stage(timings, name)
+
+
+def admin_key_matches(supplied: Optional[str], expected: str) -> bool:
+    """
+    Compare an `X-Admin-Key` value with the configured key in constant time.
+    
+    Both are compared as UTF-8 bytes; hmac.compare_digest() rejects str
+    arguments with non-ASCII characters.
+    """
+    if supplied is None:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8"))
+
+
+def fold_stack(frame) -> str:
+    """Render a frame's stack root-first as one folded-stack line (without the count)."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def folded_lines(samples: Counter) -> str:
+    """Render stack samples in the folded format ("frame;frame;frame count" per line)."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items()))
+
+
+@dataclass
+class RequestProfile:
+    """
+    Profile of one request.
+    
+    Attributes:
+        request_id: X-Request-ID of the request
+        endpoint: "METHOD /route/template"
+        started: Wall-clock start time (epoch seconds)
+        duration_ms: Total duration, including streaming the body
+        status: Response status code
+        stages: Milliseconds per stage
+        samples: Folded event loop stacks and how often each was sampled
+        allocations: Allocation sites that grew the most during the request
+    """
+    request_id: str
+    endpoint: str
+    started: float
+    duration_ms: float = 0.0
+    status: int = 0
+    stages: Dict[str, float] = field(default_factory=dict)
+    samples: Counter = field(default_factory=Counter)
+    allocations: List[Dict[str, object]] = field(default_factory=list)
+    
+    def summary(self) -> Dict[str, object]:
+        """Return the profile without its stack samples."""
+        return {
+            "requestId": self.request_id,
+            "endpoint": self.endpoint,
+            "started": self.started,
+            "durationMs": self.duration_ms,
+            "status": self.status,
+            "stages": self.stages,
+            "sampleCount": sum(self.samples.values()),
+            "allocations": self.allocations,
+        }
+
+
+class _Sampler(threading.Thread):
+    """Background thread adding the event loop thread's stack to every active profile."""
+    
+    def __init__(self, thread_id: int, interval_seconds: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.profiles: List[RequestProfile] = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+    
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = fold_stack(frame)
+            with self.lock:
+                for profile in self.profiles:
+                    profile.samples[stack] += 1
+
+
+class SlowRequestLog:
+    """
+    The N slowest requests of each endpoint within a recent window.
+    
+    Not thread-safe; it is only used from the event loop.
+    """
+    
+    def __init__(self, capacity: int = 10, window_seconds: float = 3600.0):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self._entries: Dict[str, List[tuple]] = {}
+        self._seq = 0
+    
+    def record(self, endpoint: str, duration_ms: float, entry: Dict[str, object]) -> None:
+        """Offer a finished request; it is kept if it is among the slowest of its endpoint."""
+        heap = self._entries.setdefault(endpoint, [])
+        self._prune(heap)
+        self._seq += 1
+        item = (duration_ms, self._seq, time.monotonic(), entry)
+        if len(heap) < self.capacity:
+            heapq.heappush(heap, item)
+        elif duration_ms > heap[0][0]:
+            heapq.heapreplace(heap, item)
+    
+    def snapshot(self) -> Dict[str, List[Dict[str, object]]]:
+        """Return the retained requests per endpoint, slowest first."""
+        result = {}
+        for endpoint, heap in self._entries.items():
+            self._prune(heap)
+            if heap:
+                result[endpoint] = [item[3] for item in sorted(heap, reverse=True)]
+        return result
+    
+    def _prune(self, heap: List[tuple]) -> None:
+        cutoff = time.monotonic() - self.window_seconds
+        if any(item[2] < cutoff for item in heap):
+            heap[:] = [item for item in heap if item[2] >= cutoff]
+            heapq.heapify(heap)
+
+
+class Profiler:
+    """
+    Owns the profiling settings, the slow-request log and captured profiles.
+    
+    Not thread-safe apart from the sampler; it is only used from the event loop.
+    """
+    
+    def __init__(
+        self,
+        slow_requests: SlowRequestLog,
+        sample_rate: float = 0.0,
+        interval_seconds: float = 0.005,
+        max_profiles: int = 20,
+        trace_allocations: bool = True,
+        enabled: bool = True,
+    ):
+        self.slow_requests = slow_requests
+        self.sample_rate = sample_rate
+        self.interval_seconds = interval_seconds
+        self.max_profiles = max_profiles
+        self.trace_allocations = trace_allocations
+        self.enabled = enabled
+        
+        self.profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._sampler: Optional[_Sampler] = None
+        self._active = 0
+        self._started_tracemalloc = False
+        self.requests = 0
+        self.profiled = 0
+    
+    def should_profile(self, requested: bool) -> bool:
+        """Decide whether to profile a request (explicitly requested, or sampled)."""
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+    
+    def begin(self, profile: RequestProfile):
+        """Start sampling for a profiled request; returns the allocation baseline."""
+        self._active += 1
+        if self._sampler is None:
+            self._sampler = _Sampler(threading.get_ident(), self.interval_seconds)
+            self._sampler.start()
+        with self._sampler.lock:
+            self._sampler.profiles.append(profile)
+        
+        if not self.trace_allocations:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return tracemalloc.take_snapshot()
+    
+    def end(self, profile: RequestProfile, baseline) -> None:
+        """Stop sampling for a profiled request and keep its profile."""
+        if baseline is not None and tracemalloc.is_tracing():
+            profile.allocations = self._allocation_growth(baseline, tracemalloc.take_snapshot())
+        
+        sampler = self._sampler
+        with sampler.lock:
+            sampler.profiles.remove(profile)
+        self._active -= 1
+        if self._active == 0:
+            sampler.stopped.set()
+            self._sampler = None
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        
+        self.profiled += 1
+        self.profiles[profile.request_id] = profile
+        self.profiles.move_to_end(profile.request_id)
+        while len(self.profiles) > self.max_profiles:
+            self.profiles.popitem(last=False)
+        logger.info(
+            "Request profiled: %s %.1fms, %s samples", profile.endpoint, profile.duration_ms, sum(profile.samples.values()),
+            extra={"event": "request_profiled", "endpoint": profile.endpoint, "duration_ms": profile.duration_ms}
+        )
+    
+    @staticmethod
+    def _allocation_growth(baseline, current) -> List[Dict[str, object]]:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = current.filter_traces(filters).compare_to(baseline.filter_traces(filters), "lineno")
+        growth = []
+        for stat in stats:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            growth.append({
+                "site": f"{frame.filename}:{frame.lineno}",
+                "sizeKB": round(stat.size_diff / 1024, 1),
+                "count": stat.count_diff,
+            })
+            if len(growth) >= TOP_ALLOCATIONS:
+                break
+        return growth
+    
+    def flamegraph(self, request_id: Optional[str] = None) -> Optional[str]:
+        """
+        Return folded stacks for one profile, or merged over all kept profiles.
+        
+        Args:
+            request_id: Profile to render; None merges every kept profile
+        
+        Returns:
+            Folded-stack text, or None if there is no such profile
+        """
+        if request_id is not None:
+            profile = self.profiles.get(request_id)
+            return folded_lines(profile.samples) if profile is not None else None
+        merged: Counter = Counter()
+        for profile in self.profiles.values():
+            merged.update(profile.samples)
+        return folded_lines(merged)
+    
+    def stats(self) -> Dict[str, object]:
+        """Return profiling settings and counters for health/metrics output."""
+        return {
+            "enabled": self.enabled,
+            "sampleRate": self.sample_rate,
+            "requests": self.requests,
+            "profiled": self.profiled,
+            "inFlight": self._active,
+            "kept": len(self.profiles),
+        }
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that times requests, records slow ones and runs profiles.
+    
+    Add it outermost so the timings cover the other middleware (compression,
+    logging) and the whole streamed body.
+    """
+    
+    def __init__(self, app, profiler: Profiler, admin_key: Optional[str] = None):
+        self.app = app
+        self.profiler = profiler
+        self.admin_key = admin_key
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        profiler = self.profiler
+        profiler.requests += 1
+        timings = RequestTimings()
+        token = _timings_var.set(timings)
+        started = time.perf_counter()
+        first_byte_ms = None
+        status_code = 500
+        request_id = ""
+        
+        profile = None
+        baseline = None
+        if profiler.should_profile(self._profile_requested(scope)):
+            profile = RequestProfile("", "", time.time())
+            baseline = profiler.begin(profile)
+        
+        async def send_timed(message):
+            nonlocal first_byte_ms, status_code, request_id
+            if message["type"] == "http.response.start":
+                first_byte_ms = (time.perf_counter() - started) * 1000
+                status_code = message["status"]
+                for key, value in message.get("headers", []):
+                    if key.lower() == b"x-request-id":
+                        request_id = value.decode("latin-1")
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _timings_var.reset(token)
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            route = scope.get("route")
+            endpoint = f"{scope['method']} {getattr(route, 'path', '(unmatched)')}"
+            stages = {name: round(seconds * 1000, 1) for name, seconds in timings.stages.items()}
+            
+            profiler.slow_requests.record(endpoint, duration_ms, {
+                "requestId": request_id,
+                "path": scope["path"],
+                "status": status_code,
+                "durationMs": duration_ms,
+                "firstByteMs": round(first_byte_ms, 1) if first_byte_ms is not None else None,
+                "stages": stages,
+                "profiled": profile is not None,
+                "timestamp": time.time(),
+            })
+            if profile is not None:
+                profile.request_id = request_id or f"profile-{profiler.requests}"
+                profile.endpoint = endpoint
+                profile.duration_ms = duration_ms
+                profile.status = status_code
+                profile.stages = stages
+                profiler.end(profile, baseline)
+    
+    def _profile_requested(self, scope) -> bool:
+        if not self.admin_key:
+            return False
+        requested = admin_key = None
+        for key, value in scope.get("headers", []):
+            if key == PROFILE_HEADER:
+                requested = value.decode("latin-1").lower() in ("1", "true", "yes")
+            elif key == ADMIN_KEY_HEADER:
+                admin_key = value.decode("latin-1")
+        return bool(requested) and admin_key_matches(admin_key, self.admin_key)
+
+
+def create_profiler_from_env() -> Profiler:
+    """
+    Build the profiler from environment variables.
+    
+    Environment:
+        PROFILING_ENABLED: "true" to record timings and allow profiling (default "false")
+        PROFILE_SAMPLE_RATE: Fraction of requests profiled (default 0; adjustable at runtime)
+        PROFILE_INTERVAL_MS: Stack sampling interval of profiled requests
+        PROFILE_MAX_PROFILES: Profiles kept for the admin endpoints
+        PROFILE_TRACE_ALLOCATIONS: "true" (default) to run tracemalloc on profiled requests
+        SLOW_REQUEST_CAPACITY: Slowest requests kept per endpoint
+        SLOW_REQUEST_WINDOW_SECONDS: How long a slow request is kept
+    
+    Returns:
+        A Profiler instance
+    """
+    return Profiler(
+        slow_requests=SlowRequestLog(
+            capacity=int(os.getenv("SLOW_REQUEST_CAPACITY", "10")),
+            window_seconds=float(os.getenv("SLOW_REQUEST_WINDOW_SECONDS", "3600")),
+        ),
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        interval_seconds=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+        max_profiles=int(os.getenv("PROFILE_MAX_PROFILES", "20")),
+        trace_allocations=os.getenv("PROFILE_TRACE_ALLOCATIONS", "true").lower() == "true",
+        enabled=os.getenv("PROFILING_ENABLED", "false").lower() == "true",
+    )
@@ -0,0 +1,245 @@
+"""
+Reference audio preprocessing for voice cloning.
+
+Without preprocessing, every clone request uploads the raw reference (up to
+10 MB of mp3/wav/m4a/flac/ogg) and the TTS service decodes and cleans it
+again. Instead, the API turns each reference into a small canonical clip:
+
+    decode -> trim leading/trailing silence -> normalize loudness
+           -> resample to the model rate (mono, 16-bit PCM) -> cap duration
+
+Clips are cached by a hash of the reference content (plus the settings), so
+repeat clones with the same speaker skip both the ffmpeg run and most of the
+upload. Concurrent requests with the same reference share one ffmpeg run.
+
+Decoding uses the `ffmpeg` binary. If it is not installed, or fails on a
+file, the original reference is sent unchanged, as before.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from audio_probe import AudioProbe
+from audio_utils import build_wav, parse_wav
+from tts_cache import TTSCache
+
+logger = logging.getLogger(__name__)
+
+# Clips shorter than this after trimming silence can't carry a voice
+MIN_CLIP_SECONDS = 0.5
+
+
+class ReferenceAudioError(ValueError):
+    """Raised when a reference contains no usable audio."""
+
+
+@dataclass
+class PreparedReference:
+    """
+    A reference clip ready to send to the TTS clone endpoint.
+    
+    Attributes:
+        audio: Audio bytes to upload
+        content_type: MIME type of audio
+        duration_seconds: Duration of audio
+        processed: True if audio is the canonical clip, False if it is the
+            original upload (preprocessing disabled or failed)
+        cached: True if the clip came from the cache
+    """
+    audio: bytes
+    content_type: str
+    duration_seconds: float
+    processed: bool = False
+    cached: bool = False
+
+
+class ReferencePreprocessor:
+    """
+    Converts reference uploads to canonical clips, with a content-hash cache.
+    
+    Not thread-safe; it is only used from the event loop.
+    """
+    
+    def __init__(
+        self,
+        cache: TTSCache,
+        sample_rate: int = 24000,
+        max_seconds: float = 20.0,
+        silence_threshold_db: float = -50.0,
+        loudness_lufs: float = -23.0,
+        ffmpeg_path: str = "ffmpeg",
+        timeout_seconds: float = 30.0,
+        enabled: bool = True,
+    ):
+        self.cache = cache
+        self.sample_rate = sample_rate
+        self.max_seconds = max_seconds
+        self.silence_threshold_db = silence_threshold_db
+        self.loudness_lufs = loudness_lufs
+        self.timeout_seconds = timeout_seconds
+        self.ffmpeg = shutil.which(ffmpeg_path) if enabled else None
+        if enabled and self.ffmpeg is None:
+            logger.warning("ffmpeg not found (%s); voice cloning references are sent unprocessed", ffmpeg_path)
+        
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.processed = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """True if references are being preprocessed."""
+        return self.ffmpeg is not None
+    
+    def cache_key(self, content: bytes) -> str:
+        """Build the cache key for a reference: its content hash plus the clip settings."""
+        settings = json.dumps([self.sample_rate, self.max_seconds, self.silence_threshold_db, self.loudness_lufs])
+        return hashlib.sha256(content + settings.encode("utf-8")).hexdigest()
+    
+    async def prepare(self, content: bytes, probe: AudioProbe) -> PreparedReference:
+        """
+        Return the canonical clip for a reference upload.
+        
+        Args:
+            content: Uploaded reference bytes
+            probe: Metadata probed from the upload
+        
+        Returns:
+            PreparedReference with the clip, or the original upload if
+            preprocessing is disabled or failed
+        
+        Raises:
+            ReferenceAudioError: If nothing audible is left after trimming silence
+        """
+        original = PreparedReference(content, probe.mime_type, probe.duration_seconds)
+        if not self.enabled:
+            return original
+        
+        key = self.cache_key(content)
+        clip = self.cache.get(key)
+        if clip is not None:
+            return PreparedReference(clip, "audio/wav", parse_wav(clip).duration_seconds, processed=True, cached=True)
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._process(key, content, probe.format))
+            # Retrieve the outcome even if every waiting client has gone away
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        # Shielded so a disconnecting client doesn't cancel a run others may share
+        clip = await asyncio.shield(task)
+        if clip is None:
+            return original
+        return PreparedReference(clip, "audio/wav", parse_wav(clip).duration_seconds, processed=True)
+    
+    async def _process(self, key: str, content: bytes, audio_format: str) -> Optional[bytes]:
+        try:
+            clip = await self._run_ffmpeg(content, audio_format)
+        except ReferenceAudioError:
+            raise
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            self.failures += 1
+            logger.warning(
+                "Reference preprocessing failed, sending original: %s", e,
+                extra={"event": "reference_preprocess_failed", "format": audio_format}
+            )
+            return None
+        finally:
+            self._inflight.pop(key, None)
+        
+        self.cache.put(key, clip)
+        self.processed += 1
+        self.bytes_in += len(content)
+        self.bytes_out += len(clip)
+        logger.debug(
+            "Reference preprocessed: %s bytes -> %s bytes", len(content), len(clip),
+            extra={"event": "reference_preprocessed", "bytes_in": len(content), "bytes_out": len(clip)}
+        )
+        return clip
+    
+    async def _run_ffmpeg(self, content: bytes, audio_format: str) -> bytes:
+        threshold = f"{self.silence_threshold_db:g}dB"
+        trim = f"silenceremove=start_periods=1:start_threshold={threshold}:start_silence=0.1"
+        # Trim the end by trimming the start of the reversed audio
+        filters = ",".join([trim, "areverse", trim, "areverse", f"loudnorm=I={self.loudness_lufs:g}:TP=-2"])
+        
+        # Read from a file, not a pipe: MP4 files often keep their index at the end
+        with tempfile.NamedTemporaryFile(suffix=f".{audio_format}") as source:
+            await asyncio.to_thread(self._write_source, source, content)
+            process = await asyncio.create_subprocess_exec(
+                self.ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+                "-i", source.name,
+                "-af", filters,
+                "-t", f"{self.max_seconds:g}",
+                "-ar", str(self.sample_rate), "-ac", "1", "-c:a", "pcm_s16le",
+                "-map_metadata", "-1", "-fflags", "+bitexact",
+                "-f", "wav", "pipe:1",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout_seconds)
+            except BaseException:
+                process.kill()
+                await process.wait()
+                raise
+        
+        if process.returncode != 0:
+            raise ValueError(f"ffmpeg exited with {process.returncode}: {stderr.decode('utf-8', 'replace').strip()[-200:]}")
+        
+        # ffmpeg can't seek back to fill in the sizes when writing to a pipe
+        info = parse_wav(stdout)
+        if info.duration_seconds < MIN_CLIP_SECONDS:
+            raise ReferenceAudioError("Reference audio contains no audible speech")
+        return build_wav(info.fmt_chunk, stdout[info.data_offset:info.data_offset + info.data_size])
+    
+    @staticmethod
+    def _write_source(source, content: bytes) -> None:
+        source.write(content)
+        source.flush()
+    
+    def stats(self) -> Dict[str, object]:
+        """Return preprocessing counters for health/metrics output."""
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "failures": self.failures,
+            "inFlight": len(self._inflight),
+            "bytesIn": self.bytes_in,
+            "bytesOut": self.bytes_out,
+            "cache": self.cache.stats(),
+        }
+
+
+def create_reference_preprocessor_from_env() -> ReferencePreprocessor:
+    """
+    Build the reference preprocessor from environment variables.
+    
+    Environment:
+        CLONE_REFERENCE_PREPROCESS: "true" (default) or "false" to send references unchanged
+        CLONE_REFERENCE_SAMPLE_RATE: Sample rate of the canonical clip in Hz
+        CLONE_REFERENCE_CLIP_SECONDS: Maximum clip duration after trimming silence
+        CLONE_REFERENCE_CACHE_MAX_MB: Memory for cached clips
+        CLONE_REFERENCE_CACHE_TTL_SECONDS: How long cached clips are reused
+        FFMPEG_PATH: ffmpeg executable (name on PATH or full path)
+    
+    Returns:
+        A ReferencePreprocessor instance
+    """
+    return ReferencePreprocessor(
+        cache=TTSCache(
+            max_bytes=int(os.getenv("CLONE_REFERENCE_CACHE_MAX_MB", "32")) * 1024 * 1024,
+            ttl_seconds=float(os.getenv("CLONE_REFERENCE_CACHE_TTL_SECONDS", "86400")),
+        ),
+        sample_rate=int(os.getenv("CLONE_REFERENCE_SAMPLE_RATE", "24000")),
+        max_seconds=float(os.getenv("CLONE_REFERENCE_CLIP_SECONDS", "20")),
+        ffmpeg_path=os.getenv("FFMPEG_PATH", "ffmpeg"),
+        enabled=os.getenv("CLONE_REFERENCE_PREPROCESS", "true").lower() == "true",
+    )
@@ -0,0 +1,43 @@
+"""
+Fast JSON serialization for API responses.
+
+orjson (an optional dependency) serializes the response dicts several times
+faster than the standard library encoder; without it the standard library is
+used with the same compact, UTF-8 output, so responses are identical either
+way.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from profiling import stage
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the standard library encoder
+    orjson = None
+
+
+def json_dumps(content: Any) -> bytes:
+    """
+    Serialize content to compact UTF-8 JSON.
+    
+    Args:
+        content: JSON-compatible value (dicts, lists, strings, numbers, ...)
+    
+    Returns:
+        Encoded JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+    
+    def render(self, content: Any) -> bytes:
+        with stage("serialize"):
+            return json_dumps(content)
@@ -0,0 +1,59 @@
+"""
+SRT and WebVTT rendering of timed transcript segments.
+
+Cues are rendered one at a time so subtitles can be streamed while the rest
+of the file is still being transcribed.
+"""
+
+from typing import Dict
+
+SUBTITLE_FORMATS: Dict[str, str] = {
+    "srt": "application/x-subrip",
+    "vtt": "text/vtt",
+}
+
+
+def format_timestamp(seconds: float, separator: str) -> str:
+    """
+    Format seconds as HH:MM:SS<separator>mmm.
+    
+    Args:
+        seconds: Time in seconds
+        separator: "," for SRT, "." for WebVTT
+    """
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def subtitle_header(subtitle_format: str) -> str:
+    """Return the text that starts a subtitle file of the given format."""
+    return "WEBVTT\n\n" if subtitle_format == "vtt" else ""
+
+
+def render_cue(subtitle_format: str, index: int, start: float, end: float, text: str) -> str:
+    """
+    Render one subtitle cue.
+    
+    Args:
+        subtitle_format: "srt" or "vtt"
+        index: 1-based cue number
+        start: Start time in seconds
+        end: End time in seconds
+        text: Cue text (blank lines would end the cue, so newlines are folded)
+    
+    Returns:
+        The cue followed by a blank line
+    """
+    separator = "." if subtitle_format == "vtt" else ","
+    text = " ".join(text.split())
+    return f"{index}\n{format_timestamp(start, separator)} --> {format_timestamp(end, separator)}\n{text}\n\n"
+
+
+def render_note(subtitle_format: str, text: str) -> str:
+    """Render a comment (WebVTT NOTE block); SRT has no comments, so it renders nothing."""
+    if subtitle_format != "vtt":
+        return ""
+    return f"NOTE {' '.join(text.replace('-->', '->').split())}\n\n"
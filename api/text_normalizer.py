@@ -0,0 +1,339 @@
+"""
+Text normalization for TTS requests.
+
+Texts that differ only in whitespace, Unicode form (NFC vs NFD Bengali
+conjuncts), digits or common abbreviations sound the same, so they are
+normalized to one canonical form before synthesis. This keeps the upstream
+input deterministic and lets every cache key on the normalized text.
+
+Pipeline (in order):
+1. Unicode NFC + removal of invisible characters (ZWJ/ZWNJ are kept, they
+   control Bengali conjunct rendering)
+2. Punctuation cleanup (curly quotes, ellipsis, repeated marks)
+3. Whitespace collapse
+4. Language detection from script counts (for language="auto")
+5. Abbreviation and symbol expansion
+6. Number expansion (ASCII and Bengali digits, Western or lakh/crore digit
+   grouping) into words. Digits attached to Latin letters or to other
+   dotted/comma-separated digits (ordinals, dates, versions, IDs) are left
+   as written.
+
+split_language_runs() splits code-switched text into Bengali and English
+runs so each run can be synthesized in its own language.
+
+All tables and regexes are compiled at import time and results are
+memoized, so repeated texts cost a dictionary lookup.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+# Number of distinct (text, language) pairs kept in the memo cache
+NORMALIZE_CACHE_SIZE = 4096
+
+# Numbers longer than this are read digit by digit (phone numbers, IDs, ...)
+MAX_NUMBER_DIGITS = 12
+
+# ============================================================================
+# PRECOMPILED TABLES
+# ============================================================================
+
+BENGALI_DIGITS = "০১২৩৪৫৬৭৮৯"
+BENGALI_TO_ASCII_DIGITS = str.maketrans(BENGALI_DIGITS, "0123456789")
+
+# Bengali has an irregular word for every number from 0 to 99
+BENGALI_NUMBER_WORDS = (
+    "শূন্য এক দুই তিন চার পাঁচ ছয় সাত আট নয় "
+    "দশ এগারো বারো তেরো চৌদ্দ পনেরো ষোলো সতেরো আঠারো উনিশ "
+    "বিশ একুশ বাইশ তেইশ চব্বিশ পঁচিশ ছাব্বিশ সাতাশ আটাশ উনত্রিশ "
+    "ত্রিশ একত্রিশ বত্রিশ তেত্রিশ চৌত্রিশ পঁয়ত্রিশ ছত্রিশ সাঁইত্রিশ আটত্রিশ উনচল্লিশ "
+    "চল্লিশ একচল্লিশ বিয়াল্লিশ তেতাল্লিশ চুয়াল্লিশ পঁয়তাল্লিশ ছেচল্লিশ সাতচল্লিশ আটচল্লিশ উনপঞ্চাশ "
+    "পঞ্চাশ একান্ন বাহান্ন তিপ্পান্ন চুয়ান্ন পঞ্চান্ন ছাপ্পান্ন সাতান্ন আটান্ন উনষাট "
+    "ষাট একষট্টি বাষট্টি তেষট্টি চৌষট্টি পঁয়ষট্টি ছেষট্টি সাতষট্টি আটষট্টি উনসত্তর "
+    "সত্তর একাত্তর বাহাত্তর তিয়াত্তর চুয়াত্তর পঁচাত্তর ছিয়াত্তর সাতাত্তর আটাত্তর উনআশি "
+    "আশি একাশি বিরাশি তিরাশি চুরাশি পঁচাশি ছিয়াশি সাতাশি আটাশি উননব্বই "
+    "নব্বই একানব্বই বিরানব্বই তিরানব্বই চুরানব্বই পঁচানব্বই ছিয়ানব্বই সাতানব্বই আটানব্বই নিরানব্বই"
+).split()
+
+# Indian numbering system: কোটি (10^7), লাখ (10^5), হাজার (10^3)
+BENGALI_SCALES = ((10_000_000, "কোটি"), (100_000, "লাখ"), (1_000, "হাজার"))
+# Hundreds are compounds, and "two" shortens in them (দুশো, not দুইশো)
+BENGALI_HUNDREDS = ("", "একশো", "দুশো", "তিনশো", "চারশো", "পাঁচশো", "ছয়শো", "সাতশো", "আটশো", "নয়শো")
+BENGALI_DECIMAL_POINT = "দশমিক"
+
+ENGLISH_ONES = (
+    "zero one two three four five six seven eight nine ten eleven twelve "
+    "thirteen fourteen fifteen sixteen seventeen eighteen nineteen"
+).split()
+ENGLISH_TENS = "_ _ twenty thirty forty fifty sixty seventy eighty ninety".split()
+ENGLISH_SCALES = ((1_000_000_000, "billion"), (1_000_000, "million"), (1_000, "thousand"))
+ENGLISH_DECIMAL_POINT = "point"
+
+ENGLISH_ABBREVIATIONS = {
+    "Dr.": "Doctor",
+    "Mr.": "Mister",
+    "Mrs.": "Missus",
+    "Ms.": "Miss",
+    "Prof.": "Professor",
+    "Jr.": "Junior",
+    "Sr.": "Senior",
+    "vs.": "versus",
+    "etc.": "et cetera",
+    "e.g.": "for example",
+    "i.e.": "that is",
+    "approx.": "approximately",
+    "%": " percent",
+    "&": " and ",
+}
+
+BENGALI_ABBREVIATIONS = {
+    "ডাঃ": "ডাক্তার",
+    "ডা.": "ডাক্তার",
+    "মোঃ": "মোহাম্মদ",
+    "মো.": "মোহাম্মদ",
+    "মোসাঃ": "মোসাম্মৎ",
+    "%": " শতাংশ",
+    "&": " এবং ",
+}
+
+PUNCTUATION_MAP = str.maketrans({
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "–": "-", "—": "-", "…": "...",
+    "\u00a0": " ",
+})
+
+# Invisible characters that carry no meaning for speech (ZWJ/ZWNJ are kept)
+INVISIBLE_CHARS_RE = re.compile("[\u200b\u2060\ufeff\u00ad]")
+WHITESPACE_RE = re.compile(r"\s+")
+REPEATED_PUNCTUATION_RE = re.compile(r"([!?।,;:])\1+")
+# A standalone number: Western (1,000,000) or lakh/crore (10,00,000) grouping
+# and an optional decimal part. Runs touching Latin letters ("21st", "A4") or
+# more dotted/comma-separated digits ("1.5.2024", "192.168.0.1") don't match.
+NUMBER_RE = re.compile(
+    r"(?<![\dA-Za-z])(?<!\d[.,])"
+    r"(?:\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})+,\d{3}|\d+)(?:\.\d+)?"
+    r"(?![\dA-Za-z]|[.,]\d)"
+)
+BENGALI_CHAR_RE = re.compile("[\u0980-\u09ff]")
+LATIN_CHAR_RE = re.compile("[A-Za-z]")
+
+
+def _abbreviation_re(table):
+    # Longest first so "Mrs." wins over "Mr."; word abbreviations must start a word
+    keys = sorted(table, key=len, reverse=True)
+    return re.compile("|".join(
+        (r"(?<!\w)" if k[0].isalpha() else "") + re.escape(k) for k in keys
+    ))
+
+
+ENGLISH_ABBREVIATION_RE = _abbreviation_re(ENGLISH_ABBREVIATIONS)
+BENGALI_ABBREVIATION_RE = _abbreviation_re(BENGALI_ABBREVIATIONS)
+
+
+class NormalizedText(NamedTuple):
+    """
+    Result of normalizing a TTS input text.
+    
+    Attributes:
+        text: Canonical text to send to the synthesizer
+        language: Resolved frontend language name ("bangla" or "english")
+    """
+    text: str
+    language: str
+
+
+# ============================================================================
+# NUMBER EXPANSION
+# ============================================================================
+
+def bengali_number_to_words(number: int) -> str:
+    """Spell out a non-negative integer in Bengali (Indian numbering system)."""
+    if number < 100:
+        return BENGALI_NUMBER_WORDS[number]
+    
+    words = []
+    for scale, name in BENGALI_SCALES:
+        if number >= scale:
+            words.append(f"{bengali_number_to_words(number // scale)} {name}")
+            number %= scale
+    if number >= 100:
+        words.append(BENGALI_HUNDREDS[number // 100])
+        number %= 100
+    if number:
+        words.append(BENGALI_NUMBER_WORDS[number])
+    return " ".join(words)
+
+
+def english_number_to_words(number: int) -> str:
+    """Spell out a non-negative integer in English."""
+    if number < 20:
+        return ENGLISH_ONES[number]
+    if number < 100:
+        tens, ones = divmod(number, 10)
+        return ENGLISH_TENS[tens] + (f"-{ENGLISH_ONES[ones]}" if ones else "")
+    
+    words = []
+    for scale, name in ENGLISH_SCALES:
+        if number >= scale:
+            words.append(f"{english_number_to_words(number // scale)} {name}")
+            number %= scale
+    if number >= 100:
+        words.append(f"{ENGLISH_ONES[number // 100]} hundred")
+        number %= 100
+    if number:
+        words.append(english_number_to_words(number))
+    return " ".join(words)
+
+
+def _digits_to_words(digits: str, language: str) -> str:
+    ones = BENGALI_NUMBER_WORDS if language == "bangla" else ENGLISH_ONES
+    return " ".join(ones[int(d)] for d in digits)
+
+
+def _expand_number(match: "re.Match", language: str) -> str:
+    raw = match.group(0).translate(BENGALI_TO_ASCII_DIGITS)
+    integer_part, _, fraction = raw.partition(".")
+    integer_part = integer_part.replace(",", "")
+    
+    # Leading zeros and very long runs are identifiers, not quantities
+    if (len(integer_part) > 1 and integer_part.startswith("0")) or len(integer_part) > MAX_NUMBER_DIGITS:
+        spoken = _digits_to_words(integer_part, language)
+    elif language == "bangla":
+        spoken = bengali_number_to_words(int(integer_part))
+    else:
+        spoken = english_number_to_words(int(integer_part))
+    
+    if fraction:
+        point = BENGALI_DECIMAL_POINT if language == "bangla" else ENGLISH_DECIMAL_POINT
+        spoken = f"{spoken} {point} {_digits_to_words(fraction, language)}"
+    
+    # Bengali suffixes attach to the number ("৫টি" -> "পাঁচটি"); English words are
+    # separated from a preceding symbol ("Tk.500"). Numbers touching Latin
+    # letters never match, so nothing after the number needs separating.
+    return spoken if language == "bangla" else f" {spoken}"
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def detect_language(text: str) -> str:
+    """
+    Detect the dominant language of a text from its script.
+    
+    Args:
+        text: Input text (any normalization form)
+    
+    Returns:
+        "bangla" if Bengali script characters outnumber Latin letters,
+        otherwise "english"
+    """
+    bengali = len(BENGALI_CHAR_RE.findall(text))
+    latin = len(LATIN_CHAR_RE.findall(text))
+    return "bangla" if bengali > latin else "english"
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def split_language_runs(text: str) -> List[Tuple[str, str]]:
+    """
+    Split code-switched text into runs of a single script.
+    
+    Characters that belong to neither script (spaces, digits, punctuation)
+    stay with the run they follow, so numbers and sentence punctuation are
+    read in the language of the surrounding words.
+    
+    Args:
+        text: Input text (NFC)
+    
+    Returns:
+        List of (run text, "bangla" | "english") in text order. Text with no
+        letters of either script is returned as a single detected run.
+    """
+    runs = []
+    current = []
+    current_language = None
+    
+    for ch in text:
+        if BENGALI_CHAR_RE.match(ch):
+            language = "bangla"
+        elif LATIN_CHAR_RE.match(ch):
+            language = "english"
+        else:
+            language = None
+        
+        if language is not None and current_language is not None and language != current_language:
+            runs.append(("".join(current).strip(), current_language))
+            current = []
+        if language is not None:
+            current_language = language
+        current.append(ch)
+    
+    tail = "".join(current).strip()
+    if tail:
+        runs.append((tail, current_language or detect_language(tail)))
+    return [run for run in runs if run[0]]
+
+
+def resolve_language(text: str, language: str) -> str:
+    """
+    Resolve a requested language name, detecting it when set to "auto".
+    
+    Args:
+        text: Input text
+        language: Requested language ("bangla", "english" or "auto")
+    
+    Returns:
+        "bangla" or "english"
+    """
+    language = language.lower()
+    if language in ("bangla", "english"):
+        return language
+    return detect_language(text)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(text: str, language: str = "auto") -> NormalizedText:
+    """
+    Normalize TTS input text into its canonical form.
+    
+    Args:
+        text: Raw input text
+        language: Requested language ("bangla", "english" or "auto")
+    
+    Returns:
+        NormalizedText with the canonical text and the resolved language
+    
+    Examples:
+        >>> normalize_text("১,০০,০০০ টাকা", "bangla").text
+        'এক লাখ টাকা'
+        >>> normalize_text("1,00,000 taka", "english").text
+        'one hundred thousand taka'
+        >>> normalize_text("1,250.5 km", "english").text
+        'one thousand two hundred fifty point five km'
+        >>> normalize_text("the 21st century", "english").text
+        'the 21st century'
+        >>> normalize_text("due 1.5.2024, v2.0.1", "english").text
+        'due 1.5.2024, v2.0.1'
+        >>> normalize_text("I paid 500.", "english").text
+        'I paid five hundred.'
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = INVISIBLE_CHARS_RE.sub("", text)
+    text = text.translate(PUNCTUATION_MAP)
+    text = REPEATED_PUNCTUATION_RE.sub(r"\1", text)
+    text = WHITESPACE_RE.sub(" ", text).strip()
+    
+    resolved = resolve_language(text, language)
+    
+    if resolved == "bangla":
+        text = BENGALI_ABBREVIATION_RE.sub(lambda m: BENGALI_ABBREVIATIONS[m.group(0)], text)
+    else:
+        text = ENGLISH_ABBREVIATION_RE.sub(lambda m: ENGLISH_ABBREVIATIONS[m.group(0)], text)
+    
+    text = NUMBER_RE.sub(lambda m: _expand_number(m, resolved), text)
+    
+    # Expansions may have introduced extra spaces
+    text = WHITESPACE_RE.sub(" ", text).strip()
+    return NormalizedText(text=text, language=resolved)
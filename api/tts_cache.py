@@ -0,0 +1,121 @@
+"""
+In-memory cache of synthesized TTS audio.
+
+Entries are keyed on the normalized text plus every synthesis parameter, so
+the same phrase in the same voice is only sent to SenseTTS once. The cache is
+bounded by total audio bytes (least recently used entries are evicted first)
+and entries expire after a TTL.
+
+Expired entries are kept for a further `stale_seconds` so they can still be
+served, on request, while the upstream is overloaded.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class TTSCache:
+    """
+    Byte-bounded LRU cache of synthesized audio with a TTL.
+    
+    Not thread-safe; it is only used from the event loop.
+    """
+    
+    def __init__(self, max_bytes: int, ttl_seconds: float, stale_seconds: float = 0.0):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(text: str, language: str, voice: str, make_clean: bool = True) -> str:
+        """
+        Build a cache key from synthesis parameters.
+        
+        Args:
+            text: Normalized text sent to the synthesizer
+            language: API language code ("bn" or "en")
+            voice: Voice name
+            make_clean: Whether audio cleaning was requested
+        
+        Returns:
+            Hex digest identifying the synthesis request
+        """
+        raw = json.dumps([text, language, voice, make_clean], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str, allow_stale: bool = False) -> Optional[bytes]:
+        """
+        Return cached audio for key, or None if missing or expired.
+        
+        Args:
+            key: Cache key
+            allow_stale: Also return entries expired less than stale_seconds ago
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        audio, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl_seconds + self.stale_seconds:
+            self._remove(key)
+            self.misses += 1
+            return None
+        if age > self.ttl_seconds:
+            if not allow_stale:
+                self.misses += 1
+                return None
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        
+        self._entries.move_to_end(key)
+        return audio
+    
+    def has(self, key: str, allow_stale: bool = False) -> bool:
+        """Return True if get(key, allow_stale) would return audio (does not count as a hit)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        max_age = self.ttl_seconds + (self.stale_seconds if allow_stale else 0.0)
+        return time.monotonic() - entry[1] <= max_age
+    
+    def __contains__(self, key: str) -> bool:
+        """Return True if key is cached and not expired (does not count as a hit)."""
+        return self.has(key)
+    
+    def put(self, key: str, audio: bytes) -> None:
+        """Store audio under key, evicting least recently used entries if needed."""
+        if len(audio) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        
+        self._entries[key] = (audio, time.monotonic())
+        self._size += len(audio)
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+    
+    def _remove(self, key: str) -> None:
+        audio, _ = self._entries.pop(key)
+        self._size -= len(audio)
+    
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters for health/metrics output."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+        }
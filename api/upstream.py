@@ -0,0 +1,199 @@
+"""
+Upstream (SenseTTS / ASR) health tracking.
+
+Each upstream gets an UpstreamMonitor that tracks:
+- In-flight requests against the shared connection pool (saturation and
+  queue depth for autoscaling)
+- Round-trip time and error rate from a background prober plus real traffic
+
+Health endpoints read the cached snapshot, so a load balancer probe is O(1)
+and never fans out to the GPU services.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+
+from profiling import stage
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamOutcome:
+    """
+    Result of one tracked upstream request, filled in by the caller.
+    
+    Attributes:
+        status_code: HTTP status of the upstream response, once received
+    """
+    
+    __slots__ = ("status_code",)
+    
+    def __init__(self):
+        self.status_code: Optional[int] = None
+    
+    @property
+    def ok(self) -> bool:
+        """False if the upstream answered with a server error (5xx)."""
+        return self.status_code is None or self.status_code < 500
+
+
+class UpstreamMonitor:
+    """
+    Rolling health statistics for one upstream service.
+    
+    Attributes:
+        name: Upstream name used in health output ("tts", "asr")
+        max_connections: Size of the shared connection pool
+        in_flight: Requests currently using (or waiting for) the pool
+        rtt_ms: Exponentially weighted average probe round-trip time
+        latency_ms: Exponentially weighted average duration of real requests
+            (including time spent waiting for a pooled connection)
+    """
+    
+    def __init__(self, name: str, max_connections: int, window: int = 50, ewma_alpha: float = 0.3):
+        self.name = name
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.rtt_ms: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        self.last_probe_ok = False
+        self.last_error: Optional[str] = None
+        self._outcomes = deque(maxlen=window)
+        self._ewma_alpha = ewma_alpha
+    
+    @asynccontextmanager
+    async def track(self):
+        """
+        Count a request as in flight and record whether it failed and how long it took.
+        
+        Yields an UpstreamOutcome; set its status_code once the response
+        arrives so server errors (5xx) count as failures too.
+        """
+        self.in_flight += 1
+        started = time.perf_counter()
+        outcome = UpstreamOutcome()
+        try:
+            with stage(f"upstream:{self.name}"):
+                yield outcome
+        except (httpx.TransportError, asyncio.TimeoutError) as e:
+            self._outcomes.append(False)
+            self.last_error = type(e).__name__
+            if isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)):
+                # A timed-out request took at least this long
+                self._record_latency(started)
+            raise
+        except BaseException:
+            # Raised by the caller after the exchange completed (e.g. on an error status)
+            if outcome.status_code is not None:
+                self._record_outcome(outcome, started)
+            raise
+        else:
+            self._record_outcome(outcome, started)
+        finally:
+            self.in_flight -= 1
+    
+    def _record_outcome(self, outcome: UpstreamOutcome, started: float) -> None:
+        self._outcomes.append(outcome.ok)
+        if not outcome.ok:
+            self.last_error = f"HTTP {outcome.status_code}"
+        self._record_latency(started)
+    
+    def _record_latency(self, started: float) -> None:
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.latency_ms = latency_ms if self.latency_ms is None else \
+            self._ewma_alpha * latency_ms + (1 - self._ewma_alpha) * self.latency_ms
+    
+    def record_probe(self, ok: bool, rtt_ms: Optional[float], error: Optional[str] = None) -> None:
+        """Record the result of one background probe."""
+        self.last_probe_at = time.time()
+        self.last_probe_ok = ok
+        self._outcomes.append(ok)
+        if ok and rtt_ms is not None:
+            self.rtt_ms = rtt_ms if self.rtt_ms is None else \
+                self._ewma_alpha * rtt_ms + (1 - self._ewma_alpha) * self.rtt_ms
+        if error:
+            self.last_error = error
+    
+    @property
+    def error_rate(self) -> float:
+        """Fraction of failed requests/probes in the rolling window."""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+    
+    @property
+    def queue_depth(self) -> int:
+        """Requests waiting for a pooled connection."""
+        return max(0, self.in_flight - self.max_connections)
+    
+    @property
+    def saturation(self) -> float:
+        """Fraction of the connection pool in use (0.0 - 1.0)."""
+        return min(self.in_flight, self.max_connections) / self.max_connections if self.max_connections else 0.0
+    
+    def is_ready(self, max_probe_age: float, max_error_rate: float) -> bool:
+        """Return True if the last probe is recent and succeeded and errors are low."""
+        if self.last_probe_at is None or time.time() - self.last_probe_at > max_probe_age:
+            return False
+        return self.last_probe_ok and self.error_rate <= max_error_rate
+    
+    def snapshot(self) -> Dict[str, object]:
+        """Return the cached statistics for health output."""
+        return {
+            "reachable": self.last_probe_ok,
+            "rttMs": round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+            "latencyMs": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "errorRate": round(self.error_rate, 3),
+            "inFlight": self.in_flight,
+            "queueDepth": self.queue_depth,
+            "poolSaturation": round(self.saturation, 3),
+            "lastProbeAt": self.last_probe_at,
+            "lastError": self.last_error,
+        }
+
+
+async def probe_upstream(monitor: UpstreamMonitor, client: httpx.AsyncClient, url: str, timeout: float) -> None:
+    """
+    Probe one upstream URL and record the result.
+    
+    Any HTTP response below 500 counts as reachable - the probe measures
+    connectivity and latency, not the semantics of the probed path.
+    """
+    started = time.perf_counter()
+    try:
+        response = await client.get(url, timeout=timeout)
+        rtt_ms = (time.perf_counter() - started) * 1000
+        ok = response.status_code < 500
+        monitor.record_probe(ok, rtt_ms, None if ok else f"HTTP {response.status_code}")
+    except httpx.HTTPError as e:
+        monitor.record_probe(False, None, type(e).__name__)
+
+
+async def run_prober(targets: Callable[[], Iterable[Tuple[UpstreamMonitor, httpx.AsyncClient, str]]], interval: float, timeout: float) -> None:
+    """
+    Background task: probe every upstream each `interval` seconds.
+    
+    Args:
+        targets: Callable returning (monitor, client, url) tuples - evaluated
+            each round so clients recreated at startup are picked up
+        interval: Seconds between probe rounds
+        timeout: Per-probe timeout in seconds
+    """
+    while True:
+        try:
+            await asyncio.gather(*(
+                probe_upstream(monitor, client, url, timeout)
+                for monitor, client, url in targets()
+            ))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Upstream probe round failed: %s", e)
+        await asyncio.sleep(interval)